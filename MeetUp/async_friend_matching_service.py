@@ -0,0 +1,233 @@
+# async_friend_matching_service.py
+
+from typing import List, Dict, Optional, Set, AsyncIterator
+from datetime import datetime
+import asyncio
+import logging
+import time
+
+from friend_matching_service import (
+    FriendMatchingService,
+    FriendSuggestion,
+    Schedule,
+    TopSuggestions
+)
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncFriendMatchingService:
+    """Asyncio variant of FriendMatchingService for async repositories.
+
+    Independent repository calls are awaited concurrently, and candidate
+    schedules are streamed page by page through
+    get_schedules_by_university_page instead of loaded as one list.
+    Scoring is delegated to a FriendMatchingService, so results match
+    the synchronous service.
+    """
+
+    def __init__(self, schedule_repository, connection_repository,
+                 page_size: int = 500, suggestion_cache=None, instrumentation=None,
+                 connection_graph=None):
+        self.schedule_repo = schedule_repository
+        self.connection_repo = connection_repository
+        self.page_size = page_size
+        self.matcher = FriendMatchingService(
+            None, None,
+            suggestion_cache=suggestion_cache,
+            instrumentation=instrumentation,
+            connection_graph=connection_graph
+        )
+
+    async def generate_suggestions(self, user_id: int, limit: int = 10) -> List[FriendSuggestion]:
+        """Generate friend suggestions for a user."""
+        stats = self.matcher.instrumentation
+        if stats is not None:
+            started = time.perf_counter()
+
+        try:
+            cache = self.matcher.suggestion_cache
+            if cache is not None:
+                cached = cache.get(user_id, limit)
+                if cached is not None:
+                    if stats is not None:
+                        stats.increment('cache_hits')
+                        stats.observe_phase('total', time.perf_counter() - started)
+                    return cached
+
+            user_schedule, existing_connections, blocked_users = await asyncio.gather(
+                self.schedule_repo.get_schedule_by_user(user_id),
+                self.connection_repo.get_connections(user_id),
+                self.connection_repo.get_blocked_users(user_id)
+            )
+            if not user_schedule:
+                logger.warning(f"No schedule found for user {user_id}")
+                return []
+
+            if stats is not None:
+                stats.observe_phase('repository', time.perf_counter() - started)
+
+            existing_ids = {conn.other_user_id for conn in existing_connections}
+            blocked_ids = {block.blocked_user_id for block in blocked_users}
+            excluded_ids = existing_ids | blocked_ids | {user_id}
+
+            top = TopSuggestions(limit)
+
+            async for candidate_schedule in self.iter_candidate_schedules(
+                    user_schedule, excluded_ids):
+                suggestion = self.matcher._evaluate_match(
+                    user_schedule,
+                    candidate_schedule,
+                    min_score=top.min_score()
+                )
+                if suggestion and suggestion.score > 0:
+                    top.offer(suggestion)
+
+            suggestions = top.results()
+            if cache is not None:
+                cache.put(user_schedule, excluded_ids, limit, suggestions)
+
+            if stats is not None:
+                stats.increment('suggestions_returned', len(suggestions))
+                stats.observe_phase('total', time.perf_counter() - started)
+            return suggestions
+
+        except Exception as e:
+            logger.error(f"Error generating suggestions for user {user_id}: {str(e)}")
+            raise
+
+    async def iter_suggestions(self, user_id: int) -> AsyncIterator[FriendSuggestion]:
+        """Yield scored suggestions in candidate order as pages arrive."""
+        user_schedule, existing_connections, blocked_users = await asyncio.gather(
+            self.schedule_repo.get_schedule_by_user(user_id),
+            self.connection_repo.get_connections(user_id),
+            self.connection_repo.get_blocked_users(user_id)
+        )
+        if not user_schedule:
+            logger.warning(f"No schedule found for user {user_id}")
+            return
+
+        excluded_ids = ({conn.other_user_id for conn in existing_connections} |
+                        {block.blocked_user_id for block in blocked_users} |
+                        {user_id})
+
+        async for candidate_schedule in self.iter_candidate_schedules(
+                user_schedule, excluded_ids):
+            suggestion = self.matcher._evaluate_match(user_schedule, candidate_schedule)
+            if suggestion and suggestion.score > 0:
+                yield suggestion
+
+    async def iter_candidate_schedules(self, user_schedule: Schedule,
+                                       excluded_ids: Set[int]) -> AsyncIterator[Schedule]:
+        """Stream candidate schedules from the repository one page at a time.
+
+        Each page fetch is timed as a 'repository' phase.
+        """
+        stats = self.matcher.instrumentation
+        exclude_user_ids = list(excluded_ids)
+        after_user_id = None
+
+        while True:
+            if stats is not None:
+                started = time.perf_counter()
+            page = await self.schedule_repo.get_schedules_by_university_page(
+                user_schedule.user_id,
+                exclude_user_ids=exclude_user_ids,
+                after_user_id=after_user_id,
+                page_size=self.page_size
+            )
+            if stats is not None:
+                stats.observe_phase('repository', time.perf_counter() - started)
+            for schedule in page:
+                yield schedule
+
+            if len(page) < self.page_size:
+                return
+            after_user_id = page[-1].user_id
+
+    async def create_connection_request(self, requesting_user_id: int,
+                                        target_user_id: int) -> Dict:
+        """Create a connection request between two users."""
+        try:
+            existing, blocked, blocked_by = await asyncio.gather(
+                self.connection_repo.get_connection_between(
+                    requesting_user_id,
+                    target_user_id
+                ),
+                self.connection_repo.is_blocked(requesting_user_id, target_user_id),
+                self.connection_repo.is_blocked(target_user_id, requesting_user_id)
+            )
+            if existing:
+                raise ValueError("Connection already exists or is pending")
+
+            if blocked or blocked_by:
+                raise ValueError("Cannot connect with blocked user")
+
+            connection = await self.connection_repo.create_connection(
+                user1_id=requesting_user_id,
+                user2_id=target_user_id,
+                status='pending',
+                suggested_at=datetime.utcnow()
+            )
+
+            if self.matcher.connection_graph is not None:
+                self.matcher.connection_graph.request_added(connection)
+
+            if self.matcher.suggestion_cache is not None:
+                self.matcher.suggestion_cache.exclusion_added(requesting_user_id, target_user_id)
+
+            logger.info(f"Connection request: {requesting_user_id} -> {target_user_id}")
+            return connection
+
+        except Exception as e:
+            logger.error(f"Error creating connection request: {str(e)}")
+            raise
+
+    def accept_connection(self, connection_id: int, accepting_user_id: int) -> Dict:
+        """Accept a pending connection request."""
+        return self.matcher.accept_connection(connection_id, accepting_user_id)
+
+    def notify_schedule_changed(self, user_id: int, schedule: Optional[Schedule]):
+        """Refresh cached suggestions after a schedule was saved or deleted."""
+        self.matcher.notify_schedule_changed(user_id, schedule)
+
+
+if __name__ == '__main__':
+    import random
+    from async_repositories import (
+        InMemoryAsyncScheduleRepository,
+        InMemoryAsyncConnectionRepository
+    )
+
+    rng = random.Random(7)
+    schedules = []
+    for user_id in range(1, 1201):
+        start = rng.randrange(8 * 60, 16 * 60, 15)
+        schedules.append(Schedule(
+            user_id=user_id,
+            classes=[{
+                'course': f"C{rng.randrange(40)}",
+                'building': 'Science Hall',
+                'day': rng.choice(['Monday', 'Wednesday']),
+                'start_time': f"{start // 60:02d}:{start % 60:02d}",
+                'end_time': f"{(start + 75) // 60:02d}:{(start + 75) % 60:02d}"
+            }],
+            walking_paths=[[(40.7128 + rng.random() * 0.002, -74.0060 + rng.random() * 0.002)]]
+        ))
+
+    async def main():
+        schedule_repo = InMemoryAsyncScheduleRepository(schedules, latency=0.02)
+        connection_repo = InMemoryAsyncConnectionRepository(latency=0.02)
+        service = AsyncFriendMatchingService(schedule_repo, connection_repo, page_size=200)
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*(service.generate_suggestions(user_id)
+                                         for user_id in range(1, 51)))
+        elapsed = time.perf_counter() - started
+        print(f"50 concurrent requests in {elapsed * 1000:.0f} ms, "
+              f"{sum(len(r) for r in results)} suggestions")
+
+        connection = await service.create_connection_request(1, 2)
+        print(f"Connection request created: status={connection['status']}")
+
+    asyncio.run(main())
@@ -0,0 +1,116 @@
+# async_repositories.py
+
+"""
+In-memory async repositories for AsyncFriendMatchingService.
+
+They mirror the repository calls the service makes and can simulate I/O
+latency with asyncio.sleep, which makes them usable both for tests and
+for demonstrating concurrent fetching.
+"""
+
+from typing import List, Dict, Optional, Iterable, Set, Tuple
+from dataclasses import dataclass
+from datetime import datetime
+import asyncio
+import itertools
+
+from friend_matching_service import Schedule
+
+
+@dataclass
+class UserConnection:
+    """A connection as seen from one user"""
+    id: int
+    other_user_id: int
+    status: str
+
+
+@dataclass
+class UserBlock:
+    """A block created by one user"""
+    blocked_user_id: int
+
+
+class InMemoryAsyncScheduleRepository:
+    """Async schedule repository over a dict of schedules, paged by user id"""
+
+    def __init__(self, schedules: Iterable[Schedule] = (), latency: float = 0.0):
+        self.latency = latency
+        self._schedules: Dict[int, Schedule] = {s.user_id: s for s in schedules}
+
+    def save(self, schedule: Schedule):
+        self._schedules[schedule.user_id] = schedule
+
+    async def get_schedule_by_user(self, user_id: int) -> Optional[Schedule]:
+        await asyncio.sleep(self.latency)
+        return self._schedules.get(user_id)
+
+    async def get_schedules_by_university_page(self, university_id: int,
+                                               exclude_user_ids: List[int],
+                                               after_user_id: Optional[int] = None,
+                                               page_size: int = 500) -> List[Schedule]:
+        """Next page of schedules ordered by user id, starting after after_user_id"""
+        await asyncio.sleep(self.latency)
+        excluded = set(exclude_user_ids)
+        page = []
+        for user_id in sorted(self._schedules):
+            if after_user_id is not None and user_id <= after_user_id:
+                continue
+            if user_id in excluded:
+                continue
+            page.append(self._schedules[user_id])
+            if len(page) == page_size:
+                break
+        return page
+
+
+class InMemoryAsyncConnectionRepository:
+    """Async connection/block repository kept in memory"""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self._ids = itertools.count(1)
+        self._connections: Dict[Tuple[int, int], Dict] = {}
+        self._blocks: Set[Tuple[int, int]] = set()
+
+    def block(self, blocker_id: int, blocked_id: int):
+        self._blocks.add((blocker_id, blocked_id))
+
+    async def get_connections(self, user_id: int) -> List[UserConnection]:
+        await asyncio.sleep(self.latency)
+        return [
+            UserConnection(
+                id=connection['id'],
+                other_user_id=user2 if user1 == user_id else user1,
+                status=connection['status']
+            )
+            for (user1, user2), connection in self._connections.items()
+            if user_id in (user1, user2)
+        ]
+
+    async def get_blocked_users(self, user_id: int) -> List[UserBlock]:
+        await asyncio.sleep(self.latency)
+        return [UserBlock(blocked_user_id=blocked)
+                for blocker, blocked in self._blocks if blocker == user_id]
+
+    async def get_connection_between(self, user1_id: int, user2_id: int) -> Optional[Dict]:
+        await asyncio.sleep(self.latency)
+        return (self._connections.get((user1_id, user2_id)) or
+                self._connections.get((user2_id, user1_id)))
+
+    async def is_blocked(self, user1_id: int, user2_id: int) -> bool:
+        await asyncio.sleep(self.latency)
+        return (user1_id, user2_id) in self._blocks
+
+    async def create_connection(self, user1_id: int, user2_id: int, status: str,
+                                suggested_at: datetime) -> Dict:
+        await asyncio.sleep(self.latency)
+        connection = {
+            'id': next(self._ids),
+            'user1_id': user1_id,
+            'user2_id': user2_id,
+            'status': status,
+            'suggested_at': suggested_at
+        }
+        self._connections[(user1_id, user2_id)] = connection
+        return connection
@@ -0,0 +1,383 @@
+# batch_job.py
+
+"""
+Nightly batch job that precomputes friend suggestions for every user.
+
+Schedules are compiled once in the parent process and shared read-only
+with a pool of worker processes (inherited through fork where
+available). The upper triangle of user pairs is split into shards of
+roughly equal size; each pair is evaluated once and scored in both
+directions, because shared classes and the point-proximity relation
+behind path overlap are symmetric. Finished users are streamed to a
+sink as soon as no running shard can still change them.
+"""
+
+from typing import List, Dict, Optional, Set, Tuple, Callable, Iterable
+from dataclasses import dataclass, field, asdict
+import json
+import logging
+import math
+import multiprocessing
+import os
+import time
+
+from friend_matching_service import (
+    FriendMatchingService,
+    FriendSuggestion,
+    TopSuggestions,
+    CompiledSchedule,
+    CompactPath,
+    PathGrid,
+    PATH_PROXIMITY_THRESHOLD
+)
+
+logger = logging.getLogger(__name__)
+
+# Read-only data shared with workers; set before the pool forks
+_STORE: Optional['SharedStore'] = None
+
+
+@dataclass
+class SharedStore:
+    """Compiled schedules and exclusion sets shared with every worker"""
+    schedules: List[CompiledSchedule]
+    excluded_ids: List[Set[int]]
+    limit: int
+    min_path_overlap: float
+    time_proximity_threshold: int
+    connection_graph: Optional[object] = None
+    mutual_connection_weight: float = 0.1
+    max_mutual_connections: int = 5
+
+
+@dataclass
+class ShardResult:
+    """Partial top suggestions produced by one shard"""
+    first_row: int
+    last_row: int
+    pairs: int
+    elapsed: float
+    partial: Dict[int, List[Tuple[float, int, FriendSuggestion]]]
+
+
+@dataclass
+class BatchJobReport:
+    """Summary of a batch run"""
+    users: int = 0
+    pairs: int = 0
+    elapsed: float = 0.0
+    shard_timings: List[Tuple[int, int, float]] = field(default_factory=list)
+
+
+class JsonlSuggestionSink:
+    """Writes one JSON line per user: {"user_id": ..., "suggestions": [...]}"""
+
+    def __init__(self, path: str):
+        self._file = open(path, 'w', encoding='utf-8')
+
+    def write(self, user_id: int, suggestions: List[FriendSuggestion]):
+        record = {
+            'user_id': user_id,
+            'suggestions': [asdict(suggestion) for suggestion in suggestions]
+        }
+        self._file.write(json.dumps(record) + '\n')
+
+    def close(self):
+        self._file.close()
+
+
+class RepositorySuggestionSink:
+    """Saves suggestions through a repository's save_suggestions(user_id, suggestions)"""
+
+    def __init__(self, suggestion_repository):
+        self.suggestion_repo = suggestion_repository
+
+    def write(self, user_id: int, suggestions: List[FriendSuggestion]):
+        self.suggestion_repo.save_suggestions(user_id, suggestions)
+
+    def close(self):
+        pass
+
+
+def mutual_path_overlap(path_a: List[Tuple[float, float]],
+                        path_b: List[Tuple[float, float]],
+                        grid_b: PathGrid) -> Tuple[float, float]:
+    """Overlap of path_a with path_b and of path_b with path_a in one pass.
+
+    Equivalent to (PathGrid(path_b).overlap_from(path_a),
+    PathGrid(path_a).overlap_from(path_b)).
+    """
+    if not path_a or not path_b:
+        return 0.0, 0.0
+
+    hits_a = 0
+    near_b: Set[Tuple[float, float]] = set()
+    cells_b = grid_b.cells
+
+    for point in path_a:
+        x, y = point
+        cx = math.floor(x / PATH_PROXIMITY_THRESHOLD)
+        cy = math.floor(y / PATH_PROXIMITY_THRESHOLD)
+        is_near = False
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                bucket = cells_b.get((cx + dx, cy + dy))
+                if bucket is None:
+                    continue
+                for other in bucket:
+                    if other in near_b and is_near:
+                        continue
+                    distance = ((x - other[0])**2 + (y - other[1])**2)**0.5
+                    if distance < PATH_PROXIMITY_THRESHOLD:
+                        is_near = True
+                        near_b.add(other)
+        if is_near:
+            hits_a += 1
+
+    hits_b = sum(1 for point in path_b if point in near_b)
+    return hits_a / len(path_a), hits_b / len(path_b)
+
+
+def _path_overlap_both_ways(path_a, grid_a, path_b, grid_b) -> Tuple[float, float]:
+    """Overlap in both directions; compact paths are weighted, so use their grids"""
+    if isinstance(path_a, CompactPath) or isinstance(path_b, CompactPath):
+        return grid_b.overlap_from(path_a), grid_a.overlap_from(path_b)
+    return mutual_path_overlap(path_a, path_b, grid_b)
+
+
+def _pair_path_overlaps(schedule_a: CompiledSchedule,
+                        schedule_b: CompiledSchedule) -> Tuple[float, float]:
+    """Average path overlap in both directions, summed in the scalar loop order"""
+    paths_a, grids_a = schedule_a.walking_paths, schedule_a.path_grids
+    paths_b, grids_b = schedule_b.walking_paths, schedule_b.path_grids
+    if not paths_a or not paths_b:
+        return 0.0, 0.0
+
+    ratios = [
+        [_path_overlap_both_ways(path_a, grid_a, path_b, grid_b)
+         for path_b, grid_b in zip(paths_b, grids_b)]
+        for path_a, grid_a in zip(paths_a, grids_a)
+    ]
+
+    total_a = 0.0
+    for row in ratios:
+        for ratio_a, _ in row:
+            total_a += ratio_a
+
+    total_b = 0.0
+    for column in range(len(paths_b)):
+        for row in ratios:
+            total_b += row[column][1]
+
+    comparisons = len(paths_a) * len(paths_b)
+    return total_a / comparisons, total_b / comparisons
+
+
+def _run_shard(bounds: Tuple[int, int]) -> ShardResult:
+    """Evaluate every pair (i, j) with first_row <= i < last_row and i < j."""
+    first_row, last_row = bounds
+    store = _STORE
+    started = time.perf_counter()
+
+    matcher = FriendMatchingService(None, None, connection_graph=store.connection_graph)
+    matcher.MIN_PATH_OVERLAP = store.min_path_overlap
+    matcher.TIME_PROXIMITY_THRESHOLD = store.time_proximity_threshold
+    matcher.MUTUAL_CONNECTION_WEIGHT = store.mutual_connection_weight
+    matcher.MAX_MUTUAL_CONNECTIONS = store.max_mutual_connections
+    graph = store.connection_graph
+
+    schedules = store.schedules
+    excluded = store.excluded_ids
+    tops: Dict[int, TopSuggestions] = {}
+    pairs = 0
+
+    def top_for(row: int) -> TopSuggestions:
+        top = tops.get(row)
+        if top is None:
+            top = tops[row] = TopSuggestions(store.limit)
+        return top
+
+    for i in range(first_row, last_row):
+        schedule_i = schedules[i]
+        top_i = top_for(i)
+        for j in range(i + 1, len(schedules)):
+            schedule_j = schedules[j]
+            wants_i = schedule_j.user_id not in excluded[i]
+            wants_j = schedule_i.user_id not in excluded[j]
+            if not wants_i and not wants_j:
+                continue
+            pairs += 1
+
+            # Same set expression as the scalar service in each direction,
+            # so shared_classes lists come out in the same order
+            shared_ij = list(schedule_i.course_ids & schedule_j.course_ids)
+            shared_ji = list(schedule_j.course_ids & schedule_i.course_ids)
+            time_ij = matcher._calculate_time_proximity(schedule_i, schedule_j)
+            time_ji = matcher._calculate_time_proximity(schedule_j, schedule_i)
+            mutual = (graph.mutual_count(schedule_i.user_id, schedule_j.user_id)
+                      if graph is not None else 0)
+
+            top_j = top_for(j)
+            min_i = top_i.min_score()
+            min_j = top_j.min_score()
+            wants_i = wants_i and (
+                min_i is None or
+                matcher._score_upper_bound(len(shared_ij), time_ij, mutual) > min_i
+            )
+            wants_j = wants_j and (
+                min_j is None or
+                matcher._score_upper_bound(len(shared_ji), time_ji, mutual) > min_j
+            )
+            if not wants_i and not wants_j:
+                continue
+
+            overlap_ij, overlap_ji = _pair_path_overlaps(schedule_i, schedule_j)
+
+            if wants_i:
+                suggestion = matcher._build_suggestion(
+                    schedule_j.user_id, shared_ij, time_ij, overlap_ij, min_score=min_i,
+                    mutual_connections=mutual
+                )
+                if suggestion and suggestion.score > 0:
+                    top_i.offer(suggestion, order=j)
+            if wants_j:
+                suggestion = matcher._build_suggestion(
+                    schedule_i.user_id, shared_ji, time_ji, overlap_ji, min_score=min_j,
+                    mutual_connections=mutual
+                )
+                if suggestion and suggestion.score > 0:
+                    top_j.offer(suggestion, order=i)
+
+    partial = {}
+    for row, top in tops.items():
+        entries = top.entries()
+        if entries:
+            partial[row] = entries
+    return ShardResult(
+        first_row=first_row,
+        last_row=last_row,
+        pairs=pairs,
+        elapsed=time.perf_counter() - started,
+        partial=partial
+    )
+
+
+def _init_worker(store: Optional[SharedStore]):
+    """Install the shared store in a worker that did not inherit it by fork"""
+    global _STORE
+    if store is not None:
+        _STORE = store
+
+
+def _shard_bounds(count: int, shards: int) -> List[Tuple[int, int]]:
+    """Split rows so each shard covers about the same number of (i < j) pairs"""
+    total_pairs = count * (count - 1) // 2
+    target = max(1, math.ceil(total_pairs / max(1, shards)))
+    bounds = []
+    first = 0
+    pairs = 0
+    for row in range(count):
+        pairs += count - 1 - row
+        if pairs >= target or row == count - 1:
+            bounds.append((first, row + 1))
+            first = row + 1
+            pairs = 0
+    return bounds
+
+
+def precompute_all_suggestions(service: FriendMatchingService, university_id: int,
+                               sink, limit: int = 10, processes: Optional[int] = None,
+                               shards: Optional[int] = None,
+                               progress: Optional[Callable[[int, int, float], None]] = None
+                               ) -> BatchJobReport:
+    """Compute the top `limit` suggestions for every user of a university.
+
+    Results written to the sink match generate_suggestions for each user.
+    processes=1 runs everything in the calling process. progress, if
+    given, is called as progress(shards_done, shards_total, elapsed).
+    """
+    global _STORE
+    started = time.perf_counter()
+
+    schedules = list(service.schedule_repo.get_schedules_by_university(
+        university_id,
+        exclude_user_ids=[]
+    ))
+    compiled = [schedule.compiled for schedule in schedules]
+    excluded = [service._excluded_user_ids(schedule.user_id) for schedule in schedules]
+    count = len(compiled)
+
+    processes = processes or os.cpu_count() or 1
+    bounds = _shard_bounds(count, shards or processes * 8) if count else []
+    report = BatchJobReport(users=count)
+
+    _STORE = SharedStore(
+        schedules=compiled,
+        excluded_ids=excluded,
+        limit=limit,
+        min_path_overlap=service.MIN_PATH_OVERLAP,
+        time_proximity_threshold=service.TIME_PROXIMITY_THRESHOLD,
+        connection_graph=service.connection_graph,
+        mutual_connection_weight=service.MUTUAL_CONNECTION_WEIGHT,
+        max_mutual_connections=service.MAX_MUTUAL_CONNECTIONS
+    )
+    logger.info(f"Batch suggestions: {count} users in {len(bounds)} shards "
+                f"on {processes} processes")
+
+    tops = [TopSuggestions(limit) for _ in range(count)]
+    pending_firsts = sorted(first for first, _ in bounds)
+    next_to_emit = 0
+
+    pool = None
+    try:
+        if processes == 1:
+            results: Iterable[ShardResult] = map(_run_shard, bounds)
+        else:
+            if 'fork' in multiprocessing.get_all_start_methods():
+                context = multiprocessing.get_context('fork')
+                initargs = (None,)
+            else:
+                context = multiprocessing.get_context()
+                initargs = (_STORE,)
+            pool = context.Pool(processes, initializer=_init_worker, initargs=initargs)
+            results = pool.imap_unordered(_run_shard, bounds)
+
+        for done, result in enumerate(results, 1):
+            for row, entries in result.partial.items():
+                for _, order, suggestion in entries:
+                    tops[row].offer(suggestion, order=order)
+
+            report.pairs += result.pairs
+            report.shard_timings.append((result.first_row, result.last_row, result.elapsed))
+            pending_firsts.remove(result.first_row)
+
+            elapsed = time.perf_counter() - started
+            logger.info(f"Shard rows {result.first_row}-{result.last_row - 1}: "
+                        f"{result.pairs} pairs in {result.elapsed:.2f}s "
+                        f"({done}/{len(bounds)} shards, {elapsed:.1f}s elapsed)")
+            if progress is not None:
+                progress(done, len(bounds), elapsed)
+
+            # A user is final once every shard whose rows start at or before it is done
+            final_before = pending_firsts[0] if pending_firsts else count
+            while next_to_emit < final_before:
+                sink.write(compiled[next_to_emit].user_id, tops[next_to_emit].results())
+                tops[next_to_emit] = None
+                next_to_emit += 1
+
+        if pool is not None:
+            pool.close()
+            pool.join()
+    finally:
+        if pool is not None:
+            pool.terminate()
+        _STORE = None
+
+    while next_to_emit < count:
+        sink.write(compiled[next_to_emit].user_id, tops[next_to_emit].results())
+        next_to_emit += 1
+
+    report.elapsed = time.perf_counter() - started
+    logger.info(f"Batch suggestions finished: {report.pairs} pairs "
+                f"in {report.elapsed:.1f}s")
+    return report
@@ -0,0 +1,386 @@
+# batch_scoring.py
+
+"""
+Vectorized batch scoring for FriendMatchingService.
+
+Packs every candidate schedule of a university into NumPy arrays once
+(course-id bitsets, minute-of-week class times and stacked path
+coordinates) and scores a user against all of them in a handful of
+array passes. Produces the same FriendSuggestion list as the scalar
+FriendMatchingService.generate_suggestions.
+
+Requires NumPy (pip install numpy).
+"""
+
+from typing import List, Dict, Optional, Iterable, Set
+import logging
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+from friend_matching_service import (
+    Schedule,
+    FriendSuggestion,
+    CompactPath,
+    FIXED_POINT_SCALE,
+    FIXED_PROXIMITY_THRESHOLD,
+    PATH_PROXIMITY_THRESHOLD
+)
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on distance-matrix cells materialised per path chunk
+MAX_CHUNK_CELLS = 4_000_000
+
+# Key differences from a grid cell to itself and its eight neighbours
+_NEIGHBOR_OFFSETS = np.array(
+    [(dx << 32) + dy for dx in (-1, 0, 1) for dy in (-1, 0, 1)], dtype=np.int64
+) if np is not None else None
+
+
+def _cell_keys(points: "np.ndarray") -> "np.ndarray":
+    """PathGrid cell of every (x, y) row, packed into one int64 per point"""
+    cells = np.floor(points / PATH_PROXIMITY_THRESHOLD).astype(np.int64)
+    return (cells[:, 0] << 32) + cells[:, 1]
+
+
+def _fixed_cell_keys(fixed_points: "np.ndarray") -> "np.ndarray":
+    """CompactPathGrid cell of every fixed-point (x, y) row, packed like _cell_keys"""
+    cells = fixed_points // FIXED_PROXIMITY_THRESHOLD
+    return (cells[:, 0] << 32) + cells[:, 1]
+
+
+def _in_cells(point_cells: "np.ndarray", user_cells: "np.ndarray") -> "np.ndarray":
+    """Mask of point_cells lying in user_cells or one of their eight neighbours"""
+    near_cells = np.unique((user_cells[:, None] + _NEIGHBOR_OFFSETS).ravel())
+    positions = np.minimum(np.searchsorted(near_cells, point_cells), len(near_cells) - 1)
+    return near_cells[positions] == point_cells
+
+
+def _popcount(words: "np.ndarray") -> "np.ndarray":
+    """Count set bits per row of a 2-D uint64 array"""
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(words).sum(axis=1, dtype=np.int64)
+    as_bytes = words.view(np.uint8).reshape(words.shape[0], -1)
+    return np.unpackbits(as_bytes, axis=1).sum(axis=1, dtype=np.int64)
+
+
+class BatchScorer:
+    """Scores one user against a packed set of candidate schedules."""
+
+    def __init__(self, candidate_schedules: Iterable[Schedule],
+                 time_proximity_threshold: int = 15,
+                 min_path_overlap: float = 0.30,
+                 connection_graph=None,
+                 mutual_connection_weight: float = 0.1,
+                 max_mutual_connections: int = 5):
+        if np is None:
+            raise ImportError("BatchScorer requires NumPy (pip install numpy)")
+
+        self.TIME_PROXIMITY_THRESHOLD = time_proximity_threshold
+        self.MIN_PATH_OVERLAP = min_path_overlap
+        self.MUTUAL_CONNECTION_WEIGHT = mutual_connection_weight
+        self.MAX_MUTUAL_CONNECTIONS = max_mutual_connections
+        self.connection_graph = connection_graph
+        self.schedules: List[Schedule] = list(candidate_schedules)
+        self._pack()
+
+    def _pack(self):
+        """Build the columnar arrays for all candidate schedules."""
+        schedules = self.schedules
+        count = len(schedules)
+
+        self.user_ids = np.array([s.user_id for s in schedules], dtype=np.int64)
+        self.row_by_user: Dict[int, int] = {
+            s.user_id: row for row, s in enumerate(schedules)
+        }
+
+        # Course-id bitsets
+        self.course_bits: Dict[str, int] = {}
+        for schedule in schedules:
+            for course in schedule.compiled.course_ids:
+                self.course_bits.setdefault(course, len(self.course_bits))
+        words = max(1, (len(self.course_bits) + 63) // 64)
+        self.course_words = np.zeros((count, words), dtype=np.uint64)
+        for row, schedule in enumerate(schedules):
+            for course in schedule.compiled.course_ids:
+                bit = self.course_bits[course]
+                self.course_words[row, bit >> 6] |= np.uint64(1 << (bit & 63))
+
+        # Class start times (minute of week), grouped by owner in candidate order
+        class_days = []
+        class_starts = []
+        class_counts = np.zeros(count, dtype=np.int64)
+        for row, schedule in enumerate(schedules):
+            compiled = schedule.compiled
+            class_counts[row] = len(compiled.class_starts)
+            class_days.extend(compiled.class_days)
+            class_starts.extend(compiled.class_starts)
+        self.class_days = np.array(class_days, dtype=np.int64)
+        self.class_starts = np.array(class_starts, dtype=np.int64)
+        self.has_classes = class_counts > 0
+        self.class_offsets = np.concatenate(([0], np.cumsum(class_counts)[:-1]))
+
+        # Stacked path coordinates; empty paths still count as comparisons
+        points = []
+        fixed_points = []
+        path_sizes = []
+        path_owners = []
+        path_slots = []
+        path_compact = []
+        self.path_counts = np.zeros(count, dtype=np.int64)
+        for row, schedule in enumerate(schedules):
+            self.path_counts[row] = len(schedule.walking_paths)
+            for slot, path in enumerate(schedule.walking_paths):
+                if not path:
+                    continue
+                points.extend(path)
+                compact = isinstance(path, CompactPath)
+                fixed_points.extend(path.coords if compact else (0, 0) * len(path))
+                path_sizes.append(len(path))
+                path_owners.append(row)
+                path_slots.append(slot)
+                path_compact.append(compact)
+        self.points = np.array(points, dtype=np.float64).reshape(-1, 2)
+        self.path_sizes = np.array(path_sizes, dtype=np.int64)
+        self.path_owners = np.array(path_owners, dtype=np.int64)
+        self.path_slots = np.array(path_slots, dtype=np.int64)
+        self.path_offsets = np.concatenate(([0], np.cumsum(self.path_sizes)))
+        self.point_paths = np.repeat(np.arange(len(path_sizes), dtype=np.int64), self.path_sizes)
+
+        # Points of compact paths are matched like CompactPathGrid does: in
+        # fixed point, with fixed-point cells and exact integer distances
+        self.fixed_points = np.array(fixed_points, dtype=np.int64).reshape(-1, 2)
+        self.point_compact = np.repeat(np.array(path_compact, dtype=bool), self.path_sizes)
+        self.point_cells = np.where(self.point_compact,
+                                    _fixed_cell_keys(self.fixed_points),
+                                    _cell_keys(self.points))
+
+        logger.debug(f"Packed {count} schedules, {len(class_starts)} classes, "
+                     f"{len(points)} path points")
+
+    def shared_class_counts(self, user_schedule: Schedule) -> "np.ndarray":
+        """Number of distinct shared courses with every candidate"""
+        user_words = np.zeros(self.course_words.shape[1], dtype=np.uint64)
+        for course in user_schedule.compiled.course_ids:
+            bit = self.course_bits.get(course)
+            if bit is not None:
+                user_words[bit >> 6] |= np.uint64(1 << (bit & 63))
+        return _popcount(self.course_words & user_words)
+
+    def time_proximities(self, user_schedule: Schedule) -> "np.ndarray":
+        """Minimum end-to-start gap per candidate, or -1 past the threshold"""
+        count = len(self.schedules)
+        if not len(self.class_starts):
+            return np.full(count, -1, dtype=np.int64)
+
+        user_compiled = user_schedule.compiled
+        best = np.full(len(self.class_starts), np.iinfo(np.int64).max, dtype=np.int64)
+        for day, user_end in zip(user_compiled.class_days, user_compiled.class_ends):
+            same_day = self.class_days == day
+            diff = np.abs(self.class_starts - user_end)
+            np.minimum(best, diff, out=best, where=same_day)
+
+        min_diff = np.full(count, np.iinfo(np.int64).max, dtype=np.int64)
+        min_diff[self.has_classes] = np.minimum.reduceat(
+            best, self.class_offsets[self.has_classes]
+        )
+        return np.where(min_diff <= self.TIME_PROXIMITY_THRESHOLD, min_diff, -1)
+
+    def path_overlaps(self, user_schedule: Schedule) -> "np.ndarray":
+        """Average pairwise path overlap with every candidate"""
+        count = len(self.schedules)
+        totals = np.zeros(count, dtype=np.float64)
+        user_paths = user_schedule.walking_paths
+        if not user_paths or not len(self.path_sizes):
+            return totals
+
+        max_slots = int(self.path_slots.max()) + 1
+        for user_path in user_paths:
+            if not user_path:
+                continue
+            if isinstance(user_path, CompactPath):
+                fixed = np.frombuffer(user_path.coords, dtype=np.int32).reshape(-1, 2)
+                ratios = self._overlap_ratios(
+                    fixed / FIXED_POINT_SCALE,
+                    fixed.astype(np.int64),
+                    np.frombuffer(user_path.weights, dtype=np.uint32)
+                )
+            else:
+                user_points = np.array(user_path, dtype=np.float64)
+                # CompactPathGrid rounds raw query points to fixed point
+                ratios = self._overlap_ratios(
+                    user_points,
+                    np.rint(user_points * FIXED_POINT_SCALE).astype(np.int64)
+                )
+            # Accumulate in the scalar loop order so sums match bit-for-bit
+            for slot in range(max_slots):
+                in_slot = self.path_slots == slot
+                totals[self.path_owners[in_slot]] += ratios[in_slot]
+
+        comparisons = len(user_paths) * self.path_counts
+        overlaps = np.zeros(count, dtype=np.float64)
+        np.divide(totals, comparisons, out=overlaps, where=comparisons > 0)
+        return overlaps
+
+    def _overlap_ratios(self, user_points: "np.ndarray", user_fixed: "np.ndarray",
+                        weights: Optional["np.ndarray"] = None) -> "np.ndarray":
+        """Fraction of user_points (by weight) near each packed (non-empty) path.
+
+        user_fixed holds the same points in fixed point. Only packed points
+        in the user's grid cells or their neighbours can be near, as in
+        PathGrid and CompactPathGrid, so distances are computed for those
+        points alone. Raw packed paths use the float distance test of
+        PathGrid and compact ones the integer test of CompactPathGrid.
+        """
+        hits = np.zeros(len(self.path_sizes), dtype=np.int64)
+        total = len(user_points) if weights is None else int(weights.sum())
+        in_float_cells = _in_cells(self.point_cells, _cell_keys(user_points))
+        in_fixed_cells = _in_cells(self.point_cells, _fixed_cell_keys(user_fixed))
+        candidates = np.flatnonzero(np.where(self.point_compact, in_fixed_cells, in_float_cells))
+        if not len(candidates):
+            return hits / total
+
+        # Candidate points stay grouped by path, in packing order
+        paths = self.point_paths[candidates]
+        firsts = np.flatnonzero(np.concatenate(([True], paths[1:] != paths[:-1])))
+        bounds = np.append(firsts, len(candidates))
+        chunk_points = max(1, MAX_CHUNK_CELLS // len(user_points))
+        ux = user_points[:, 0:1]
+        uy = user_points[:, 1:2]
+        fx = user_fixed[:, 0:1]
+        fy = user_fixed[:, 1:2]
+        fixed_limit = FIXED_PROXIMITY_THRESHOLD * FIXED_PROXIMITY_THRESHOLD
+
+        first = 0
+        while first < len(firsts):
+            last = int(np.searchsorted(bounds, bounds[first] + chunk_points, side='right')) - 1
+            last = min(max(last, first + 1), len(firsts))
+            lo, hi = bounds[first], bounds[last]
+            chunk = candidates[lo:hi]
+
+            compact = self.point_compact[chunk]
+            close = np.zeros((len(user_points), len(chunk)), dtype=bool)
+            if not compact.all():
+                raw = ~compact
+                dx = ux - self.points[chunk[raw], 0]
+                dy = uy - self.points[chunk[raw], 1]
+                close[:, raw] = np.sqrt(dx**2 + dy**2) < PATH_PROXIMITY_THRESHOLD
+            if compact.any():
+                dx = fx - self.fixed_points[chunk[compact], 0]
+                dy = fy - self.fixed_points[chunk[compact], 1]
+                close[:, compact] = dx * dx + dy * dy < fixed_limit
+            near_path = np.logical_or.reduceat(close, bounds[first:last] - lo, axis=1)
+            rows = paths[firsts[first:last]]
+            if weights is None:
+                hits[rows] = near_path.sum(axis=0)
+            else:
+                hits[rows] = weights @ near_path
+            first = last
+
+        return hits / total
+
+    def mutual_connections(self, user_schedule: Schedule) -> "np.ndarray":
+        """Mutual connection count with every candidate (zeros without a graph)"""
+        graph = self.connection_graph
+        if graph is None:
+            return np.zeros(len(self.schedules), dtype=np.int64)
+        user_id = user_schedule.user_id
+        return np.fromiter(
+            (graph.mutual_count(user_id, candidate_id) for candidate_id in self.user_ids.tolist()),
+            dtype=np.int64,
+            count=len(self.schedules)
+        )
+
+    def score(self, user_schedule: Schedule) -> Dict[str, "np.ndarray"]:
+        """Compute every match component and the final score per candidate."""
+        shared = self.shared_class_counts(user_schedule)
+        time_proximity = self.time_proximities(user_schedule)
+        path_overlap = self.path_overlaps(user_schedule)
+        mutual = self.mutual_connections(user_schedule)
+
+        score = (
+            shared * 0.4 +
+            path_overlap * 0.4 +
+            np.where(time_proximity > 0, 1.0, 0.0) * 0.2
+        )
+        if mutual.any():
+            score = score + (
+                np.minimum(mutual, self.MAX_MUTUAL_CONNECTIONS) * self.MUTUAL_CONNECTION_WEIGHT
+            )
+
+        return {
+            'shared_count': shared,
+            'time_proximity': time_proximity,
+            'path_overlap': path_overlap,
+            'mutual_connections': mutual,
+            'score': score
+        }
+
+    def suggestions(self, user_schedule: Schedule, limit: int = 10,
+                    exclude_user_ids: Optional[Set[int]] = None) -> List[FriendSuggestion]:
+        """Top suggestions for user_schedule, ordered like the scalar path."""
+        components = self.score(user_schedule)
+        shared = components['shared_count']
+        path_overlap = components['path_overlap']
+        score = components['score']
+
+        keep = (score >= 0.3) & (score > 0)
+        keep &= (shared > 0) | (path_overlap >= self.MIN_PATH_OVERLAP)
+        if exclude_user_ids:
+            keep &= ~np.isin(self.user_ids, list(exclude_user_ids))
+
+        rows = np.flatnonzero(keep)
+        rows = rows[np.argsort(-score[rows], kind='stable')][:limit]
+
+        user_courses = user_schedule.compiled.course_ids
+        suggestions = []
+        for row in rows:
+            candidate = self.schedules[row]
+            suggestions.append(FriendSuggestion(
+                suggested_user_id=candidate.user_id,
+                score=float(score[row]),
+                shared_classes=list(user_courses & candidate.compiled.course_ids),
+                path_overlap_percent=float(path_overlap[row]) * 100,
+                time_proximity_minutes=int(components['time_proximity'][row]),
+                mutual_connections=int(components['mutual_connections'][row])
+            ))
+
+        return suggestions
+
+
+if __name__ == '__main__':
+    import time
+    from friend_matching_service import FriendMatchingService
+    from benchmark import (
+        generate_campus,
+        CampusScheduleRepository,
+        CampusConnectionRepository
+    )
+
+    schedules = generate_campus(2000, seed=42, path_points=(20, 60))
+
+    service = FriendMatchingService(
+        CampusScheduleRepository(schedules),
+        CampusConnectionRepository()
+    )
+    queries = list(range(1, 21))
+
+    start = time.perf_counter()
+    scalar = [service.generate_suggestions(user_id) for user_id in queries]
+    scalar_elapsed = time.perf_counter() - start
+
+    # The first batch call packs the university; later calls reuse it
+    start = time.perf_counter()
+    batch = [service.generate_suggestions_batch(queries[0])]
+    pack_elapsed = time.perf_counter() - start
+    batch += [service.generate_suggestions_batch(user_id) for user_id in queries[1:]]
+    batch_elapsed = time.perf_counter() - start
+
+    assert scalar == batch, "batch results differ from the scalar path"
+    print(f"{len(schedules)} candidates, {len(queries)} queries")
+    print(f"  scalar: {len(queries) / scalar_elapsed:8.1f} queries/s")
+    print(f"  batch:  {len(queries) / batch_elapsed:8.1f} queries/s "
+          f"(first call, with packing, {pack_elapsed * 1000:.0f} ms)")
@@ -0,0 +1,384 @@
+# benchmark.py
+
+"""
+Benchmark harness for the friend matching engine.
+
+Generates a seeded synthetic campus (buildings, course sections with
+MWF/TTh meeting patterns, student timetables and GPS walking paths
+between consecutive classes) and times generate_suggestions,
+_calculate_path_overlap and _calculate_time_proximity at several scales.
+
+Usage:
+    python benchmark.py                              # 1k, 10k and 100k students
+    python benchmark.py --scales 1000 5000 --queries 50
+    python benchmark.py --scales 10000 --compact-paths
+    python benchmark.py --scales 10000 --lsh 16x4 32x3     # approximate mode recall
+    python benchmark.py --save-baseline baseline.json
+    python benchmark.py --compare baseline.json      # exit 1 on regression
+"""
+
+from typing import List, Dict, Tuple, Callable, Optional, Sequence
+import argparse
+import json
+import logging
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+from friend_matching_service import FriendMatchingService, Schedule
+
+logger = logging.getLogger(__name__)
+
+CAMPUS_CENTER = (40.7128, -74.0060)
+CAMPUS_SPAN = 0.012
+MEETING_PATTERNS = [
+    (('Monday', 'Wednesday', 'Friday'), 50),
+    (('Tuesday', 'Thursday'), 75),
+    (('Monday', 'Wednesday'), 75),
+]
+
+
+def _clock(minutes: int) -> str:
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def generate_campus(num_students: int, seed: int = 0,
+                    path_points: Tuple[int, int] = (20, 60),
+                    classes_per_student: Tuple[int, int] = (3, 5),
+                    num_buildings: int = 25,
+                    num_courses: Optional[int] = None) -> List[Schedule]:
+    """Generate a reproducible campus of student schedules.
+
+    path_points is the (min, max) number of GPS samples per walking path.
+    """
+    rng = random.Random(seed)
+    num_courses = num_courses or max(20, num_students // 25)
+
+    buildings = [
+        (CAMPUS_CENTER[0] + rng.uniform(-CAMPUS_SPAN, CAMPUS_SPAN) / 2,
+         CAMPUS_CENTER[1] + rng.uniform(-CAMPUS_SPAN, CAMPUS_SPAN) / 2)
+        for _ in range(num_buildings)
+    ]
+
+    courses = []
+    for number in range(num_courses):
+        days, duration = rng.choice(MEETING_PATTERNS)
+        start = rng.randrange(8 * 60, 18 * 60, 30)
+        courses.append({
+            'course': f"{rng.choice(['CS', 'MATH', 'PHYS', 'ENG', 'HIST', 'BIO'])}{100 + number}",
+            'building': rng.randrange(num_buildings),
+            'days': days,
+            'start': start,
+            'end': start + duration
+        })
+    # Popular intro courses get most of the enrolment
+    weights = [1.0 / (rank + 1) ** 0.8 for rank in range(num_courses)]
+
+    schedules = []
+    for user_id in range(1, num_students + 1):
+        enrolled = set()
+        target = rng.randint(*classes_per_student)
+        while len(enrolled) < min(target, num_courses):
+            enrolled.add(rng.choices(range(num_courses), weights)[0])
+
+        classes = []
+        for index in sorted(enrolled):
+            course = courses[index]
+            for day in course['days']:
+                classes.append({
+                    'course': course['course'],
+                    'building': f"Building {course['building']}",
+                    'day': day,
+                    'start_time': _clock(course['start']),
+                    'end_time': _clock(course['end']),
+                    '_building_index': course['building'],
+                    '_start': course['start']
+                })
+
+        walking_paths = []
+        seen_legs = set()
+        by_day: Dict[str, List[Dict]] = {}
+        for cls in classes:
+            by_day.setdefault(cls['day'], []).append(cls)
+        for day_classes in by_day.values():
+            day_classes.sort(key=lambda cls: cls['_start'])
+            for current, following in zip(day_classes, day_classes[1:]):
+                leg = (current['_building_index'], following['_building_index'])
+                if leg[0] == leg[1] or leg in seen_legs:
+                    continue
+                seen_legs.add(leg)
+                walking_paths.append(_walk(rng, buildings[leg[0]], buildings[leg[1]], path_points))
+
+        for cls in classes:
+            del cls['_building_index'], cls['_start']
+        schedules.append(Schedule(user_id=user_id, classes=classes, walking_paths=walking_paths))
+
+    return schedules
+
+
+def _walk(rng: random.Random, origin: Tuple[float, float], destination: Tuple[float, float],
+          path_points: Tuple[int, int]) -> List[Tuple[float, float]]:
+    """GPS samples along a straight walk with a little sensor noise"""
+    count = rng.randint(*path_points)
+    steps = max(1, count - 1)
+    return [
+        (origin[0] + (destination[0] - origin[0]) * step / steps + rng.gauss(0, 0.00005),
+         origin[1] + (destination[1] - origin[1]) * step / steps + rng.gauss(0, 0.00005))
+        for step in range(count)
+    ]
+
+
+class CampusScheduleRepository:
+    """Schedule repository over a generated campus"""
+
+    def __init__(self, schedules: List[Schedule]):
+        self.schedules = schedules
+        self._by_user = {schedule.user_id: schedule for schedule in schedules}
+
+    def get_schedule_by_user(self, user_id: int) -> Optional[Schedule]:
+        return self._by_user.get(user_id)
+
+    def get_schedules_by_university(self, university_id: int, exclude_user_ids: List[int]):
+        excluded = set(exclude_user_ids)
+        return [s for s in self.schedules if s.user_id not in excluded]
+
+    def get_schedules_by_university_page(self, university_id: int, exclude_user_ids: List[int],
+                                         after_user_id: Optional[int] = None,
+                                         page_size: int = 500) -> List[Schedule]:
+        # Generated user ids are 1..n in list order
+        excluded = set(exclude_user_ids)
+        page = []
+        for schedule in self.schedules[after_user_id or 0:]:
+            if schedule.user_id in excluded:
+                continue
+            page.append(schedule)
+            if len(page) == page_size:
+                break
+        return page
+
+
+class CampusConnectionRepository:
+    """Connection repository with no connections or blocks"""
+
+    def get_connections(self, user_id: int) -> list:
+        return []
+
+    def get_blocked_users(self, user_id: int) -> list:
+        return []
+
+
+def _percentile(samples: List[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _time_calls(call: Callable[[int], object], count: int) -> Dict[str, float]:
+    """Run call(i) count times and summarise latency in milliseconds"""
+    samples = []
+    started = time.perf_counter()
+    for i in range(count):
+        call_started = time.perf_counter()
+        call(i)
+        samples.append((time.perf_counter() - call_started) * 1000)
+    elapsed = time.perf_counter() - started
+    return {
+        'p50_ms': _percentile(samples, 0.50),
+        'p99_ms': _percentile(samples, 0.99),
+        'mean_ms': statistics.fmean(samples),
+        'throughput_per_s': count / elapsed if elapsed > 0 else float('inf')
+    }
+
+
+def run_scale(num_students: int, queries: int = 20, pair_samples: int = 2000,
+              seed: int = 0, path_points: Tuple[int, int] = (20, 60),
+              use_index: bool = False,
+              compact_paths: bool = False,
+              stream: bool = False,
+              lsh_settings: Sequence[Tuple[int, int]] = ()) -> Dict[str, Dict[str, float]]:
+    """Benchmark one campus size and return the metrics per operation."""
+    tracemalloc.start()
+    schedules = generate_campus(num_students, seed=seed, path_points=path_points)
+    if compact_paths:
+        from path_compaction import compact_schedules
+        schedules = compact_schedules(schedules)
+    campus_memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    candidate_index = None
+    if use_index:
+        from candidate_index import CandidateIndex
+        candidate_index = CandidateIndex(schedules)
+
+    service = FriendMatchingService(
+        CampusScheduleRepository(schedules),
+        CampusConnectionRepository(),
+        candidate_index=candidate_index
+    )
+    suggest = service.top_suggestions if stream else service.generate_suggestions
+    rng = random.Random(seed + 1)
+    query_users = [rng.randrange(1, num_students + 1) for _ in range(queries)]
+    pairs = [(rng.choice(schedules).compiled, rng.choice(schedules).compiled)
+             for _ in range(pair_samples)]
+
+    results = {
+        'generate_suggestions': _time_calls(
+            lambda i: suggest(query_users[i]), queries
+        ),
+        'path_overlap': _time_calls(
+            lambda i: service._calculate_path_overlap(*pairs[i]), pair_samples
+        ),
+        'time_proximity': _time_calls(
+            lambda i: service._calculate_time_proximity(*pairs[i]), pair_samples
+        ),
+    }
+
+    tracemalloc.start()
+    for user_id in query_users[:min(3, queries)]:
+        suggest(user_id)
+    results['generate_suggestions']['peak_memory_mb'] = (
+        tracemalloc.get_traced_memory()[1] / 2**20
+    )
+    tracemalloc.stop()
+
+    for bands, rows in lsh_settings:
+        results[f"lsh_{bands}x{rows}"] = measure_lsh(
+            schedules, query_users, bands, rows, exact=service
+        )
+
+    results['campus'] = {
+        'students': num_students,
+        'path_points': sum(len(p) for s in schedules for p in s.walking_paths),
+        'memory_mb': campus_memory / 2**20
+    }
+    return results
+
+
+def measure_lsh(schedules: List[Schedule], query_users: List[int], bands: int, rows: int,
+                exact: FriendMatchingService) -> Dict[str, float]:
+    """Time a PathLSHIndex setting and measure its recall against exact matching.
+
+    recall is the share of exact top suggestions also returned in
+    approximate mode; path_recall the share of all exact suggestions
+    without shared classes (the ones only LSH can find).
+    """
+    from path_lsh import PathLSHIndex
+
+    started = time.perf_counter()
+    index = PathLSHIndex(schedules, bands=bands, rows=rows)
+    build_seconds = time.perf_counter() - started
+
+    service = FriendMatchingService(
+        exact.schedule_repo,
+        exact.connection_repo,
+        candidate_index=index
+    )
+    metrics = _time_calls(lambda i: service.generate_suggestions(query_users[i]),
+                          len(query_users))
+
+    found = expected = path_found = path_expected = candidates = 0
+    for user_id in query_users:
+        exact_top = {s.suggested_user_id for s in exact.generate_suggestions(user_id)}
+        approx_top = {s.suggested_user_id for s in service.generate_suggestions(user_id)}
+        found += len(exact_top & approx_top)
+        expected += len(exact_top)
+
+        exact_paths = {s.suggested_user_id for s in exact.iter_suggestions(user_id)
+                       if not s.shared_classes}
+        approx_paths = {s.suggested_user_id for s in service.iter_suggestions(user_id)
+                        if not s.shared_classes}
+        path_found += len(exact_paths & approx_paths)
+        path_expected += len(exact_paths)
+        candidates += len(index.candidates(index.get(user_id), {user_id}))
+
+    metrics.update({
+        'build_s': build_seconds,
+        'recall': found / expected if expected else 1.0,
+        'path_recall': path_found / path_expected if path_expected else 1.0,
+        'candidates_per_query': candidates / max(1, len(query_users))
+    })
+    return metrics
+
+
+def compare_to_baseline(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """List operations whose p50 latency regressed by more than tolerance"""
+    regressions = []
+    for scale, operations in results.items():
+        for operation, metrics in operations.items():
+            previous = baseline.get(scale, {}).get(operation, {})
+            if 'p50_ms' not in metrics or 'p50_ms' not in previous:
+                continue
+            ratio = metrics['p50_ms'] / previous['p50_ms'] if previous['p50_ms'] else 1.0
+            print(f"  {scale:>8} {operation:<22} p50 {metrics['p50_ms']:9.3f} ms "
+                  f"(baseline {previous['p50_ms']:9.3f} ms, x{ratio:.2f})")
+            if ratio > 1.0 + tolerance:
+                regressions.append(f"{scale}/{operation}: x{ratio:.2f}")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--scales', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--queries', type=int, default=20)
+    parser.add_argument('--pairs', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--path-points', type=int, nargs=2, default=[20, 60],
+                        metavar=('MIN', 'MAX'))
+    parser.add_argument('--index', action='store_true',
+                        help='use a CandidateIndex to pre-filter candidates')
+    parser.add_argument('--compact-paths', action='store_true',
+                        help='store walking paths in compacted fixed-point form')
+    parser.add_argument('--stream', action='store_true',
+                        help='use top_suggestions, which streams candidates page by page')
+    parser.add_argument('--lsh', nargs='+', default=[], metavar='BANDSxROWS',
+                        help='also measure approximate PathLSHIndex settings, e.g. 16x4 32x3')
+    parser.add_argument('--save-baseline', metavar='PATH')
+    parser.add_argument('--compare', metavar='PATH')
+    parser.add_argument('--tolerance', type=float, default=0.20,
+                        help='allowed p50 slowdown before flagging a regression')
+    args = parser.parse_args(argv)
+    lsh_settings = [tuple(int(n) for n in setting.lower().split('x')) for setting in args.lsh]
+
+    results = {}
+    for scale in args.scales:
+        print(f"Campus with {scale} students...")
+        metrics = run_scale(scale, queries=args.queries, pair_samples=args.pairs,
+                            seed=args.seed, path_points=tuple(args.path_points),
+                            use_index=args.index, compact_paths=args.compact_paths,
+                            stream=args.stream, lsh_settings=lsh_settings)
+        results[str(scale)] = metrics
+        campus = metrics['campus']
+        print(f"  {campus['path_points']} path points, {campus['memory_mb']:.1f} MB")
+        for operation in ('generate_suggestions', 'path_overlap', 'time_proximity'):
+            m = metrics[operation]
+            line = (f"  {operation:<22} p50 {m['p50_ms']:9.3f} ms  p99 {m['p99_ms']:9.3f} ms  "
+                    f"{m['throughput_per_s']:10.1f}/s")
+            if 'peak_memory_mb' in m:
+                line += f"  peak {m['peak_memory_mb']:.1f} MB"
+            print(line)
+        for operation, m in metrics.items():
+            if operation.startswith('lsh_'):
+                print(f"  {operation:<22} p50 {m['p50_ms']:9.3f} ms  recall {m['recall']:.3f}  "
+                      f"path recall {m['path_recall']:.3f}  "
+                      f"{m['candidates_per_query']:.0f} candidates  build {m['build_s']:.1f} s")
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w', encoding='utf-8') as baseline_file:
+            json.dump(results, baseline_file, indent=2)
+        print(f"Baseline saved to {args.save_baseline}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as baseline_file:
+            baseline = json.load(baseline_file)
+        print(f"Comparison with {args.compare}:")
+        regressions = compare_to_baseline(results, baseline, args.tolerance)
+        if regressions:
+            print("Regressions: " + ", ".join(regressions))
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,115 @@
+# candidate_index.py
+
+from typing import List, Dict, Optional, Set, Tuple, Iterable
+import logging
+import threading
+
+from friend_matching_service import Schedule
+
+logger = logging.getLogger(__name__)
+
+
+class CandidateIndex:
+    """In-memory inverted index from courses and path grid cells to users.
+
+    A candidate can only pass the matching gates if it shares a course
+    with the user or has a path point within the proximity threshold of
+    one of the user's points (time proximity alone scores 0.2, below the
+    0.3 cut-off). The index returns exactly that union, so the remaining
+    schedules never need to be scored.
+
+    The index covers one university: it returns every indexed schedule
+    that passes the gates, without the university filter that
+    get_schedules_by_university applies. Index only one university's
+    schedules and give each university its own index and service.
+
+    Keep it in sync with the schedule repository through add/remove (or
+    FriendMatchingService.notify_schedule_changed).
+    """
+
+    def __init__(self, schedules: Iterable[Schedule] = ()):
+        self._schedules: Dict[int, Schedule] = {}
+        self._position: Dict[int, int] = {}
+        self._next_position = 0
+        self._keys: Dict[int, Tuple[frozenset, Set[Tuple[int, int]]]] = {}
+        self._by_course: Dict[str, Set[int]] = {}
+        self._by_cell: Dict[Tuple[int, int], Set[int]] = {}
+        self._lock = threading.RLock()
+        for schedule in schedules:
+            self.add(schedule)
+
+    def __len__(self) -> int:
+        return len(self._schedules)
+
+    def get(self, user_id: int) -> Optional[Schedule]:
+        """Return the indexed schedule for a user"""
+        return self._schedules.get(user_id)
+
+    def add(self, schedule: Schedule):
+        """Index a schedule, replacing any previous one for the same user."""
+        user_id = schedule.user_id
+        with self._lock:
+            if user_id in self._schedules:
+                self._unindex(user_id)
+            else:
+                self._position[user_id] = self._next_position
+                self._next_position += 1
+
+            self._schedules[user_id] = schedule
+            compiled = schedule.compiled
+            courses = compiled.course_ids
+            cells = self._cells(compiled.path_grids)
+            self._keys[user_id] = (courses, cells)
+            for course in courses:
+                self._by_course.setdefault(course, set()).add(user_id)
+            for cell in cells:
+                self._by_cell.setdefault(cell, set()).add(user_id)
+
+    def remove(self, user_id: int):
+        """Drop a user's schedule from the index."""
+        with self._lock:
+            if self._schedules.pop(user_id, None) is not None:
+                self._unindex(user_id)
+                del self._position[user_id]
+
+    def candidates(self, user_schedule: Schedule,
+                   exclude_user_ids: Iterable[int] = ()) -> List[Schedule]:
+        """Schedules that could pass the matching gates, in indexing order"""
+        compiled = user_schedule.compiled
+        with self._lock:
+            hits: Set[int] = set()
+            for course in compiled.course_ids:
+                hits |= self._by_course.get(course, set())
+
+            for cx, cy in self._cells(compiled.path_grids):
+                for dx in (-1, 0, 1):
+                    for dy in (-1, 0, 1):
+                        users = self._by_cell.get((cx + dx, cy + dy))
+                        if users:
+                            hits |= users
+
+            hits.difference_update(exclude_user_ids)
+            ordered = sorted(hits, key=self._position.__getitem__)
+            return [self._schedules[user_id] for user_id in ordered]
+
+    def _unindex(self, user_id: int):
+        courses, cells = self._keys.pop(user_id)
+        for course in courses:
+            users = self._by_course.get(course)
+            if users is not None:
+                users.discard(user_id)
+                if not users:
+                    del self._by_course[course]
+        for cell in cells:
+            users = self._by_cell.get(cell)
+            if users is not None:
+                users.discard(user_id)
+                if not users:
+                    del self._by_cell[cell]
+
+    @staticmethod
+    def _cells(path_grids) -> Set[Tuple[int, int]]:
+        cells: Set[Tuple[int, int]] = set()
+        for grid in path_grids:
+            cells.update(grid.cells)
+        return cells
@@ -0,0 +1,193 @@
+# connection_graph.py
+
+from typing import List, Dict, Optional, Tuple, Iterable, Sequence
+from array import array
+import bisect
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+def sorted_intersection_count(a: Sequence[int], b: Sequence[int]) -> int:
+    """Count common values of two ascending sequences without duplicates.
+
+    Walks both sequences in step, or binary-searches the shorter one's
+    values in the longer one when their sizes are far apart.
+    """
+    if len(a) > len(b):
+        a, b = b, a
+    if not a:
+        return 0
+
+    count = 0
+    if len(a) * 8 < len(b):
+        low = 0
+        for value in a:
+            low = bisect.bisect_left(b, value, low)
+            if low == len(b):
+                break
+            if b[low] == value:
+                count += 1
+        return count
+
+    i = j = 0
+    while i < len(a) and j < len(b):
+        if a[i] < b[j]:
+            i += 1
+        elif a[i] > b[j]:
+            j += 1
+        else:
+            count += 1
+            i += 1
+            j += 1
+    return count
+
+
+class ConnectionGraph:
+    """In-memory graph of accepted connections in CSR form.
+
+    Neighbour ids of every user are stored sorted in one flat array, with
+    per-user offsets, so mutual connections are a sorted-array
+    intersection with no repository round trip. Connections accepted
+    after loading go to a small per-user overlay that is folded into the
+    arrays once it grows past `rebuild_after` edges.
+    """
+
+    def __init__(self, edges: Iterable[Tuple[int, int]] = (), rebuild_after: int = 10000):
+        self.rebuild_after = rebuild_after
+        self._rows: Dict[int, int] = {}
+        self._offsets = array('q', [0])
+        self._neighbors = array('q')
+        self._view = memoryview(self._neighbors)
+        self._extra: Dict[int, List[int]] = {}
+        self._extra_edges = 0
+        self._pending: Dict[int, Tuple[int, int]] = {}
+        self._lock = threading.RLock()
+        self._build(self._adjacency(edges))
+
+    @classmethod
+    def from_repository(cls, connection_repository, user_ids: Iterable[int],
+                        **kwargs) -> 'ConnectionGraph':
+        """Load connections of user_ids through get_connections.
+
+        Accepted connections become edges; pending ones are remembered by
+        id so accepting them later adds their edge.
+        """
+        edges = []
+        pending = {}
+        for user_id in user_ids:
+            for conn in connection_repository.get_connections(user_id):
+                if conn.status == 'accepted':
+                    edges.append((user_id, conn.other_user_id))
+                elif conn.status == 'pending':
+                    pending[conn.id] = (user_id, conn.other_user_id)
+        graph = cls(edges, **kwargs)
+        graph._pending.update(pending)
+        logger.info(f"Loaded connection graph: {len(graph._rows)} users, "
+                    f"{len(graph._neighbors) // 2} connections, {len(pending)} pending")
+        return graph
+
+    def neighbors(self, user_id: int) -> List[int]:
+        """Sorted ids of a user's accepted connections"""
+        with self._lock:
+            base = self._row(user_id)
+            extra = self._extra.get(user_id)
+            if not extra:
+                return list(base)
+            return sorted(list(base) + extra)
+
+    def degree(self, user_id: int) -> int:
+        """Number of accepted connections of a user"""
+        with self._lock:
+            return len(self._row(user_id)) + len(self._extra.get(user_id, ()))
+
+    def mutual_count(self, user1_id: int, user2_id: int) -> int:
+        """Number of users connected to both user1_id and user2_id"""
+        with self._lock:
+            base1 = self._row(user1_id)
+            base2 = self._row(user2_id)
+            count = sorted_intersection_count(base1, base2)
+
+            # Overlay edges are disjoint from the arrays, so the parts add up
+            extra1 = self._extra.get(user1_id)
+            extra2 = self._extra.get(user2_id)
+            if extra1:
+                count += sorted_intersection_count(extra1, base2)
+                if extra2:
+                    count += sorted_intersection_count(extra1, extra2)
+            if extra2:
+                count += sorted_intersection_count(base1, extra2)
+            return count
+
+    def add_connection(self, user1_id: int, user2_id: int):
+        """Record an accepted connection."""
+        if user1_id == user2_id:
+            return
+        with self._lock:
+            if self._has_edge(user1_id, user2_id):
+                return
+            for user_id, other_id in ((user1_id, user2_id), (user2_id, user1_id)):
+                bisect.insort(self._extra.setdefault(user_id, []), other_id)
+            self._extra_edges += 1
+            if self._extra_edges > self.rebuild_after:
+                self.compact()
+
+    def request_added(self, connection: Dict):
+        """Remember a pending connection so accepting it can add the edge."""
+        with self._lock:
+            self._pending[connection['id']] = (connection['user1_id'], connection['user2_id'])
+
+    def connection_accepted(self, connection_id: int) -> Optional[Tuple[int, int]]:
+        """Add the edge of a pending request; returns its users, or None if unknown"""
+        with self._lock:
+            users = self._pending.pop(connection_id, None)
+            if users is not None:
+                self.add_connection(*users)
+            return users
+
+    def compact(self):
+        """Fold overlay edges into the CSR arrays."""
+        with self._lock:
+            adjacency: Dict[int, List[int]] = {}
+            for user_id in set(self._rows) | set(self._extra):
+                adjacency[user_id] = self.neighbors(user_id)
+            self._build(adjacency)
+
+    def _build(self, adjacency: Dict[int, List[int]]):
+        rows: Dict[int, int] = {}
+        offsets = array('q', [0])
+        neighbors = array('q')
+        for row, user_id in enumerate(sorted(adjacency)):
+            rows[user_id] = row
+            neighbors.extend(adjacency[user_id])
+            offsets.append(len(neighbors))
+        self._rows = rows
+        self._offsets = offsets
+        self._neighbors = neighbors
+        self._view = memoryview(neighbors)
+        self._extra = {}
+        self._extra_edges = 0
+
+    def _row(self, user_id: int) -> Sequence[int]:
+        row = self._rows.get(user_id)
+        if row is None:
+            return ()
+        return self._view[self._offsets[row]:self._offsets[row + 1]]
+
+    def _has_edge(self, user1_id: int, user2_id: int) -> bool:
+        base = self._row(user1_id)
+        position = bisect.bisect_left(base, user2_id)
+        if position < len(base) and base[position] == user2_id:
+            return True
+        return user2_id in self._extra.get(user1_id, ())
+
+    @staticmethod
+    def _adjacency(edges: Iterable[Tuple[int, int]]) -> Dict[int, List[int]]:
+        adjacency: Dict[int, set] = {}
+        for user1_id, user2_id in edges:
+            if user1_id == user2_id:
+                continue
+            adjacency.setdefault(user1_id, set()).add(user2_id)
+            adjacency.setdefault(user2_id, set()).add(user1_id)
+        return {user_id: sorted(others) for user_id, others in adjacency.items()}
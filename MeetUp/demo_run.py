@@ -119,6 +119,24 @@ class MockConnectionRepository:
             'status': status,
             'suggested_at': suggested_at
         }
+    
+    def get_connections_between(self, user_id, other_user_ids):
+        return []  # No existing connections
+    
+    def get_blocked_between(self, user_id, other_user_ids):
+        return [3]  # Charlie has blocked Alice
+    
+    def create_connections(self, user1_id, user2_ids, status, suggested_at):
+        return [
+            {
+                'id': connection_id,
+                'user1_id': user1_id,
+                'user2_id': user2_id,
+                'status': status,
+                'suggested_at': suggested_at
+            }
+            for connection_id, user2_id in enumerate(user2_ids, start=2)
+        ]
 
 # Initialize service with mock repositories
 schedule_repo = MockScheduleRepository()
@@ -162,6 +180,19 @@ accepted = friend_service.accept_connection(
 print(f"✓ Connection accepted! Status: {accepted['status']}")
 print()
 
+# Demo: Invite several classmates at once
+print("Alice invites users 3, 4 and 5 in one request")
+results = friend_service.create_connection_requests(
+    requesting_user_id=1,
+    target_user_ids=[3, 4, 5]
+)
+for result in results:
+    if result['success']:
+        print(f"✓ User {result['target_user_id']}: {result['connection']['status']}")
+    else:
+        print(f"✗ User {result['target_user_id']}: {result['error']}")
+print()
+
 print("=" * 70)
 print()
 
@@ -194,6 +225,9 @@ print("  POST   /api/messages")
 print("         Send a message to a friend")
 print("         Body: {recipient_id, content, message_type}")
 print()
+print("  POST   /api/messages/batch")
+print("         Send several messages: {messages: [...]}")
+print()
 print("  GET    /api/messages/conversation/<user_id>")
 print("         Get message history with a specific user")
 print()
@@ -203,12 +237,24 @@ print()
 print("  PUT    /api/messages/<message_id>/read")
 print("         Mark a message as read")
 print()
+print("  PUT    /api/messages/read")
+print("         Mark several messages as read: {message_ids: [...]}")
+print()
+print("  PUT    /api/messages/conversation/<user_id>/read")
+print("         Mark a conversation as read (optionally up to up_to_id)")
+print()
 print("  DELETE /api/messages/<message_id>")
 print("         Delete a message")
 print()
 print("  GET    /api/messages/unread/count")
 print("         Get count of unread messages")
 print()
+print("  GET    /api/messages/events")
+print("         Server-Sent Events stream of new messages and unread counts")
+print()
+print("  GET    /api/messages/events/poll?after_id=<id>")
+print("         Long-poll alternative to the event stream")
+print()
 
 print("=" * 70)
 print()
@@ -1,12 +1,49 @@
 # friend_matching_service.py
 
-from typing import List, Dict, Optional, Tuple
+from typing import List, Dict, Optional, Set, Tuple, Iterator, Callable
 from datetime import datetime
 from dataclasses import dataclass
+from array import array
+from functools import lru_cache
+import bisect
+import heapq
 import logging
+import math
+import sys
+import time
 
 logger = logging.getLogger(__name__)
 
+# Two path points closer than this (in degrees) count as overlapping
+PATH_PROXIMITY_THRESHOLD = 0.0005
+
+# Fixed-point scale for compact path coordinates (1e-7 degrees per unit)
+FIXED_POINT_SCALE = 10_000_000
+FIXED_PROXIMITY_THRESHOLD = round(PATH_PROXIMITY_THRESHOLD * FIXED_POINT_SCALE)
+
+MINUTES_PER_DAY = 24 * 60
+
+# Day name -> index; unexpected day names get their own index on first use
+DAY_INDEX: Dict[str, int] = {
+    'Monday': 0, 'Tuesday': 1, 'Wednesday': 2, 'Thursday': 3,
+    'Friday': 4, 'Saturday': 5, 'Sunday': 6
+}
+
+
+def day_index(day: str) -> int:
+    """Map a day name to its integer index"""
+    index = DAY_INDEX.get(day)
+    if index is None:
+        index = DAY_INDEX.setdefault(day, len(DAY_INDEX))
+    return index
+
+
+@lru_cache(maxsize=None)
+def minutes_after_midnight(time_str: str) -> int:
+    """Parse an 'HH:MM' string into minutes after midnight"""
+    parsed = datetime.strptime(time_str, "%H:%M")
+    return parsed.hour * 60 + parsed.minute
+
 
 @dataclass
 class Schedule:
@@ -14,6 +51,243 @@ class Schedule:
     user_id: int
     classes: List[Dict]
     walking_paths: List[List[Tuple[float, float]]]
+    
+    def __post_init__(self):
+        # Plain attribute rather than a field, so asdict()/astuple() and
+        # dataclasses.replace() never see or copy the compiled form
+        self._compiled: Optional['CompiledSchedule'] = None
+    
+    @property
+    def compiled(self) -> 'CompiledSchedule':
+        """Matching form of this schedule, built on first use and reused"""
+        if self._compiled is None:
+            self._compiled = CompiledSchedule(self)
+        return self._compiled
+    
+    def invalidate_compiled(self):
+        """Discard the compiled form after classes or paths were edited in place"""
+        self._compiled = None
+
+
+class PathGrid:
+    """Uniform grid index over the points of a single walking path.
+    
+    Cells are PATH_PROXIMITY_THRESHOLD wide, so every point within the
+    threshold of a query point lies in the query's cell or one of its
+    eight neighbours.
+    """
+    
+    __slots__ = ('cells',)
+    
+    def __init__(self, path: List[Tuple[float, float]]):
+        self.cells: Dict[Tuple[int, int], List[Tuple[float, float]]] = {}
+        for point in path:
+            key = (
+                math.floor(point[0] / PATH_PROXIMITY_THRESHOLD),
+                math.floor(point[1] / PATH_PROXIMITY_THRESHOLD)
+            )
+            bucket = self.cells.get(key)
+            if bucket is None:
+                self.cells[key] = [point]
+            else:
+                bucket.append(point)
+    
+    def __bool__(self) -> bool:
+        return bool(self.cells)
+    
+    def has_point_near(self, point: Tuple[float, float]) -> bool:
+        """Check if any indexed point is within the proximity threshold"""
+        x, y = point
+        cx = math.floor(x / PATH_PROXIMITY_THRESHOLD)
+        cy = math.floor(y / PATH_PROXIMITY_THRESHOLD)
+        cells = self.cells
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                bucket = cells.get((cx + dx, cy + dy))
+                if bucket is None:
+                    continue
+                for other in bucket:
+                    distance = ((x - other[0])**2 + (y - other[1])**2)**0.5
+                    if distance < PATH_PROXIMITY_THRESHOLD:
+                        return True
+        return False
+    
+    def overlap_from(self, path) -> float:
+        """Fraction of points in path that are near an indexed point."""
+        if not path or not self.cells:
+            return 0.0
+        
+        if isinstance(path, CompactPath):
+            overlap_weight = 0
+            for x, y, weight in path.weighted_points():
+                if self.has_point_near((x, y)):
+                    overlap_weight += weight
+            return overlap_weight / path.total_weight
+        
+        overlap_points = 0
+        for point in path:
+            if self.has_point_near(point):
+                overlap_points += 1
+        
+        return overlap_points / len(path)
+
+
+class CompactPath:
+    """Walking path stored as fixed-point int32 coordinates.
+    
+    Each stored point carries the number of original GPS samples it
+    stands for, so overlap ratios keep the original sample weighting.
+    Built by path_compaction.compact_path.
+    """
+    
+    __slots__ = ('coords', 'weights', 'total_weight')
+    
+    def __init__(self, coords: array, weights: array):
+        self.coords = coords
+        self.weights = weights
+        self.total_weight = sum(weights)
+    
+    def __len__(self) -> int:
+        return len(self.weights)
+    
+    def __iter__(self):
+        coords = self.coords
+        for i in range(0, len(coords), 2):
+            yield (coords[i] / FIXED_POINT_SCALE, coords[i + 1] / FIXED_POINT_SCALE)
+    
+    def fixed_points(self):
+        """Iterate (x, y) fixed-point coordinates"""
+        coords = self.coords
+        return zip(coords[0::2], coords[1::2])
+    
+    def weighted_points(self):
+        """Iterate (x, y, weight) with coordinates in degrees"""
+        for (x, y), weight in zip(self, self.weights):
+            yield x, y, weight
+
+
+class CompactPathGrid:
+    """PathGrid counterpart over a CompactPath, using exact integer distances.
+    
+    Points are kept in flat int32 buffers sorted by cell, with one sorted
+    int64 key and one start offset per occupied cell, so indexing a path
+    adds about 8 bytes per point and 12 per cell instead of a Python
+    tuple per point. A key packs (cx, cy) so that the three cells of one
+    grid column are adjacent, and each column is found with two bisects.
+    """
+    
+    __slots__ = ('keys', 'starts', 'coords')
+    
+    _ROW_OFFSET = 1 << 31
+    
+    def __init__(self, path: CompactPath):
+        offset = self._ROW_OFFSET
+        keyed = sorted(
+            (((x // FIXED_PROXIMITY_THRESHOLD) << 32) + y // FIXED_PROXIMITY_THRESHOLD + offset,
+             x, y)
+            for x, y in path.fixed_points()
+        )
+        self.keys = array('q')
+        self.starts = array('I')
+        self.coords = array('i')
+        for index, (key, x, y) in enumerate(keyed):
+            if not self.keys or self.keys[-1] != key:
+                self.keys.append(key)
+                self.starts.append(index)
+            self.coords.append(x)
+            self.coords.append(y)
+        self.starts.append(len(keyed))
+    
+    def __bool__(self) -> bool:
+        return bool(self.keys)
+    
+    @property
+    def cells(self) -> List[Tuple[int, int]]:
+        """Occupied (cx, cy) cells, in the units PathGrid uses"""
+        offset = self._ROW_OFFSET
+        return [(key >> 32, (key & 0xFFFFFFFF) - offset) for key in self.keys]
+    
+    def has_point_near(self, x: int, y: int) -> bool:
+        """Check if any indexed point is within the proximity threshold"""
+        cx = x // FIXED_PROXIMITY_THRESHOLD
+        row = y // FIXED_PROXIMITY_THRESHOLD + self._ROW_OFFSET
+        limit = FIXED_PROXIMITY_THRESHOLD * FIXED_PROXIMITY_THRESHOLD
+        keys, starts, coords = self.keys, self.starts, self.coords
+        for dx in (-1, 0, 1):
+            column = ((cx + dx) << 32) + row
+            low = bisect.bisect_left(keys, column - 1)
+            high = bisect.bisect_right(keys, column + 1, low)
+            for i in range(2 * starts[low], 2 * starts[high], 2):
+                other_x = x - coords[i]
+                other_y = y - coords[i + 1]
+                if other_x * other_x + other_y * other_y < limit:
+                    return True
+        return False
+    
+    def overlap_from(self, path) -> float:
+        """Fraction (by sample weight) of path points near an indexed point."""
+        if not path or not self.keys:
+            return 0.0
+        
+        if isinstance(path, CompactPath):
+            overlap_weight = 0
+            for (x, y), weight in zip(path.fixed_points(), path.weights):
+                if self.has_point_near(x, y):
+                    overlap_weight += weight
+            return overlap_weight / path.total_weight
+        
+        overlap_points = 0
+        for x, y in path:
+            if self.has_point_near(round(x * FIXED_POINT_SCALE), round(y * FIXED_POINT_SCALE)):
+                overlap_points += 1
+        return overlap_points / len(path)
+
+
+def build_path_grid(path):
+    """Grid index for a raw or compact walking path"""
+    if isinstance(path, CompactPath):
+        return CompactPathGrid(path)
+    return PathGrid(path)
+
+
+class CompiledSchedule:
+    """Schedule pre-processed for matching.
+    
+    Course ids are interned, days are integer indices and class times are
+    minutes since the start of the week, so matching never re-parses
+    time strings or compares day names.
+    """
+    
+    __slots__ = (
+        'user_id', 'course_ids', 'class_days', 'class_starts', 'class_ends',
+        'starts_by_day', 'walking_paths', 'path_grids', 'path_point_count'
+    )
+    
+    def __init__(self, schedule: Schedule):
+        self.user_id = schedule.user_id
+        self.course_ids = frozenset(sys.intern(cls['course']) for cls in schedule.classes)
+        self.class_days = array('l')
+        self.class_starts = array('l')
+        self.class_ends = array('l')
+        for cls in schedule.classes:
+            day = day_index(cls['day'])
+            week_offset = day * MINUTES_PER_DAY
+            self.class_days.append(day)
+            self.class_starts.append(week_offset + minutes_after_midnight(cls['start_time']))
+            self.class_ends.append(week_offset + minutes_after_midnight(cls['end_time']))
+        
+        # Sorted start times per day for nearest-start lookups
+        self.starts_by_day: Dict[int, array] = {}
+        for day, start in sorted(zip(self.class_days, self.class_starts)):
+            starts = self.starts_by_day.get(day)
+            if starts is None:
+                self.starts_by_day[day] = array('l', [start])
+            else:
+                starts.append(start)
+        
+        self.walking_paths = schedule.walking_paths
+        self.path_grids = tuple(build_path_grid(path) for path in schedule.walking_paths)
+        self.path_point_count = sum(len(path) for path in schedule.walking_paths)
 
 
 @dataclass
@@ -24,71 +298,406 @@ class FriendSuggestion:
     shared_classes: List[str]
     path_overlap_percent: float
     time_proximity_minutes: int
+    mutual_connections: int = 0
+
+
+class TopSuggestions:
+    """Bounded min-heap that keeps the best `limit` suggestions.
+    
+    Ties keep the earlier-offered suggestion, matching a stable sort of
+    every suggestion by descending score.
+    """
+    
+    __slots__ = ('limit', '_heap', '_offered')
+    
+    def __init__(self, limit: int):
+        self.limit = limit
+        self._heap: List[Tuple[float, int, FriendSuggestion]] = []
+        self._offered = 0
+    
+    def min_score(self) -> Optional[float]:
+        """Score a new suggestion must exceed to be kept, or None while not full"""
+        if not self._heap or len(self._heap) < self.limit:
+            return None
+        return self._heap[0][0]
+    
+    def offer(self, suggestion: FriendSuggestion, order: Optional[int] = None) -> bool:
+        """Add a suggestion if it ranks in the current top `limit`.
+        
+        order is the candidate's position for tie-breaking (lower wins);
+        it defaults to the order of offer calls.
+        """
+        if self.limit <= 0:
+            return False
+        
+        self._offered += 1
+        if order is None:
+            order = self._offered
+        entry = (suggestion.score, -order, suggestion)
+        if len(self._heap) < self.limit:
+            heapq.heappush(self._heap, entry)
+            return True
+        if entry[:2] > self._heap[0][:2]:
+            heapq.heapreplace(self._heap, entry)
+            return True
+        return False
+    
+    def entries(self) -> List[Tuple[float, int, FriendSuggestion]]:
+        """Kept (score, order, suggestion) entries, best first"""
+        ordered = sorted(self._heap, key=lambda entry: (-entry[0], -entry[1]))
+        return [(score, -negated_order, suggestion) for score, negated_order, suggestion in ordered]
+    
+    def results(self) -> List[FriendSuggestion]:
+        """Kept suggestions, best first"""
+        return [entry[2] for entry in self.entries()]
 
 
 class FriendMatchingService:
-    """Service for matching students based on schedules and walking paths."""
+    """Service for matching students based on schedules and walking paths.
+    
+    A candidate_index holds the schedules of one university and has no
+    university scope of its own, so a service with an index (or one that
+    uses generate_suggestions_batch) must serve a single university:
+    create one service and one index per university.
+    """
     
-    def __init__(self, schedule_repository, connection_repository):
+    def __init__(self, schedule_repository, connection_repository,
+                 suggestion_cache=None, candidate_index=None, instrumentation=None,
+                 connection_graph=None):
         self.schedule_repo = schedule_repository
         self.connection_repo = connection_repository
+        self.suggestion_cache = suggestion_cache
+        self.candidate_index = candidate_index
+        self.instrumentation = instrumentation
+        self.connection_graph = connection_graph
+        self._batch_scorer = None
         self.MIN_PATH_OVERLAP = 0.30
         self.TIME_PROXIMITY_THRESHOLD = 15
+        self.MUTUAL_CONNECTION_WEIGHT = 0.1
+        self.MAX_MUTUAL_CONNECTIONS = 5
+        self.CANDIDATE_PAGE_SIZE = 500
         
     def generate_suggestions(self, user_id: int, limit: int = 10) -> List[FriendSuggestion]:
         """Generate friend suggestions for a user."""
+        return self._top_suggestions(user_id, limit, stream=False)
+    
+    def top_suggestions(self, user_id: int, limit: int = 10) -> List[FriendSuggestion]:
+        """Generate friend suggestions while streaming candidates page by page.
+        
+        Returns the same list as generate_suggestions, but only one page of
+        candidate schedules and `limit` suggestions are held at a time.
+        """
+        return self._top_suggestions(user_id, limit, stream=True)
+    
+    def iter_suggestions(self, user_id: int) -> Iterator[FriendSuggestion]:
+        """Yield scored suggestions one by one as candidates are streamed.
+        
+        Suggestions come in candidate order, not by score, so callers can
+        render them incrementally (e.g. for infinite scroll) and stop at
+        any time.
+        """
+        user_schedule = self.schedule_repo.get_schedule_by_user(user_id)
+        if not user_schedule:
+            logger.warning(f"No schedule found for user {user_id}")
+            return
+        
+        excluded_ids = self._excluded_user_ids(user_id)
+        yield from self._score_candidates(
+            user_schedule,
+            self.iter_candidate_schedules(user_schedule, excluded_ids)
+        )
+    
+    def iter_candidate_schedules(self, user_schedule: Schedule,
+                                 excluded_ids: Set[int]) -> Iterator[Schedule]:
+        """Stream candidate schedules lazily.
+        
+        Uses the candidate index when configured; otherwise requires
+        schedule_repo.get_schedules_by_university_page(university_id,
+        exclude_user_ids, after_user_id, page_size). Each lookup or page
+        fetch is timed as a 'repository' phase.
+        """
+        stats = self.instrumentation
+        if self.candidate_index is not None:
+            if stats is not None:
+                started = time.perf_counter()
+            candidates = self.candidate_index.candidates(
+                user_schedule,
+                exclude_user_ids=excluded_ids
+            )
+            if stats is not None:
+                stats.observe_phase('repository', time.perf_counter() - started)
+            yield from candidates
+            return
+        
+        exclude_user_ids = list(excluded_ids)
+        after_user_id = None
+        
+        while True:
+            if stats is not None:
+                started = time.perf_counter()
+            page = self.schedule_repo.get_schedules_by_university_page(
+                user_schedule.user_id,
+                exclude_user_ids=exclude_user_ids,
+                after_user_id=after_user_id,
+                page_size=self.CANDIDATE_PAGE_SIZE
+            )
+            if stats is not None:
+                stats.observe_phase('repository', time.perf_counter() - started)
+            yield from page
+            
+            if len(page) < self.CANDIDATE_PAGE_SIZE:
+                return
+            after_user_id = page[-1].user_id
+    
+    def _score_candidates(self, user_schedule: Schedule, candidate_schedules,
+                          min_score: Optional[Callable[[], Optional[float]]] = None
+                          ) -> Iterator[FriendSuggestion]:
+        """Yield every positive-scoring suggestion among candidate_schedules.
+        
+        min_score, if given, is called before each candidate for the
+        current pruning threshold.
+        """
+        for candidate_schedule in candidate_schedules:
+            suggestion = self._evaluate_match(
+                user_schedule, 
+                candidate_schedule, 
+                min_score=min_score() if min_score is not None else None
+            )
+            if suggestion and suggestion.score > 0:
+                yield suggestion
+    
+    def _top_suggestions(self, user_id: int, limit: int, stream: bool) -> List[FriendSuggestion]:
+        """Best `limit` suggestions, with candidates loaded at once or streamed"""
+        stats = self.instrumentation
+        if stats is not None:
+            started = time.perf_counter()
+        
         try:
+            if self.suggestion_cache is not None:
+                cached = self.suggestion_cache.get(user_id, limit)
+                if cached is not None:
+                    if stats is not None:
+                        stats.increment('cache_hits')
+                        stats.observe_phase('total', time.perf_counter() - started)
+                    return cached
+            
             user_schedule = self.schedule_repo.get_schedule_by_user(user_id)
             if not user_schedule:
                 logger.warning(f"No schedule found for user {user_id}")
                 return []
             
-            existing_connections = self.connection_repo.get_connections(user_id)
-            existing_ids = {conn.other_user_id for conn in existing_connections}
+            excluded_ids = self._excluded_user_ids(user_id)
             
-            blocked_users = self.connection_repo.get_blocked_users(user_id)
-            blocked_ids = {block.blocked_user_id for block in blocked_users}
+            if stream:
+                candidate_schedules = self.iter_candidate_schedules(user_schedule, excluded_ids)
+            elif self.candidate_index is not None:
+                candidate_schedules = self.candidate_index.candidates(
+                    user_schedule,
+                    exclude_user_ids=excluded_ids
+                )
+            else:
+                candidate_schedules = self.schedule_repo.get_schedules_by_university(
+                    user_schedule.user_id,
+                    exclude_user_ids=list(excluded_ids)
+                )
             
-            candidate_schedules = self.schedule_repo.get_schedules_by_university(
-                user_schedule.user_id,
-                exclude_user_ids=list(existing_ids | blocked_ids | {user_id})
-            )
+            if stats is not None:
+                stats.observe_phase('repository', time.perf_counter() - started)
             
-            suggestions = []
+            top = TopSuggestions(limit)
             
-            for candidate_schedule in candidate_schedules:
-                suggestion = self._evaluate_match(user_schedule, candidate_schedule)
-                if suggestion and suggestion.score > 0:
-                    suggestions.append(suggestion)
+            for suggestion in self._score_candidates(user_schedule, candidate_schedules,
+                                                     min_score=top.min_score):
+                top.offer(suggestion)
             
-            suggestions.sort(key=lambda x: x.score, reverse=True)
-            return suggestions[:limit]
+            suggestions = top.results()
+            if self.suggestion_cache is not None:
+                self.suggestion_cache.put(user_schedule, excluded_ids, limit, suggestions)
+            
+            if stats is not None:
+                stats.increment('suggestions_returned', len(suggestions))
+                stats.observe_phase('total', time.perf_counter() - started)
+            return suggestions
             
         except Exception as e:
             logger.error(f"Error generating suggestions for user {user_id}: {str(e)}")
             raise
+
+    def generate_suggestions_batch(self, user_id: int, limit: int = 10) -> List[FriendSuggestion]:
+        """Generate friend suggestions using the vectorized batch scorer (needs NumPy).
+        
+        The university's schedules are packed once and reused by later
+        calls; notify_schedule_changed drops the packed form so the next
+        call repacks. Like the candidate index, it serves one university
+        per service.
+        """
+        try:
+            user_schedule = self.schedule_repo.get_schedule_by_user(user_id)
+            if not user_schedule:
+                logger.warning(f"No schedule found for user {user_id}")
+                return []
+
+            scorer = self._batch_scorer
+            if scorer is None or user_id not in scorer.row_by_user:
+                scorer = self._batch_scorer = self._build_batch_scorer(user_schedule)
+            return scorer.suggestions(
+                user_schedule,
+                limit,
+                exclude_user_ids=self._excluded_user_ids(user_id)
+            )
+
+        except Exception as e:
+            logger.error(f"Error generating batch suggestions for user {user_id}: {str(e)}")
+            raise
+
+    def _build_batch_scorer(self, user_schedule: Schedule):
+        """Pack every schedule of the user's university into a BatchScorer"""
+        from batch_scoring import BatchScorer
+
+        return BatchScorer(
+            self.schedule_repo.get_schedules_by_university(
+                user_schedule.user_id,
+                exclude_user_ids=[]
+            ),
+            time_proximity_threshold=self.TIME_PROXIMITY_THRESHOLD,
+            min_path_overlap=self.MIN_PATH_OVERLAP,
+            connection_graph=self.connection_graph,
+            mutual_connection_weight=self.MUTUAL_CONNECTION_WEIGHT,
+            max_mutual_connections=self.MAX_MUTUAL_CONNECTIONS
+        )
+
+    def _excluded_user_ids(self, user_id: int) -> Set[int]:
+        """Users never suggested to user_id: connections, blocks and themselves"""
+        existing_connections = self.connection_repo.get_connections(user_id)
+        existing_ids = {conn.other_user_id for conn in existing_connections}
+        
+        blocked_users = self.connection_repo.get_blocked_users(user_id)
+        blocked_ids = {block.blocked_user_id for block in blocked_users}
+        
+        return existing_ids | blocked_ids | {user_id}
+    
+    def notify_schedule_changed(self, user_id: int, schedule: Optional[Schedule]):
+        """Refresh the candidate index and cached suggestions after a schedule
+        was saved (or deleted, with None)."""
+        if schedule is not None:
+            schedule.invalidate_compiled()
+        
+        self._batch_scorer = None
+        
+        if self.candidate_index is not None:
+            if schedule is None:
+                self.candidate_index.remove(user_id)
+            else:
+                self.candidate_index.add(schedule)
+        
+        if self.suggestion_cache is not None:
+            self.suggestion_cache.candidate_changed(user_id, schedule,
+                                                    self._evaluate_match_unrecorded)
+    
+    def notify_block_changed(self, blocker_id: int, blocked_id: int, is_blocked: bool):
+        """Refresh cached suggestions after a block was added or lifted."""
+        if self.suggestion_cache is None:
+            return
+        if is_blocked:
+            self.suggestion_cache.exclusion_added(blocker_id, blocked_id)
+        else:
+            self.suggestion_cache.invalidate(blocker_id, blocked_id)
     
     def _evaluate_match(self, user_schedule: Schedule, 
-                       candidate_schedule: Schedule) -> Optional[FriendSuggestion]:
-        """Evaluate how well two schedules match."""
-        user_classes = {cls['course'] for cls in user_schedule.classes}
-        candidate_classes = {cls['course'] for cls in candidate_schedule.classes}
-        shared_classes = list(user_classes & candidate_classes)
-        
-        time_proximity = self._calculate_time_proximity(
-            user_schedule.classes, 
-            candidate_schedule.classes
-        )
+                       candidate_schedule: Schedule,
+                       min_score: Optional[float] = None,
+                       record: bool = True) -> Optional[FriendSuggestion]:
+        """Evaluate how well two schedules match.
         
-        path_overlap = self._calculate_path_overlap(
-            user_schedule.walking_paths,
-            candidate_schedule.walking_paths
-        )
+        When min_score is given, candidates that cannot score above it are
+        rejected before the path overlap is computed. With record=False
+        the evaluation is left out of the instrumentation.
+        """
+        stats = self.instrumentation if record else None
+        if stats is not None:
+            stats.increment('candidates_scanned')
+            started = time.perf_counter()
+        
+        user_compiled = user_schedule.compiled
+        candidate_compiled = candidate_schedule.compiled
+        shared_classes = list(user_compiled.course_ids & candidate_compiled.course_ids)
+        
+        time_proximity = self._calculate_time_proximity(user_compiled, candidate_compiled)
+        
+        if stats is not None:
+            stats.observe_phase('time_proximity', time.perf_counter() - started)
+        
+        mutual_connections = 0
+        if self.connection_graph is not None:
+            if stats is not None:
+                started = time.perf_counter()
+            mutual_connections = self.connection_graph.mutual_count(
+                user_schedule.user_id,
+                candidate_schedule.user_id
+            )
+            if stats is not None:
+                stats.observe_phase('mutual_connections', time.perf_counter() - started)
         
+        if min_score is not None:
+            upper_bound = self._score_upper_bound(
+                len(shared_classes), time_proximity, mutual_connections
+            )
+            if upper_bound <= min_score:
+                if stats is not None:
+                    stats.increment('candidates_pruned')
+                return None
+        
+        if stats is not None:
+            started = time.perf_counter()
+        
+        path_overlap = self._calculate_path_overlap(user_compiled, candidate_compiled)
+        
+        if stats is not None:
+            stats.observe_phase('path_overlap', time.perf_counter() - started)
+            stats.observe_path_points(
+                user_compiled.path_point_count * len(candidate_compiled.path_grids)
+            )
+        
+        return self._build_suggestion(
+            candidate_schedule.user_id,
+            shared_classes,
+            time_proximity,
+            path_overlap,
+            min_score=min_score,
+            mutual_connections=mutual_connections
+        )
+    
+    def _evaluate_match_unrecorded(self, user_schedule: Schedule,
+                                   candidate_schedule: Schedule) -> Optional[FriendSuggestion]:
+        """_evaluate_match for cache maintenance, which is not a suggestion request"""
+        return self._evaluate_match(user_schedule, candidate_schedule, record=False)
+    
+    def _score_upper_bound(self, shared_count: int, time_proximity: int,
+                           mutual_connections: int = 0) -> float:
+        """Highest score reachable before path overlap (at most 1.0) is known"""
+        return (
+            shared_count * 0.4 +
+            1.0 * 0.4 +
+            (1.0 if time_proximity > 0 else 0) * 0.2 +
+            self._mutual_connection_score(mutual_connections)
+        )
+    
+    def _mutual_connection_score(self, mutual_connections: int) -> float:
+        """Score term for mutual connections, capped at MAX_MUTUAL_CONNECTIONS"""
+        if not mutual_connections:
+            return 0
+        return min(mutual_connections, self.MAX_MUTUAL_CONNECTIONS) * self.MUTUAL_CONNECTION_WEIGHT
+    
+    def _build_suggestion(self, candidate_user_id: int, shared_classes: List[str],
+                          time_proximity: int, path_overlap: float,
+                          min_score: Optional[float] = None,
+                          mutual_connections: int = 0) -> Optional[FriendSuggestion]:
+        """Score match components and apply the suggestion gates."""
         score = (
             len(shared_classes) * 0.4 +
             path_overlap * 0.4 +
-            (1.0 if time_proximity > 0 else 0) * 0.2
+            (1.0 if time_proximity > 0 else 0) * 0.2 +
+            self._mutual_connection_score(mutual_connections)
         )
         
         if score < 0.3:
@@ -97,45 +706,57 @@ class FriendMatchingService:
         if len(shared_classes) == 0 and path_overlap < self.MIN_PATH_OVERLAP:
             return None
         
+        if min_score is not None and score <= min_score:
+            return None
+        
         return FriendSuggestion(
-            suggested_user_id=candidate_schedule.user_id,
+            suggested_user_id=candidate_user_id,
             score=score,
             shared_classes=shared_classes,
             path_overlap_percent=path_overlap * 100,
-            time_proximity_minutes=time_proximity
+            time_proximity_minutes=time_proximity,
+            mutual_connections=mutual_connections
         )
     
-    def _calculate_time_proximity(self, user_classes: List[Dict], 
-                                  candidate_classes: List[Dict]) -> int:
-        """Calculate minimum time difference between classes."""
+    def _calculate_time_proximity(self, user_schedule: CompiledSchedule, 
+                                  candidate_schedule: CompiledSchedule) -> int:
+        """Calculate minimum time difference between classes.
+        
+        Binary-searches each user end time in the candidate's sorted start
+        times for that day; only the starts either side can be nearest.
+        """
         min_diff = float('inf')
+        starts_by_day = candidate_schedule.starts_by_day
         
-        for user_class in user_classes:
-            user_end = self._parse_time(user_class['end_time'])
+        for user_day, user_end in zip(user_schedule.class_days, user_schedule.class_ends):
+            starts = starts_by_day.get(user_day)
+            if starts is None:
+                continue
             
-            for candidate_class in candidate_classes:
-                if user_class['day'] != candidate_class['day']:
-                    continue
-                
-                candidate_start = self._parse_time(candidate_class['start_time'])
-                diff = abs((candidate_start - user_end).total_seconds() / 60)
-                min_diff = min(min_diff, diff)
+            position = bisect.bisect_left(starts, user_end)
+            if position < len(starts):
+                min_diff = min(min_diff, starts[position] - user_end)
+            if position > 0:
+                min_diff = min(min_diff, user_end - starts[position - 1])
+            if min_diff == 0:
+                break
         
         return int(min_diff) if min_diff <= self.TIME_PROXIMITY_THRESHOLD else -1
     
-    def _calculate_path_overlap(self, user_paths: List[List[Tuple[float, float]]], 
-                               candidate_paths: List[List[Tuple[float, float]]]) -> float:
+    def _calculate_path_overlap(self, user_schedule: CompiledSchedule, 
+                               candidate_schedule: CompiledSchedule) -> float:
         """Calculate percentage of path overlap."""
-        if not user_paths or not candidate_paths:
+        user_paths = user_schedule.walking_paths
+        candidate_grids = candidate_schedule.path_grids
+        if not user_paths or not candidate_grids:
             return 0.0
         
         total_overlap = 0.0
         comparisons = 0
         
         for user_path in user_paths:
-            for candidate_path in candidate_paths:
-                overlap = self._calculate_single_path_overlap(user_path, candidate_path)
-                total_overlap += overlap
+            for candidate_grid in candidate_grids:
+                total_overlap += candidate_grid.overlap_from(user_path)
                 comparisons += 1
         
         return total_overlap / comparisons if comparisons > 0 else 0.0
@@ -146,21 +767,7 @@ class FriendMatchingService:
         if not path1 or not path2:
             return 0.0
         
-        PROXIMITY_THRESHOLD = 0.0005
-        overlap_points = 0
-        
-        for point1 in path1:
-            for point2 in path2:
-                distance = ((point1[0] - point2[0])**2 + (point1[1] - point2[1])**2)**0.5
-                if distance < PROXIMITY_THRESHOLD:
-                    overlap_points += 1
-                    break
-        
-        return overlap_points / len(path1)
-    
-    def _parse_time(self, time_str: str) -> datetime:
-        """Parse time string to datetime object"""
-        return datetime.strptime(time_str, "%H:%M")
+        return build_path_grid(path2).overlap_from(path1)
     
     def create_connection_request(self, requesting_user_id: int, 
                                  target_user_id: int) -> Dict:
@@ -183,6 +790,12 @@ class FriendMatchingService:
                 suggested_at=datetime.utcnow()
             )
             
+            if self.connection_graph is not None:
+                self.connection_graph.request_added(connection)
+            
+            if self.suggestion_cache is not None:
+                self.suggestion_cache.exclusion_added(requesting_user_id, target_user_id)
+            
             logger.info(f"Connection request: {requesting_user_id} -> {target_user_id}")
             return connection
             
@@ -190,9 +803,112 @@ class FriendMatchingService:
             logger.error(f"Error creating connection request: {str(e)}")
             raise
     
+    def create_connection_requests(self, requesting_user_id: int,
+                                   target_user_ids: List[int]) -> List[Dict]:
+        """Create connection requests from one user to many users.
+        
+        Existing connections and blocks (either direction) are fetched with
+        one set-based call each and all new connections are created in a
+        single repository call. Returns one result per distinct target, in
+        order: {'target_user_id', 'success', 'connection'} on success or
+        {'target_user_id', 'success', 'error'} on failure.
+        
+        Requires connection_repo to implement:
+        
+        - get_connections_between(user_id, other_ids): connections of any
+          status between user_id and any of other_ids, in either direction,
+          each with an other_user_id attribute
+        - get_blocked_between(user_id, other_ids): ids from other_ids that
+          user_id blocked or that blocked user_id
+        - create_connections(user1_id, user2_ids, status, suggested_at):
+          one connection dict per user2_id (with 'id', 'user1_id' and
+          'user2_id'), returned in the order of user2_ids
+        """
+        try:
+            targets = list(dict.fromkeys(target_user_ids))
+            others = [target for target in targets if target != requesting_user_id]
+            
+            existing_ids = {
+                conn.other_user_id
+                for conn in self.connection_repo.get_connections_between(
+                    requesting_user_id,
+                    others
+                )
+            } if others else set()
+            blocked_ids = set(self.connection_repo.get_blocked_between(
+                requesting_user_id,
+                others
+            )) if others else set()
+            
+            results = []
+            to_create = []
+            for target in targets:
+                if target == requesting_user_id:
+                    error = "Cannot connect with yourself"
+                elif target in existing_ids:
+                    error = "Connection already exists or is pending"
+                elif target in blocked_ids:
+                    error = "Cannot connect with blocked user"
+                else:
+                    to_create.append(target)
+                    results.append({'target_user_id': target, 'success': True})
+                    continue
+                results.append({'target_user_id': target, 'success': False, 'error': error})
+            
+            if to_create:
+                connections = self.connection_repo.create_connections(
+                    user1_id=requesting_user_id,
+                    user2_ids=to_create,
+                    status='pending',
+                    suggested_at=datetime.utcnow()
+                )
+                created = dict(zip(to_create, connections))
+                for result in results:
+                    if result['success']:
+                        result['connection'] = created[result['target_user_id']]
+                
+                if self.connection_graph is not None:
+                    for connection in connections:
+                        self.connection_graph.request_added(connection)
+                
+                if self.suggestion_cache is not None:
+                    for target in to_create:
+                        self.suggestion_cache.exclusion_added(requesting_user_id, target)
+            
+            logger.info(f"Bulk connection requests from {requesting_user_id}: "
+                        f"{len(to_create)} created, {len(targets) - len(to_create)} rejected")
+            return results
+            
+        except Exception as e:
+            logger.error(f"Error creating bulk connection requests: {str(e)}")
+            raise
+    
     def accept_connection(self, connection_id: int, accepting_user_id: int) -> Dict:
         """Accept a pending connection request."""
         connection = {'id': connection_id, 'status': 'accepted', 'connected_at': datetime.utcnow()}
+        
+        users = None
+        if self.connection_graph is not None:
+            users = self.connection_graph.connection_accepted(connection_id)
+            if users is None:
+                logger.warning(f"Accepted connection {connection_id} is not a known "
+                               f"pending request; connection graph not updated")
+        
+        if self.suggestion_cache is not None:
+            if users is None:
+                # The requester is not known here, so drop every list the
+                # accepting user appears in along with their own
+                self.suggestion_cache.candidate_changed(accepting_user_id, None,
+                                                        self._evaluate_match_unrecorded)
+            else:
+                # Both users' lists lose each other, and the new edge changes
+                # their mutual counts with every neighbour of the other
+                self.suggestion_cache.invalidate(
+                    *users,
+                    *self.connection_graph.neighbors(users[0]),
+                    *self.connection_graph.neighbors(users[1])
+                )
+        
         logger.info(f"Connection accepted: {connection_id}")
         return connection
     
@@ -0,0 +1,107 @@
+# instrumentation.py
+
+"""
+Hot-path instrumentation for FriendMatchingService.
+
+Pass a MatchingStats instance as FriendMatchingService(...,
+instrumentation=stats) to collect per-phase timers, candidate counters
+and a histogram of path points compared. With no instrumentation the
+service only pays an `is not None` check per phase.
+"""
+
+from typing import Dict, List, Sequence
+import bisect
+import threading
+
+DEFAULT_POINT_BUCKETS = (10, 50, 100, 500, 1000, 5000, 10000, 50000)
+
+
+class MatchingStats:
+    """Thread-safe timers, counters and histogram for the matching engine"""
+
+    def __init__(self, point_buckets: Sequence[int] = DEFAULT_POINT_BUCKETS):
+        self.point_buckets = tuple(sorted(point_buckets))
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Zero every metric."""
+        with self._lock:
+            self.phase_seconds: Dict[str, float] = {}
+            self.phase_calls: Dict[str, int] = {}
+            self.counters: Dict[str, int] = {}
+            self.point_counts: List[int] = [0] * (len(self.point_buckets) + 1)
+            self.point_sum = 0
+
+    def observe_phase(self, phase: str, seconds: float):
+        """Record time spent in one phase."""
+        with self._lock:
+            self.phase_seconds[phase] = self.phase_seconds.get(phase, 0.0) + seconds
+            self.phase_calls[phase] = self.phase_calls.get(phase, 0) + 1
+
+    def increment(self, counter: str, amount: int = 1):
+        """Add to a counter."""
+        with self._lock:
+            self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    def observe_path_points(self, points: int):
+        """Record how many path points one candidate's overlap compared."""
+        index = bisect.bisect_left(self.point_buckets, points)
+        with self._lock:
+            self.point_counts[index] += 1
+            self.point_sum += points
+
+    def as_dict(self) -> Dict:
+        """Snapshot of every metric as plain Python values"""
+        with self._lock:
+            cumulative = 0
+            buckets = {}
+            for bound, count in zip(self.point_buckets, self.point_counts):
+                cumulative += count
+                buckets[str(bound)] = cumulative
+            buckets['+Inf'] = cumulative + self.point_counts[-1]
+
+            return {
+                'phases': {
+                    phase: {'seconds': seconds, 'calls': self.phase_calls[phase]}
+                    for phase, seconds in self.phase_seconds.items()
+                },
+                'counters': dict(self.counters),
+                'path_points_compared': {
+                    'buckets': buckets,
+                    'sum': self.point_sum,
+                    'count': buckets['+Inf']
+                }
+            }
+
+    def to_prometheus(self, prefix: str = 'friend_matching') -> str:
+        """Render the metrics in the Prometheus text exposition format"""
+        stats = self.as_dict()
+        lines = [
+            f"# HELP {prefix}_phase_seconds_total Time spent per matching phase",
+            f"# TYPE {prefix}_phase_seconds_total counter"
+        ]
+        for phase, values in sorted(stats['phases'].items()):
+            lines.append(f'{prefix}_phase_seconds_total{{phase="{phase}"}} {values["seconds"]:.6f}')
+        lines += [
+            f"# HELP {prefix}_phase_calls_total Number of timed calls per matching phase",
+            f"# TYPE {prefix}_phase_calls_total counter"
+        ]
+        for phase, values in sorted(stats['phases'].items()):
+            lines.append(f'{prefix}_phase_calls_total{{phase="{phase}"}} {values["calls"]}')
+
+        for counter, value in sorted(stats['counters'].items()):
+            lines.append(f"# TYPE {prefix}_{counter}_total counter")
+            lines.append(f"{prefix}_{counter}_total {value}")
+
+        histogram = stats['path_points_compared']
+        name = f"{prefix}_path_points_compared"
+        lines += [
+            f"# HELP {name} Path points compared per scored candidate",
+            f"# TYPE {name} histogram"
+        ]
+        for bound, count in histogram['buckets'].items():
+            lines.append(f'{name}_bucket{{le="{bound}"}} {count}')
+        lines.append(f"{name}_sum {histogram['sum']}")
+        lines.append(f"{name}_count {histogram['count']}")
+        return "\n".join(lines) + "\n"
@@ -1,9 +1,22 @@
 # message_controller.py (Python/Flask version)
 
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response, stream_with_context
 from functools import wraps
+import hashlib
+import json
 import logging
-from typing import Dict, Any
+import math
+import os
+from typing import Dict, Any, List, Optional
+
+from message_events import InProcessBroker, RedisBroker, user_channel
+from message_queue import QueueFull, WriteBehindQueue
+from message_store import MAX_CONVERSATION_PAGE, SQLiteMessageService
+from rate_limit import InMemoryBucketStore, RateLimit, RateLimiter, RedisBucketStore
+from request_pipeline import (
+    CachedTokenVerifier, HS256TokenVerifier, InvalidToken, RequestSchema, compiled_schema
+)
+from response_encoding import encoded_response, not_modified
 
 # Initialize logger
 logger = logging.getLogger(__name__)
@@ -32,29 +45,130 @@ class MessageService:
         """Get all conversations for user (mock implementation)"""
         return []
     
+    def conversation_version(self, user1_id: int, user2_id: int) -> tuple:
+        """Newest message id and write count of a conversation (mock implementation)"""
+        return (0, 0)
+    
+    def send_messages(self, messages: list) -> list:
+        """Send several messages in one transaction (mock implementation)"""
+        return [
+            {'id': 123 + index, 'created_at': '2025-01-15T10:30:00Z'}
+            for index in range(len(messages))
+        ]
+    
+    def max_message_id(self) -> int:
+        """Largest stored message id (mock implementation)"""
+        return 0
+    
     def mark_as_read(self, message_id: int, user_id: int):
         """Mark message as read (mock implementation)"""
         pass
     
+    def mark_many_as_read(self, message_ids: list, user_id: int) -> set:
+        """Mark several messages as read; returns the ids found (mock implementation)"""
+        return set(message_ids)
+    
+    def mark_conversation_read(self, user_id: int, other_user_id: int,
+                               up_to_id: int = None) -> int:
+        """Mark conversation read up to a message id (mock implementation)"""
+        return 0
+    
     def delete_message(self, message_id: int, user_id: int):
-        """Delete message (mock implementation)"""
-        pass
+        """Delete message; returns the recipient id if their unread count changed (mock implementation)"""
+        return None
     
     def get_unread_count(self, user_id: int) -> int:
         """Get unread message count (mock implementation)"""
         return 0
 
-# Initialize service
-message_service = MessageService()
+# Initialize service; MESSAGE_DB_PATH selects the SQLite store
+if os.environ.get('MESSAGE_DB_PATH'):
+    message_service = SQLiteMessageService(os.environ['MESSAGE_DB_PATH'])
+else:
+    message_service = MessageService()
+
+# Event broker for pushed messages; REDIS_URL shares events between processes
+if os.environ.get('REDIS_URL'):
+    event_broker = RedisBroker(os.environ['REDIS_URL'])
+else:
+    event_broker = InProcessBroker()
+
+# Seconds between SSE keep-alive comments, and the longest long-poll wait
+EVENT_HEARTBEAT_SECONDS = 15
+MAX_POLL_SECONDS = 60
+
+
+def publish_messages(sender_id: int, messages: List[Dict]):
+    """Push sent messages and new unread counts to their recipients"""
+    try:
+        recipients = []
+        for message in messages:
+            event_broker.publish(user_channel(message['recipient_id']), {
+                'type': 'message',
+                'data': {
+                    'message_id': message['id'],
+                    'sender_id': sender_id,
+                    'content': message['content'],
+                    'message_type': message['message_type'],
+                    'timestamp': message['created_at']
+                }
+            })
+            recipients.append(message['recipient_id'])
+        for recipient_id in dict.fromkeys(recipients):
+            publish_unread_count(recipient_id)
+    except Exception as e:
+        logger.warning(f"Failed to publish message events: {str(e)}")
+
+
+def publish_unread_count(user_id: int):
+    """Push a user's current unread count"""
+    try:
+        event_broker.publish(user_channel(user_id), {
+            'type': 'unread_count',
+            'data': {'unread_count': message_service.get_unread_count(user_id)}
+        })
+    except Exception as e:
+        logger.warning(f"Failed to publish unread count: {str(e)}")
+
+
+def publish_committed(messages: List[Dict]):
+    """Publish a group commit of the write-behind queue, per sender"""
+    by_sender: Dict[int, List[Dict]] = {}
+    for message in messages:
+        by_sender.setdefault(message['sender_id'], []).append(message)
+    for sender_id, sent in by_sender.items():
+        publish_messages(sender_id, sent)
+
+
+# Write-behind ingestion; MESSAGE_QUEUE_LOG enables it and names its log file
+if os.environ.get('MESSAGE_QUEUE_LOG'):
+    write_behind = WriteBehindQueue(message_service, os.environ['MESSAGE_QUEUE_LOG'],
+                                    on_commit=publish_committed)
+else:
+    write_behind = None
+
+
+def queue_full_response():
+    """429 returned while the write-behind queue is full"""
+    response = jsonify({
+        'success': False,
+        'error': 'Too many messages are waiting to be stored. Please retry shortly.'
+    })
+    response.headers['Retry-After'] = '1'
+    return response, 429
+
+
+# Token verification; JWT_SECRET enables HS256 JWTs, otherwise any token is accepted
+if os.environ.get('JWT_SECRET'):
+    token_verifier = CachedTokenVerifier(HS256TokenVerifier(os.environ['JWT_SECRET']))
+else:
+    token_verifier = None
 
 
-# Authentication decorator (mock implementation)
 def auth_required(f):
     """Decorator to require authentication"""
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        # In real implementation, verify JWT token
-        # For now, mock user data
         auth_header = request.headers.get('Authorization')
         if not auth_header:
             return jsonify({
@@ -62,50 +176,147 @@ def auth_required(f):
                 'error': 'Authentication required'
             }), 401
         
-        # Mock user extraction from JWT
-        request.user = {'id': 1, 'email': 'test@university.edu'}
+        if token_verifier is None:
+            # Mock user data when no verifier is configured
+            request.user = {'id': 1, 'email': 'test@university.edu'}
+            return f(*args, **kwargs)
+        
+        scheme, _, token = auth_header.partition(' ')
+        try:
+            if scheme.lower() != 'bearer' or not token:
+                raise InvalidToken("Expected a Bearer token")
+            claims = token_verifier.verify(token.strip())
+            user_id = claims['sub']
+            request.user = {
+                'id': int(user_id) if isinstance(user_id, str) and user_id.isdigit() else user_id,
+                'email': claims.get('email')
+            }
+        except (InvalidToken, KeyError):
+            return jsonify({
+                'success': False,
+                'error': 'Invalid or expired token'
+            }), 401
+        
+        return f(*args, **kwargs)
+    return decorated_function
+
+
+# Token buckets per route and user; REDIS_URL shares them between processes
+if os.environ.get('REDIS_URL'):
+    rate_limit_store = RedisBucketStore(os.environ['REDIS_URL'])
+else:
+    rate_limit_store = InMemoryBucketStore()
+
+rate_limiter = RateLimiter(
+    rate_limit_store,
+    default_limit=RateLimit(120, 60),
+    route_limits={
+        'send_message': RateLimit(60, 60),
+        'send_messages': RateLimit(10, 60),
+        'stream_events': RateLimit(10, 60),
+        'poll_events': RateLimit(60, 60),
+        'get_unread_count': RateLimit(60, 60)
+    }
+)
+
+
+def rate_limited(f):
+    """Decorator to apply rate_limiter; use below auth_required"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        try:
+            wait = rate_limiter.check(f.__name__, request.user['id'])
+        except Exception as e:
+            # Fail open: an unavailable shared store must not take the API down
+            logger.warning(f"Rate limit check failed: {str(e)}")
+            wait = 0
+        if wait > 0:
+            response = jsonify({
+                'success': False,
+                'error': 'Too many requests. Please slow down.'
+            })
+            response.headers['Retry-After'] = str(max(1, math.ceil(wait)))
+            return response, 429
         return f(*args, **kwargs)
     return decorated_function
 
 
-def validate_request(required_fields: Dict[str, type]) -> Dict[str, Any]:
-    """Validate request data"""
-    data = request.get_json()
+def validate_request(required_fields) -> Dict[str, Any]:
+    """Parse the JSON body once and check it against a route schema.
+    
+    required_fields is a RequestSchema or a field -> type mapping, which
+    is compiled on first use.
+    """
+    data = request.get_json(silent=True)
     if not data:
         return {'error': 'Request body is required'}
+    if not isinstance(data, dict):
+        return {'error': 'Request body must be a JSON object'}
     
-    errors = []
-    for field, field_type in required_fields.items():
-        if field not in data:
-            errors.append(f'{field} is required')
-        elif not isinstance(data[field], field_type):
-            errors.append(f'{field} must be {field_type.__name__}')
-    
+    schema = (required_fields if isinstance(required_fields, RequestSchema)
+              else compiled_schema(required_fields))
+    errors = schema.errors(data)
     if errors:
         return {'error': errors}
     
     return {'data': data}
 
 
+MESSAGE_FIELDS = {
+    'recipient_id': int,
+    'content': str,
+    'message_type': str
+}
+
+MESSAGE_SCHEMA = RequestSchema(MESSAGE_FIELDS)
+
+VALID_MESSAGE_TYPES = ['text', 'emoji', 'gif', 'jpeg', 'multimedia', 'link']
+
+MAX_MESSAGE_LENGTH = 5000
+
+# Largest number of items accepted by one batch request
+MAX_BATCH_SIZE = 200
+
+
+def message_error(data: Dict, sender_id: int) -> Optional[str]:
+    """Content, type and recipient checks shared by single and batch sends"""
+    content = data['content'].strip()
+    if not content:
+        return 'Message content cannot be empty'
+    
+    if len(content) > MAX_MESSAGE_LENGTH:
+        return f'Message too long (max {MAX_MESSAGE_LENGTH} characters)'
+    
+    if data['message_type'] not in VALID_MESSAGE_TYPES:
+        return f'Invalid message type. Must be one of: {", ".join(VALID_MESSAGE_TYPES)}'
+    
+    if sender_id == data['recipient_id']:
+        return 'Cannot send message to yourself'
+    
+    return None
+
+
+def send_refusal(error: ValueError) -> str:
+    """Client-facing reason for a message the service refused to store"""
+    reason = str(error).lower()
+    if 'not connected' in reason:
+        return 'You can only send messages to connected friends'
+    if 'blocked' in reason:
+        return 'Cannot send message to this user'
+    return 'Failed to send message'
+
+
 @message_bp.route('/', methods=['POST'])
 @auth_required
+@rate_limited
 def send_message():
     """
     POST /api/messages
     Send a message to a connected friend
     """
     try:
-        # Get request data
-        data = request.get_json()
-        
-        # Validate required fields
-        required_fields = {
-            'recipient_id': int,
-            'content': str,
-            'message_type': str
-        }
-        
-        validation = validate_request(required_fields)
+        # Parse and validate the body in one pass
+        validation = validate_request(MESSAGE_SCHEMA)
         if 'error' in validation:
             return jsonify({
                 'success': False,
@@ -115,47 +326,51 @@ def send_message():
         data = validation['data']
         sender_id = request.user['id']
         
-        # Validate content
-        content = data['content'].strip()
-        if not content:
-            return jsonify({
-                'success': False,
-                'error': 'Message content cannot be empty'
-            }), 400
-        
-        if len(content) > 5000:
+        # Validate content, type and recipient
+        error = message_error(data, sender_id)
+        if error:
             return jsonify({
                 'success': False,
-                'error': 'Message too long (max 5000 characters)'
+                'error': error
             }), 400
         
-        # Validate message type
-        valid_types = ['text', 'emoji', 'gif', 'jpeg', 'multimedia', 'link']
-        if data['message_type'] not in valid_types:
-            return jsonify({
-                'success': False,
-                'error': f'Invalid message type. Must be one of: {", ".join(valid_types)}'
-            }), 400
-        
-        # Prevent sending to self
-        if sender_id == data['recipient_id']:
-            return jsonify({
-                'success': False,
-                'error': 'Cannot send message to yourself'
-            }), 400
-        
-        # Send message through service
-        message = message_service.send_message({
+        outgoing = {
             'sender_id': sender_id,
             'recipient_id': data['recipient_id'],
-            'content': content,
+            'content': data['content'].strip(),
             'message_type': data['message_type'],
             'metadata': data.get('metadata', {})
-        })
+        }
+        
+        # Queue for a group commit (published once stored), or write now
+        if write_behind is not None:
+            try:
+                message = write_behind.submit(outgoing)
+            except QueueFull:
+                return queue_full_response()
+            return jsonify({
+                'success': True,
+                'data': {
+                    'message_id': message['id'],
+                    'timestamp': message['created_at'],
+                    'status': 'queued'
+                }
+            }), 202
+        
+        # Send message through service
+        message = message_service.send_message(outgoing)
         
         logger.info(f"Message sent: {sender_id} -> {data['recipient_id']}, "
                    f"type: {data['message_type']}")
         
+        publish_messages(sender_id, [{
+            'id': message['id'],
+            'created_at': message['created_at'],
+            'recipient_id': data['recipient_id'],
+            'content': data['content'].strip(),
+            'message_type': data['message_type']
+        }])
+        
         return jsonify({
             'success': True,
             'data': {
@@ -187,8 +402,120 @@ def send_message():
         }), 500
 
 
+@message_bp.route('/batch', methods=['POST'])
+@auth_required
+@rate_limited
+def send_messages():
+    """
+    POST /api/messages/batch
+    Send several messages at once: {"messages": [{recipient_id, content, message_type}, ...]}
+    Returns one result per item, in order
+    """
+    try:
+        data = request.get_json(silent=True)
+        items = data.get('messages') if isinstance(data, dict) else None
+        if not isinstance(items, list) or not items:
+            return jsonify({
+                'success': False,
+                'error': 'messages must be a non-empty list'
+            }), 400
+        
+        if len(items) > MAX_BATCH_SIZE:
+            return jsonify({
+                'success': False,
+                'error': f'Too many messages (max {MAX_BATCH_SIZE} per batch)'
+            }), 400
+        
+        sender_id = request.user['id']
+        
+        # Validate every item in one pass; only valid items are written
+        results = []
+        accepted = []
+        to_send = []
+        for index, item in enumerate(items):
+            if not isinstance(item, dict):
+                results.append({'index': index, 'success': False,
+                                'errors': ['Message must be an object']})
+                continue
+            errors = MESSAGE_SCHEMA.errors(item)
+            if errors:
+                results.append({'index': index, 'success': False, 'errors': errors})
+                continue
+            error = message_error(item, sender_id)
+            if error:
+                results.append({'index': index, 'success': False, 'error': error})
+                continue
+            
+            results.append({'index': index, 'success': True})
+            accepted.append(results[-1])
+            to_send.append({
+                'sender_id': sender_id,
+                'recipient_id': item['recipient_id'],
+                'content': item['content'].strip(),
+                'message_type': item['message_type'],
+                'metadata': item.get('metadata', {})
+            })
+        
+        sent = []
+        if to_send and write_behind is not None:
+            try:
+                sent = write_behind.submit_many(to_send)
+            except QueueFull:
+                return queue_full_response()
+            status = 'queued'
+        elif to_send:
+            try:
+                sent = message_service.send_messages(to_send)
+            except ValueError:
+                # A refused recipient aborts the whole transaction; send one
+                # by one so the other messages still go through
+                sent = []
+                for item in to_send:
+                    try:
+                        sent.append(message_service.send_message(item))
+                    except ValueError as e:
+                        sent.append({'error': send_refusal(e)})
+            publish_messages(sender_id, [
+                dict(item, id=message['id'], created_at=message['created_at'])
+                for item, message in zip(to_send, sent) if 'error' not in message
+            ])
+            status = 'delivered'
+        
+        sent_count = 0
+        for result, message in zip(accepted, sent):
+            if 'error' in message:
+                result['success'] = False
+                result['error'] = message['error']
+                continue
+            sent_count += 1
+            result['data'] = {
+                'message_id': message['id'],
+                'timestamp': message['created_at'],
+                'status': status
+            }
+        
+        logger.info(f"Batch send from {sender_id}: {sent_count} sent, "
+                    f"{len(items) - sent_count} rejected")
+        
+        return jsonify({
+            'success': True,
+            'data': {
+                'results': results,
+                'sent_count': sent_count
+            }
+        }), 200
+        
+    except Exception as e:
+        logger.error(f"Error sending message batch: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': 'Failed to send messages. Please try again.'
+        }), 500
+
+
 @message_bp.route('/conversation/<int:user_id>', methods=['GET'])
 @auth_required
+@rate_limited
 def get_conversation(user_id: int):
     """
     GET /api/messages/conversation/<user_id>
@@ -200,6 +527,18 @@ def get_conversation(user_id: int):
         # Get query parameters
         limit = request.args.get('limit', default=50, type=int)
         before_id = request.args.get('before_id', default=None, type=int)
+        if not 1 <= limit <= MAX_CONVERSATION_PAGE:
+            return jsonify({
+                'success': False,
+                'error': f'limit must be between 1 and {MAX_CONVERSATION_PAGE}'
+            }), 400
+        
+        # Unchanged conversations are answered before reading any messages
+        newest_id, writes = message_service.conversation_version(current_user_id, user_id)
+        version = f"{current_user_id}.{user_id}.{newest_id}.{writes}.{limit}.{before_id}"
+        cached = not_modified(version)
+        if cached is not None:
+            return cached
         
         # Get messages from service
         messages = message_service.get_conversation({
@@ -209,14 +548,14 @@ def get_conversation(user_id: int):
             'before_id': before_id
         })
         
-        return jsonify({
+        return encoded_response({
             'success': True,
             'data': {
                 'messages': messages,
                 'count': len(messages),
                 'has_more': len(messages) == limit
             }
-        }), 200
+        }, version=version)
         
     except Exception as e:
         logger.error(f"Error retrieving conversation: {str(e)}")
@@ -228,6 +567,7 @@ def get_conversation(user_id: int):
 
 @message_bp.route('/conversations', methods=['GET'])
 @auth_required
+@rate_limited
 def get_conversations():
     """
     GET /api/messages/conversations
@@ -239,13 +579,23 @@ def get_conversations():
         # Get all conversations
         conversations = message_service.get_user_conversations(user_id)
         
-        return jsonify({
+        # Tag the list by each conversation's newest message and unread count
+        state = ','.join(
+            f"{c['user_id']}:{c['last_message']['id']}:{c['unread_count']}"
+            for c in conversations
+        )
+        version = f"{user_id}.{hashlib.sha1(state.encode()).hexdigest()[:16]}"
+        cached = not_modified(version)
+        if cached is not None:
+            return cached
+        
+        return encoded_response({
             'success': True,
             'data': {
                 'conversations': conversations,
                 'count': len(conversations)
             }
-        }), 200
+        }, version=version)
         
     except Exception as e:
         logger.error(f"Error retrieving conversations: {str(e)}")
@@ -257,6 +607,7 @@ def get_conversations():
 
 @message_bp.route('/<int:message_id>/read', methods=['PUT'])
 @auth_required
+@rate_limited
 def mark_message_read(message_id: int):
     """
     PUT /api/messages/<message_id>/read
@@ -267,6 +618,7 @@ def mark_message_read(message_id: int):
         
         # Mark as read
         message_service.mark_as_read(message_id, user_id)
+        publish_unread_count(user_id)
         
         return jsonify({
             'success': True,
@@ -290,8 +642,100 @@ def mark_message_read(message_id: int):
         }), 500
 
 
+@message_bp.route('/read', methods=['PUT'])
+@auth_required
+@rate_limited
+def mark_messages_read():
+    """
+    PUT /api/messages/read
+    Mark several messages as read: {"message_ids": [...]}
+    Returns one result per distinct id, in order
+    """
+    try:
+        data = request.get_json(silent=True)
+        message_ids = data.get('message_ids') if isinstance(data, dict) else None
+        if (not isinstance(message_ids, list) or not message_ids or
+                not all(isinstance(message_id, int) for message_id in message_ids)):
+            return jsonify({
+                'success': False,
+                'error': 'message_ids must be a non-empty list of int'
+            }), 400
+        
+        message_ids = list(dict.fromkeys(message_ids))
+        if len(message_ids) > MAX_BATCH_SIZE:
+            return jsonify({
+                'success': False,
+                'error': f'Too many messages (max {MAX_BATCH_SIZE} per batch)'
+            }), 400
+        
+        user_id = request.user['id']
+        found = message_service.mark_many_as_read(message_ids, user_id)
+        if found:
+            publish_unread_count(user_id)
+        
+        results = [
+            {'message_id': message_id, 'success': True} if message_id in found else
+            {'message_id': message_id, 'success': False, 'error': 'Message not found'}
+            for message_id in message_ids
+        ]
+        
+        return jsonify({
+            'success': True,
+            'data': {
+                'results': results,
+                'marked_count': len(found)
+            }
+        }), 200
+        
+    except Exception as e:
+        logger.error(f"Error marking messages as read: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': 'Failed to mark messages as read'
+        }), 500
+
+
+@message_bp.route('/conversation/<int:user_id>/read', methods=['PUT'])
+@auth_required
+@rate_limited
+def mark_conversation_read(user_id: int):
+    """
+    PUT /api/messages/conversation/<user_id>/read
+    Mark all messages from a user as read, optionally only up to up_to_id
+    """
+    try:
+        current_user_id = request.user['id']
+        
+        data = request.get_json(silent=True) or {}
+        up_to_id = data.get('up_to_id')
+        if up_to_id is not None and not isinstance(up_to_id, int):
+            return jsonify({
+                'success': False,
+                'error': 'up_to_id must be int'
+            }), 400
+        
+        marked = message_service.mark_conversation_read(current_user_id, user_id, up_to_id)
+        if marked:
+            publish_unread_count(current_user_id)
+        
+        return jsonify({
+            'success': True,
+            'data': {
+                'marked_count': marked
+            }
+        }), 200
+        
+    except Exception as e:
+        logger.error(f"Error marking conversation as read: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': 'Failed to mark conversation as read'
+        }), 500
+
+
 @message_bp.route('/<int:message_id>', methods=['DELETE'])
 @auth_required
+@rate_limited
 def delete_message(message_id: int):
     """
     DELETE /api/messages/<message_id>
@@ -301,7 +745,9 @@ def delete_message(message_id: int):
         user_id = request.user['id']
         
         # Delete message (sender only)
-        message_service.delete_message(message_id, user_id)
+        recipient_id = message_service.delete_message(message_id, user_id)
+        if recipient_id is not None:
+            publish_unread_count(recipient_id)
         
         logger.info(f"Message deleted: {message_id} by user {user_id}")
         
@@ -327,8 +773,116 @@ def delete_message(message_id: int):
         }), 500
 
 
+@message_bp.route('/events', methods=['GET'])
+@auth_required
+@rate_limited
+def stream_events():
+    """
+    GET /api/messages/events
+    Server-Sent Events stream of new messages and unread count changes;
+    reconnecting clients resume after their Last-Event-ID
+    """
+    user_id = request.user['id']
+    last_event_id = request.headers.get('Last-Event-ID', type=int)
+    
+    def generate():
+        # Subscribe once the stream starts, so a client that disconnects
+        # before the first chunk leaves no subscription behind
+        subscription = event_broker.subscribe(user_channel(user_id))
+        try:
+            yield 'retry: 3000\n\n'
+            last_id = last_event_id or 0
+            if last_event_id is not None:
+                for event in event_broker.recent(user_channel(user_id), last_event_id):
+                    last_id = event['id']
+                    yield format_event(event)
+            else:
+                yield format_event({
+                    'type': 'unread_count',
+                    'data': {'unread_count': message_service.get_unread_count(user_id)}
+                })
+            while True:
+                event = subscription.get(timeout=EVENT_HEARTBEAT_SECONDS)
+                if event is None:
+                    yield ': keep-alive\n\n'
+                elif event['id'] > last_id:
+                    last_id = event['id']
+                    yield format_event(event)
+        finally:
+            subscription.close()
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+@message_bp.route('/events/poll', methods=['GET'])
+@auth_required
+@rate_limited
+def poll_events():
+    """
+    GET /api/messages/events/poll?after_id=<event id>&timeout=<seconds>
+    Long-poll: return events after after_id, waiting up to timeout
+    seconds for one if there are none yet. Without after_id only events
+    published from now on are returned; pass the returned last_event_id
+    as after_id on the next poll.
+    """
+    subscription = None
+    try:
+        user_id = request.user['id']
+        after_id = request.args.get('after_id', type=int)
+        timeout = min(max(request.args.get('timeout', default=25, type=float), 0),
+                      MAX_POLL_SECONDS)
+        
+        channel = user_channel(user_id)
+        if after_id is None:
+            history = event_broker.recent(channel, 0)
+            after_id = history[-1]['id'] if history else 0
+        subscription = event_broker.subscribe(channel)
+        events = event_broker.recent(channel, after_id)
+        if not events:
+            event = subscription.get(timeout=timeout)
+            while event is not None:
+                if event['id'] > after_id:
+                    events.append(event)
+                event = subscription.get(timeout=0)
+        
+        return jsonify({
+            'success': True,
+            'data': {
+                'events': events,
+                'count': len(events),
+                'last_event_id': events[-1]['id'] if events else after_id
+            }
+        }), 200
+        
+    except Exception as e:
+        logger.error(f"Error polling events: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': 'Failed to poll events'
+        }), 500
+    
+    finally:
+        if subscription is not None:
+            subscription.close()
+
+
+def format_event(event: Dict) -> str:
+    """Render one event in the text/event-stream format"""
+    lines = []
+    if 'id' in event:
+        lines.append(f"id: {event['id']}")
+    lines.append(f"event: {event['type']}")
+    lines.append(f"data: {json.dumps(event['data'], default=str)}")
+    return '\n'.join(lines) + '\n\n'
+
+
 @message_bp.route('/unread/count', methods=['GET'])
 @auth_required
+@rate_limited
 def get_unread_count():
     """
     GET /api/messages/unread/count
@@ -370,10 +924,15 @@ if __name__ == '__main__':
     print("Message Controller is running!")
     print("Available endpoints:")
     print("  POST   /api/messages")
+    print("  POST   /api/messages/batch")
     print("  GET    /api/messages/conversation/<user_id>")
     print("  GET    /api/messages/conversations")
     print("  PUT    /api/messages/<message_id>/read")
+    print("  PUT    /api/messages/read")
+    print("  PUT    /api/messages/conversation/<user_id>/read")
     print("  DELETE /api/messages/<message_id>")
     print("  GET    /api/messages/unread/count")
+    print("  GET    /api/messages/events          (Server-Sent Events)")
+    print("  GET    /api/messages/events/poll     (long-poll)")
     
-    app.run(debug=True, port=5000)
+    app.run(debug=True, port=5000, threaded=True)
@@ -0,0 +1,190 @@
+# message_events.py
+
+"""
+Pub/sub fan-out for pushing message events to connected clients.
+
+A broker delivers JSON-serialisable events published on a channel to
+every current subscription of that channel. Brokers implement:
+
+    publish(channel, event)
+    subscribe(channel) -> subscription with get(timeout) and close()
+    recent(channel, after_id) -> buffered events with a larger id
+
+Published events get increasing ids. recent() replays the last few
+events of a channel, so long-poll and reconnecting SSE clients
+(Last-Event-ID) do not lose events published between requests. Ids
+start from the current time in microseconds, so they keep increasing
+across broker restarts (at under a million events per second) and a
+client's Last-Event-ID from before a restart does not hide new events.
+
+InProcessBroker serves a single process (and tests); RedisBroker shares
+events between processes through Redis pub/sub and needs the redis
+package (pip install redis).
+"""
+
+from typing import Dict, List, Optional, Set, Any
+from collections import OrderedDict, deque
+import itertools
+import json
+import logging
+import threading
+import time
+
+try:
+    import redis
+except ImportError:  # pragma: no cover - optional dependency
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+
+def _id_epoch() -> int:
+    """First event id of a fresh broker: the current time in microseconds"""
+    return time.time_ns() // 1000
+
+
+def user_channel(user_id: int) -> str:
+    """Channel carrying the events of one user"""
+    return f"user:{user_id}"
+
+
+class Subscription:
+    """Bounded event queue of one subscriber"""
+
+    def __init__(self, broker: 'InProcessBroker', channel: str, max_pending: int):
+        self.broker = broker
+        self.channel = channel
+        self._events = deque(maxlen=max_pending)
+        self._ready = threading.Condition()
+        self.closed = False
+
+    def put(self, event: Dict):
+        with self._ready:
+            self._events.append(event)
+            self._ready.notify()
+
+    def get(self, timeout: Optional[float] = None) -> Optional[Dict]:
+        """Next event, or None if none arrived within timeout"""
+        with self._ready:
+            if not self._events and not self.closed:
+                self._ready.wait(timeout)
+            return self._events.popleft() if self._events else None
+
+    def close(self):
+        with self._ready:
+            self.closed = True
+            self._ready.notify_all()
+        self.broker._unsubscribe(self)
+
+
+class InProcessBroker:
+    """Broker for a single process.
+
+    Each subscription keeps at most max_pending undelivered events; the
+    oldest are dropped when a client falls behind. The last `history`
+    events are kept for the `max_channels` most recently used channels.
+    """
+
+    def __init__(self, max_pending: int = 1000, history: int = 50, max_channels: int = 10000):
+        self.max_pending = max_pending
+        self.history = history
+        self.max_channels = max_channels
+        self._subscriptions: Dict[str, Set[Subscription]] = {}
+        self._recent: 'OrderedDict[str, deque]' = OrderedDict()
+        self._ids = itertools.count(_id_epoch())
+        self._lock = threading.Lock()
+
+    def publish(self, channel: str, event: Dict[str, Any]):
+        """Deliver an event to every subscriber of channel"""
+        with self._lock:
+            event = dict(event, id=next(self._ids))
+            recent = self._recent.get(channel)
+            if recent is None:
+                recent = self._recent[channel] = deque(maxlen=self.history)
+                if len(self._recent) > self.max_channels:
+                    self._recent.popitem(last=False)
+            else:
+                self._recent.move_to_end(channel)
+            recent.append(event)
+            subscribers = list(self._subscriptions.get(channel, ()))
+        for subscription in subscribers:
+            subscription.put(event)
+
+    def recent(self, channel: str, after_id: int) -> List[Dict]:
+        """Buffered events of channel with an id above after_id, oldest first"""
+        with self._lock:
+            return [event for event in self._recent.get(channel, ()) if event['id'] > after_id]
+
+    def subscribe(self, channel: str) -> Subscription:
+        subscription = Subscription(self, channel, self.max_pending)
+        with self._lock:
+            self._subscriptions.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def subscriber_count(self, channel: str) -> int:
+        with self._lock:
+            return len(self._subscriptions.get(channel, ()))
+
+    def _unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            subscribers = self._subscriptions.get(subscription.channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscriptions[subscription.channel]
+
+
+class RedisSubscription:
+    """Redis pub/sub subscription with the Subscription interface"""
+
+    def __init__(self, pubsub, channel: str):
+        self._pubsub = pubsub
+        self.channel = channel
+        pubsub.subscribe(channel)
+
+    def get(self, timeout: Optional[float] = None) -> Optional[Dict]:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = 1.0 if deadline is None else max(0.0, deadline - time.monotonic())
+            message = self._pubsub.get_message(ignore_subscribe_messages=True,
+                                               timeout=remaining)
+            if message is not None and message['type'] == 'message':
+                return json.loads(message['data'])
+            if deadline is not None and time.monotonic() >= deadline:
+                return None
+
+    def close(self):
+        self._pubsub.close()
+
+
+class RedisBroker:
+    """Broker backed by Redis pub/sub, for several server processes"""
+
+    def __init__(self, url: str = 'redis://localhost:6379/0', history: int = 50,
+                 history_ttl_seconds: int = 3600):
+        if redis is None:
+            raise ImportError("RedisBroker requires redis (pip install redis)")
+        self._client = redis.Redis.from_url(url)
+        self.history = history
+        self.history_ttl_seconds = history_ttl_seconds
+        # Only takes effect on a fresh Redis; an existing counter keeps counting
+        self._client.set('message_events:id', _id_epoch(), nx=True)
+
+    def publish(self, channel: str, event: Dict[str, Any]):
+        event = dict(event, id=self._client.incr('message_events:id'))
+        payload = json.dumps(event, default=str)
+        history_key = f"message_events:recent:{channel}"
+        pipeline = self._client.pipeline()
+        pipeline.publish(channel, payload)
+        pipeline.rpush(history_key, payload)
+        pipeline.ltrim(history_key, -self.history, -1)
+        pipeline.expire(history_key, self.history_ttl_seconds)
+        pipeline.execute()
+
+    def recent(self, channel: str, after_id: int) -> List[Dict]:
+        events = (json.loads(payload) for payload in
+                  self._client.lrange(f"message_events:recent:{channel}", 0, -1))
+        return [event for event in events if event['id'] > after_id]
+
+    def subscribe(self, channel: str) -> RedisSubscription:
+        return RedisSubscription(self._client.pubsub(), channel)
@@ -0,0 +1,281 @@
+# message_queue.py
+
+"""
+Write-behind ingestion for sent messages.
+
+WriteBehindQueue gives every accepted message its id and timestamp at
+once, appends it to a local log and queues it. A background worker
+drains the queue into MessageService.send_messages in group commits of
+up to batch_size messages, so a burst becomes a few multi-row
+transactions instead of one transaction per message.
+
+Ids are allocated in this process, counting up from the store's largest
+id, so all sends must go through one queue (one server process per
+store). Queued messages are not yet visible to reads; the worker
+flushes within flush_interval seconds.
+
+Recovery: the store is the checkpoint. On start, logged messages with an
+id above the store's largest id were never committed and are queued
+again. The log is truncated whenever the queue drains and it has grown
+past max_log_bytes.
+
+Usage:
+    python message_queue.py             # burst benchmark against SQLite
+"""
+
+from typing import Callable, Dict, List, Optional
+from collections import deque
+from datetime import datetime, timezone
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Store errors worth retrying; every other error drops the message
+TRANSIENT_ERRORS = (sqlite3.OperationalError, ConnectionError, TimeoutError)
+
+
+class QueueFull(Exception):
+    """Raised when the queue holds max_pending messages"""
+
+
+def _utc_now() -> str:
+    return datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+class WriteBehindQueue:
+    """Bounded queue of accepted messages flushed by a background worker.
+
+    on_commit, if given, is called from the worker with every committed
+    group (a list of message dicts including id and created_at).
+    """
+
+    def __init__(self, message_service, log_path: Optional[str] = None,
+                 max_pending: int = 10000, batch_size: int = 200,
+                 flush_interval: float = 0.05, retry_seconds: float = 1.0,
+                 max_log_bytes: int = 64 * 1024 * 1024, fsync: bool = False,
+                 on_commit: Optional[Callable[[List[Dict]], None]] = None):
+        self.message_service = message_service
+        self.log_path = log_path
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retry_seconds = retry_seconds
+        self.max_log_bytes = max_log_bytes
+        self.fsync = fsync
+        self.on_commit = on_commit
+
+        self._pending: deque = deque()
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._ready = threading.Condition(self._lock)
+        self._drained = threading.Condition(self._lock)
+        self._stopping = False
+        self.committed = 0
+        self.commits = 0
+
+        self._next_id = message_service.max_message_id() + 1
+        self._log = None
+        if log_path is not None:
+            self._recover()
+            self._log = open(log_path, 'a', encoding='utf-8')
+
+        self._worker = threading.Thread(target=self._run, name='message-write-behind',
+                                        daemon=True)
+        self._worker.start()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._pending) + self._in_flight
+
+    def submit(self, data: Dict) -> Dict:
+        """Accept one message; returns its id and created_at"""
+        return self.submit_many([data])[0]
+
+    def submit_many(self, messages: List[Dict]) -> List[Dict]:
+        """Accept several messages, all or none; raises QueueFull"""
+        created_at = _utc_now()
+        with self._lock:
+            if self._stopping:
+                raise QueueFull("Message queue is shutting down")
+            if len(self._pending) + self._in_flight + len(messages) > self.max_pending:
+                raise QueueFull("Message queue is full")
+
+            records = []
+            for data in messages:
+                records.append(dict(data, id=self._next_id, created_at=created_at))
+                self._next_id += 1
+            if self._log is not None:
+                self._log.write(''.join(json.dumps(record) + '\n' for record in records))
+                self._log.flush()
+                if self.fsync:
+                    os.fsync(self._log.fileno())
+            self._pending.extend(records)
+            self._ready.notify()
+        return [{'id': record['id'], 'created_at': created_at} for record in records]
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every accepted message is committed"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            while self._pending or self._in_flight:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._drained.wait(remaining)
+        return True
+
+    def close(self, timeout: Optional[float] = 10.0):
+        """Stop accepting messages, commit the queue and stop the worker"""
+        self.flush(timeout)
+        with self._lock:
+            self._stopping = True
+            self._ready.notify()
+        self._worker.join(timeout)
+        if self._log is not None:
+            self._log.close()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while not self._pending and not self._stopping:
+                    self._ready.wait()
+                if not self._pending:
+                    return
+                # Let a burst build up into one group commit
+                deadline = time.monotonic() + self.flush_interval
+                while len(self._pending) < self.batch_size and not self._stopping:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._ready.wait(remaining)
+                count = min(self.batch_size, len(self._pending))
+                group = [self._pending.popleft() for _ in range(count)]
+                self._in_flight = count
+
+            committed = self._commit(group)
+
+            with self._lock:
+                # Messages left after a transient failure go back to the front
+                self._pending.extendleft(reversed(group[committed:]))
+                self._in_flight = 0
+                self.committed += committed
+                if committed:
+                    self.commits += 1
+                if not self._pending:
+                    self._truncate_log()
+                    self._drained.notify_all()
+            if committed < len(group):
+                time.sleep(self.retry_seconds)
+
+    def _commit(self, group: List[Dict]) -> int:
+        """Write a group; returns how many leading messages are done"""
+        try:
+            self.message_service.send_messages(group)
+        except Exception as e:
+            logger.warning(f"Group commit of {len(group)} messages failed: {str(e)}")
+            return self._commit_one_by_one(group)
+        self._notify(group)
+        return len(group)
+
+    def _commit_one_by_one(self, group: List[Dict]) -> int:
+        """Isolate rejected messages; stop at the first transient failure.
+
+        Only an unavailable store (sqlite3.OperationalError, such as a
+        locked database, or a connection error) is retried. Any other
+        error, such as a ValueError or an IntegrityError from a duplicate
+        id, would fail again on every retry, so that message is dropped.
+        """
+        done = 0
+        for record in group:
+            try:
+                self.message_service.send_messages([record])
+                self._notify([record])
+            except TRANSIENT_ERRORS as e:
+                logger.warning(f"Message store unavailable, retrying: {str(e)}")
+                break
+            except Exception as e:
+                logger.error(f"Dropping message {record['id']}: {type(e).__name__}: {str(e)}")
+            done += 1
+        return done
+
+    def _notify(self, records: List[Dict]):
+        if self.on_commit is not None:
+            try:
+                self.on_commit(records)
+            except Exception as e:
+                logger.warning(f"on_commit failed: {str(e)}")
+
+    def _recover(self):
+        if not os.path.exists(self.log_path):
+            return
+        committed_id = self._next_id - 1
+        with open(self.log_path, encoding='utf-8') as log:
+            for line in log:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Torn final line from a crash mid-write
+                    continue
+                if record['id'] > committed_id:
+                    self._pending.append(record)
+                    self._next_id = max(self._next_id, record['id'] + 1)
+        if self._pending:
+            logger.info(f"Recovered {len(self._pending)} uncommitted messages from "
+                        f"{self.log_path}")
+
+    def _truncate_log(self):
+        if self._log is not None and self._log.tell() > self.max_log_bytes:
+            self._log.truncate(0)
+            self._log.seek(0)
+
+
+if __name__ == '__main__':
+    import argparse
+    import tempfile
+
+    from message_store import SQLiteMessageService
+
+    parser = argparse.ArgumentParser(description="Benchmark write-behind message ingestion")
+    parser.add_argument('--messages', type=int, default=20000)
+    parser.add_argument('--threads', type=int, default=8)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+
+    def burst(send: Callable[[Dict], Dict]) -> float:
+        per_thread = args.messages // args.threads
+
+        def client(number: int):
+            for i in range(per_thread):
+                send({'sender_id': number + 1, 'recipient_id': (number + i) % 50 + 100,
+                      'content': f"after class {i}", 'message_type': 'text'})
+
+        threads = [threading.Thread(target=client, args=(n,)) for n in range(args.threads)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return time.perf_counter() - started
+
+    direct = SQLiteMessageService(os.path.join(directory, 'direct.db'))
+    elapsed = burst(direct.send_message)
+    print(f"  {'synchronous send_message':<32} {args.messages / elapsed:10.0f} messages/s")
+
+    store = SQLiteMessageService(os.path.join(directory, 'queued.db'))
+    queue = WriteBehindQueue(store, os.path.join(directory, 'queued.log'),
+                             max_pending=args.messages)
+    accepted = burst(queue.submit)
+    started = time.perf_counter()
+    queue.flush()
+    committed = accepted + time.perf_counter() - started
+    print(f"  {'write-behind, accepted':<32} {args.messages / accepted:10.0f} messages/s")
+    print(f"  {'write-behind, committed':<32} {args.messages / committed:10.0f} messages/s")
+    print(f"  {'write-behind, group commits':<32} {queue.commits:10d} "
+          f"(avg {queue.committed / max(1, queue.commits):.0f} messages)")
+    queue.close()
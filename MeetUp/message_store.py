@@ -0,0 +1,589 @@
+# message_store.py
+
+"""
+SQLite-backed MessageService for message_controller_python.
+
+Messages are keyed by their conversation pair (lower user id, higher
+user id) with a composite index on (user_low, user_high, id), so a page
+of history is one index range scan whatever the conversation length:
+get_conversation pages backwards with `id < before_id` (keyset
+pagination) instead of OFFSET.
+
+conversation_summaries holds one row per user and conversation partner
+with the last message and that user's unread count. It is updated in
+the same transaction as every send, read and delete, so listing
+conversations and counting unread messages never scan the messages
+table. unread_counters keeps each user's total unread count, so
+get_unread_count is a single primary-key lookup, and the result is
+cached in-process for a short TTL (dropped on local writes).
+conversation_versions counts the writes to each conversation, so
+conversation_version can tag a page of history (HTTP ETags) without
+reading it.
+
+Usage:
+    python message_store.py                          # 2M messages, temp file
+    python message_store.py --messages 5000000 --db messages.db
+"""
+
+from typing import List, Dict, Optional, Any, Tuple, Set
+from datetime import datetime, timezone
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_low INTEGER NOT NULL,
+    user_high INTEGER NOT NULL,
+    sender_id INTEGER NOT NULL,
+    recipient_id INTEGER NOT NULL,
+    content TEXT NOT NULL,
+    message_type TEXT NOT NULL,
+    metadata TEXT,
+    created_at TEXT NOT NULL,
+    read_at TEXT,
+    deleted_at TEXT
+);
+
+CREATE INDEX IF NOT EXISTS messages_pair_id ON messages (user_low, user_high, id);
+
+CREATE TABLE IF NOT EXISTS conversation_summaries (
+    user_id INTEGER NOT NULL,
+    other_user_id INTEGER NOT NULL,
+    last_message_id INTEGER NOT NULL,
+    last_sender_id INTEGER NOT NULL,
+    last_content TEXT NOT NULL,
+    last_message_type TEXT NOT NULL,
+    last_message_at TEXT NOT NULL,
+    unread_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, other_user_id)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS conversation_summaries_recent
+    ON conversation_summaries (user_id, last_message_id DESC);
+
+CREATE TABLE IF NOT EXISTS unread_counters (
+    user_id INTEGER PRIMARY KEY,
+    unread_count INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS conversation_versions (
+    user_low INTEGER NOT NULL,
+    user_high INTEGER NOT NULL,
+    version INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_low, user_high)
+) WITHOUT ROWID;
+"""
+
+# Largest page of history get_conversation returns
+MAX_CONVERSATION_PAGE = 100
+
+MESSAGE_COLUMNS = ("id, sender_id, recipient_id, content, message_type, metadata, "
+                   "created_at, read_at")
+
+
+def _utc_now() -> str:
+    return datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def _pair(user1_id: int, user2_id: int):
+    return (user1_id, user2_id) if user1_id < user2_id else (user2_id, user1_id)
+
+
+class SQLiteMessageService:
+    """MessageService backed by a local SQLite database.
+
+    One connection is shared by all threads and every operation runs
+    under a lock in its own transaction. Use ':memory:' for a throwaway
+    store. Unread counts are cached for unread_ttl_seconds, which bounds
+    staleness when other processes write to the same database.
+    """
+
+    def __init__(self, path: str = ':memory:', unread_ttl_seconds: float = 2.0,
+                 clock=time.monotonic):
+        self.path = path
+        self.unread_ttl_seconds = unread_ttl_seconds
+        self._clock = clock
+        self._unread_cache: Dict[int, Tuple[int, float]] = {}
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        if path != ':memory:':
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def send_message(self, data: Dict) -> Dict:
+        """Store a message and update both participants' summaries"""
+        created_at = _utc_now()
+        with self._lock, self._transaction():
+            message_id = self._insert_message(data, created_at)
+        return {'id': message_id, 'created_at': created_at}
+
+    def send_messages(self, messages: List[Dict]) -> List[Dict]:
+        """Store several messages in one transaction, in order.
+
+        Messages may carry a preassigned 'id' and 'created_at' (see
+        message_queue.WriteBehindQueue); otherwise both are assigned here.
+        """
+        created_at = _utc_now()
+        with self._lock, self._transaction():
+            return [
+                {'id': self._insert_message(data, data.get('created_at', created_at)),
+                 'created_at': data.get('created_at', created_at)}
+                for data in messages
+            ]
+
+    def max_message_id(self) -> int:
+        """Largest message id ever stored, 0 for an empty store"""
+        with self._lock:
+            return self._db.execute("SELECT MAX(id) FROM messages").fetchone()[0] or 0
+
+    def get_conversation(self, params: Dict) -> List[Dict]:
+        """Messages between two users, newest first, older than before_id.
+
+        Raises ValueError unless 1 <= limit <= MAX_CONVERSATION_PAGE;
+        SQLite would treat a negative LIMIT as no limit.
+        """
+        user_low, user_high = _pair(params['user1_id'], params['user2_id'])
+        before_id = params.get('before_id')
+        limit = params.get('limit', 50)
+        if not isinstance(limit, int) or not 1 <= limit <= MAX_CONVERSATION_PAGE:
+            raise ValueError(f"limit must be between 1 and {MAX_CONVERSATION_PAGE}")
+
+        query = (f"SELECT {MESSAGE_COLUMNS} FROM messages "
+                 "WHERE user_low = ? AND user_high = ? AND deleted_at IS NULL ")
+        args: List[Any] = [user_low, user_high]
+        if before_id is not None:
+            query += "AND id < ? "
+            args.append(before_id)
+        query += "ORDER BY id DESC LIMIT ?"
+        args.append(limit)
+
+        with self._lock:
+            rows = self._db.execute(query, args).fetchall()
+        return [self._message_dict(row) for row in rows]
+
+    def conversation_version(self, user1_id: int, user2_id: int) -> Tuple[int, int]:
+        """(newest message id, write count) of a conversation.
+
+        Changes whenever a message in the conversation is sent, read or
+        deleted; two index lookups, no message rows are read.
+        """
+        user_low, user_high = _pair(user1_id, user2_id)
+        with self._lock:
+            newest = self._db.execute(
+                "SELECT MAX(id) FROM messages WHERE user_low = ? AND user_high = ?",
+                (user_low, user_high)
+            ).fetchone()[0]
+            version = self._db.execute(
+                "SELECT version FROM conversation_versions WHERE user_low = ? AND user_high = ?",
+                (user_low, user_high)
+            ).fetchone()
+        return (newest or 0, version[0] if version is not None else 0)
+
+    def get_user_conversations(self, user_id: int) -> List[Dict]:
+        """Conversation summaries for a user, most recent first"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT * FROM conversation_summaries WHERE user_id = ? "
+                "ORDER BY last_message_id DESC",
+                (user_id,)
+            ).fetchall()
+        return [
+            {
+                'user_id': row['other_user_id'],
+                'last_message': {
+                    'id': row['last_message_id'],
+                    'sender_id': row['last_sender_id'],
+                    'content': row['last_content'],
+                    'message_type': row['last_message_type'],
+                    'created_at': row['last_message_at']
+                },
+                'unread_count': row['unread_count']
+            }
+            for row in rows
+        ]
+
+    def mark_as_read(self, message_id: int, user_id: int):
+        """Mark a received message as read"""
+        with self._lock, self._transaction():
+            row = self._db.execute(
+                "SELECT sender_id, read_at FROM messages "
+                "WHERE id = ? AND recipient_id = ? AND deleted_at IS NULL",
+                (message_id, user_id)
+            ).fetchone()
+            if row is None:
+                raise ValueError("Message not found or not authorized")
+            if row['read_at'] is not None:
+                return
+
+            self._db.execute("UPDATE messages SET read_at = ? WHERE id = ?",
+                             (_utc_now(), message_id))
+            self._add_unread(user_id, row['sender_id'], -1)
+            self._bump_version(user_id, row['sender_id'])
+
+    def mark_many_as_read(self, message_ids: List[int], user_id: int) -> Set[int]:
+        """Mark several received messages as read in one transaction.
+
+        Returns the ids that exist and were sent to user_id (read before
+        or now); other ids are ignored.
+        """
+        found: Set[int] = set()
+        if not message_ids:
+            return found
+
+        read_at = _utc_now()
+        with self._lock, self._transaction():
+            unread_by_sender: Dict[int, int] = {}
+            for first in range(0, len(message_ids), 500):
+                chunk = message_ids[first:first + 500]
+                rows = self._db.execute(
+                    "SELECT id, sender_id, read_at FROM messages "
+                    f"WHERE id IN ({', '.join('?' * len(chunk))}) "
+                    "AND recipient_id = ? AND deleted_at IS NULL",
+                    (*chunk, user_id)
+                ).fetchall()
+                unread_ids = []
+                for row in rows:
+                    found.add(row['id'])
+                    if row['read_at'] is None:
+                        unread_ids.append(row['id'])
+                        unread_by_sender[row['sender_id']] = (
+                            unread_by_sender.get(row['sender_id'], 0) + 1
+                        )
+                if unread_ids:
+                    self._db.execute(
+                        "UPDATE messages SET read_at = ? "
+                        f"WHERE id IN ({', '.join('?' * len(unread_ids))})",
+                        (read_at, *unread_ids)
+                    )
+            for sender_id, count in unread_by_sender.items():
+                self._add_unread(user_id, sender_id, -count)
+                self._bump_version(user_id, sender_id)
+        return found
+
+    def mark_conversation_read(self, user_id: int, other_user_id: int,
+                               up_to_id: Optional[int] = None) -> int:
+        """Mark every message from other_user_id up to up_to_id as read.
+
+        Returns the number of messages marked.
+        """
+        user_low, user_high = _pair(user_id, other_user_id)
+        query = ("UPDATE messages SET read_at = ? "
+                 "WHERE user_low = ? AND user_high = ? AND recipient_id = ? "
+                 "AND read_at IS NULL AND deleted_at IS NULL")
+        args: List[Any] = [_utc_now(), user_low, user_high, user_id]
+        if up_to_id is not None:
+            query += " AND id <= ?"
+            args.append(up_to_id)
+
+        with self._lock, self._transaction():
+            marked = self._db.execute(query, args).rowcount
+            if marked:
+                self._add_unread(user_id, other_user_id, -marked)
+                self._bump_version(user_id, other_user_id)
+        return marked
+
+    def delete_message(self, message_id: int, user_id: int) -> Optional[int]:
+        """Soft-delete a message (sender only).
+
+        Returns the recipient's id if their unread count changed.
+        """
+        with self._lock, self._transaction():
+            row = self._db.execute(
+                "SELECT recipient_id, read_at FROM messages "
+                "WHERE id = ? AND sender_id = ? AND deleted_at IS NULL",
+                (message_id, user_id)
+            ).fetchone()
+            if row is None:
+                raise ValueError("Message not found or not authorized")
+            recipient_id = row['recipient_id']
+
+            self._db.execute("UPDATE messages SET deleted_at = ? WHERE id = ?",
+                             (_utc_now(), message_id))
+            if row['read_at'] is None:
+                self._add_unread(recipient_id, user_id, -1)
+            self._refresh_last_message(user_id, recipient_id, message_id)
+            self._bump_version(user_id, recipient_id)
+        return recipient_id if row['read_at'] is None else None
+
+    def get_unread_count(self, user_id: int) -> int:
+        """Unread messages across all of a user's conversations"""
+        now = self._clock()
+        cached = self._unread_cache.get(user_id)
+        if cached is not None and cached[1] > now:
+            return cached[0]
+
+        with self._lock:
+            row = self._db.execute(
+                "SELECT unread_count FROM unread_counters WHERE user_id = ?",
+                (user_id,)
+            ).fetchone()
+            count = row[0] if row is not None else 0
+            self._unread_cache[user_id] = (count, now + self.unread_ttl_seconds)
+        return count
+
+    def rebuild_summaries(self):
+        """Recompute conversation_summaries from the messages table.
+
+        For backfills and bulk imports; normal writes keep the table in
+        sync incrementally.
+        """
+        with self._lock, self._transaction():
+            self._db.execute("DELETE FROM conversation_summaries")
+            for user_column, other_column in (('user_low', 'user_high'),
+                                              ('user_high', 'user_low')):
+                self._db.execute(
+                    "INSERT INTO conversation_summaries (user_id, other_user_id, "
+                    "last_message_id, last_sender_id, last_content, last_message_type, "
+                    "last_message_at, unread_count) "
+                    f"SELECT m.{user_column}, m.{other_column}, m.id, m.sender_id, m.content, "
+                    "m.message_type, m.created_at, "
+                    "(SELECT COUNT(*) FROM messages u WHERE u.user_low = m.user_low "
+                    " AND u.user_high = m.user_high "
+                    f" AND u.recipient_id = m.{user_column} "
+                    " AND u.read_at IS NULL AND u.deleted_at IS NULL) "
+                    "FROM messages m WHERE m.id IN ("
+                    "  SELECT MAX(id) FROM messages WHERE deleted_at IS NULL "
+                    "  GROUP BY user_low, user_high)"
+                )
+            self._db.execute("DELETE FROM unread_counters")
+            self._db.execute(
+                "INSERT INTO unread_counters (user_id, unread_count) "
+                "SELECT user_id, SUM(unread_count) FROM conversation_summaries "
+                "GROUP BY user_id"
+            )
+            self._unread_cache.clear()
+
+    def _insert_message(self, data: Dict, created_at: str) -> int:
+        sender_id = data['sender_id']
+        recipient_id = data['recipient_id']
+        user_low, user_high = _pair(sender_id, recipient_id)
+        cursor = self._db.execute(
+            "INSERT INTO messages (id, user_low, user_high, sender_id, recipient_id, content, "
+            "message_type, metadata, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (data.get('id'), user_low, user_high, sender_id, recipient_id, data['content'],
+             data['message_type'], json.dumps(data.get('metadata') or {}), created_at)
+        )
+        message_id = cursor.lastrowid
+
+        for user_id, other_id in ((sender_id, recipient_id), (recipient_id, sender_id)):
+            self._db.execute(
+                "INSERT INTO conversation_summaries (user_id, other_user_id, last_message_id, "
+                "last_sender_id, last_content, last_message_type, last_message_at, unread_count) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (user_id, other_user_id) DO UPDATE SET "
+                "last_message_id = excluded.last_message_id, "
+                "last_sender_id = excluded.last_sender_id, "
+                "last_content = excluded.last_content, "
+                "last_message_type = excluded.last_message_type, "
+                "last_message_at = excluded.last_message_at",
+                (user_id, other_id, message_id, sender_id, data['content'],
+                 data['message_type'], created_at, 0)
+            )
+        self._add_unread(recipient_id, sender_id, 1)
+        self._bump_version(sender_id, recipient_id)
+        return message_id
+
+    def _add_unread(self, user_id: int, other_user_id: int, delta: int):
+        """Adjust a user's unread counts; call inside the write transaction"""
+        self._db.execute(
+            "UPDATE conversation_summaries SET unread_count = MAX(0, unread_count + ?) "
+            "WHERE user_id = ? AND other_user_id = ?",
+            (delta, user_id, other_user_id)
+        )
+        self._db.execute(
+            "INSERT INTO unread_counters (user_id, unread_count) VALUES (?, MAX(0, ?)) "
+            "ON CONFLICT (user_id) DO UPDATE SET unread_count = MAX(0, unread_count + ?)",
+            (user_id, delta, delta)
+        )
+        self._unread_cache.pop(user_id, None)
+
+    def _bump_version(self, user1_id: int, user2_id: int):
+        """Record a write to a conversation; call inside the write transaction"""
+        self._db.execute(
+            "INSERT INTO conversation_versions (user_low, user_high, version) VALUES (?, ?, 1) "
+            "ON CONFLICT (user_low, user_high) DO UPDATE SET version = version + 1",
+            _pair(user1_id, user2_id)
+        )
+
+    def _refresh_last_message(self, user1_id: int, user2_id: int, deleted_id: int):
+        """Point both summaries at the newest remaining message after a delete"""
+        summary = self._db.execute(
+            "SELECT last_message_id FROM conversation_summaries "
+            "WHERE user_id = ? AND other_user_id = ?",
+            (user1_id, user2_id)
+        ).fetchone()
+        if summary is None or summary['last_message_id'] != deleted_id:
+            return
+
+        user_low, user_high = _pair(user1_id, user2_id)
+        last = self._db.execute(
+            "SELECT id, sender_id, content, message_type, created_at FROM messages "
+            "WHERE user_low = ? AND user_high = ? AND deleted_at IS NULL "
+            "ORDER BY id DESC LIMIT 1",
+            (user_low, user_high)
+        ).fetchone()
+        for user_id, other_id in ((user1_id, user2_id), (user2_id, user1_id)):
+            if last is None:
+                self._db.execute(
+                    "DELETE FROM conversation_summaries WHERE user_id = ? AND other_user_id = ?",
+                    (user_id, other_id)
+                )
+            else:
+                self._db.execute(
+                    "UPDATE conversation_summaries SET last_message_id = ?, last_sender_id = ?, "
+                    "last_content = ?, last_message_type = ?, last_message_at = ? "
+                    "WHERE user_id = ? AND other_user_id = ?",
+                    (last['id'], last['sender_id'], last['content'], last['message_type'],
+                     last['created_at'], user_id, other_id)
+                )
+
+    def _transaction(self):
+        return _Transaction(self._db)
+
+    @staticmethod
+    def _message_dict(row: sqlite3.Row) -> Dict:
+        return {
+            'id': row['id'],
+            'sender_id': row['sender_id'],
+            'recipient_id': row['recipient_id'],
+            'content': row['content'],
+            'message_type': row['message_type'],
+            'metadata': json.loads(row['metadata']) if row['metadata'] else {},
+            'created_at': row['created_at'],
+            'read_at': row['read_at']
+        }
+
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT, rolled back on error"""
+
+    def __init__(self, db: sqlite3.Connection):
+        self.db = db
+
+    def __enter__(self):
+        self.db.execute("BEGIN IMMEDIATE")
+        return self.db
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is None:
+            self.db.execute("COMMIT")
+        else:
+            self.db.execute("ROLLBACK")
+        return False
+
+
+def _load_synthetic(service: SQLiteMessageService, messages: int, users: int,
+                    partners: int, seed: int):
+    """Bulk-insert a synthetic message history and build the summaries"""
+    import random
+
+    rng = random.Random(seed)
+    pairs = set()
+    while len(pairs) < users * partners // 2:
+        user1, user2 = rng.randrange(1, users + 1), rng.randrange(1, users + 1)
+        if user1 != user2:
+            pairs.add(_pair(user1, user2))
+    pairs = sorted(pairs)
+    # A few conversations carry most of the traffic
+    weights = [1.0 / (rank + 1) ** 0.7 for rank in range(len(pairs))]
+    rng.shuffle(weights)
+
+    def rows():
+        chosen = rng.choices(pairs, weights, k=messages)
+        for number, (user_low, user_high) in enumerate(chosen):
+            sender, recipient = ((user_low, user_high) if rng.random() < 0.5
+                                 else (user_high, user_low))
+            read_at = None if rng.random() < 0.1 else '2025-01-15T10:31:00Z'
+            yield (user_low, user_high, sender, recipient, f"message {number}", 'text',
+                   '{}', '2025-01-15T10:30:00Z', read_at)
+
+    with service._lock, service._transaction():
+        service._db.executemany(
+            "INSERT INTO messages (user_low, user_high, sender_id, recipient_id, content, "
+            "message_type, metadata, created_at, read_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            rows()
+        )
+    service.rebuild_summaries()
+
+
+if __name__ == '__main__':
+    import argparse
+    import os
+    import random
+    import statistics
+    import tempfile
+    import time
+
+    parser = argparse.ArgumentParser(description="Benchmark the SQLite message store")
+    parser.add_argument('--messages', type=int, default=2_000_000)
+    parser.add_argument('--users', type=int, default=20_000)
+    parser.add_argument('--partners', type=int, default=20,
+                        help='average conversation partners per user')
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--db', help='database file (default: a temporary file)')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    path = args.db or os.path.join(tempfile.mkdtemp(), 'messages.db')
+    service = SQLiteMessageService(path)
+    existing = service._db.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+    if existing < args.messages:
+        print(f"Loading {args.messages - existing} messages into {path}...")
+        started = time.perf_counter()
+        _load_synthetic(service, args.messages - existing, args.users, args.partners, args.seed)
+        print(f"  loaded in {time.perf_counter() - started:.1f} s")
+
+    def timed(label, call, count=args.queries):
+        samples = []
+        for i in range(count):
+            started = time.perf_counter()
+            call(i)
+            samples.append((time.perf_counter() - started) * 1000)
+        samples.sort()
+        print(f"  {label:<40} p50 {statistics.median(samples):8.3f} ms  "
+              f"p99 {samples[min(len(samples) - 1, int(len(samples) * 0.99))]:8.3f} ms")
+
+    rng = random.Random(args.seed + 1)
+    busiest = service._db.execute(
+        "SELECT user_low, user_high, COUNT(*) AS n FROM messages "
+        "GROUP BY user_low, user_high ORDER BY n DESC LIMIT 1"
+    ).fetchone()
+    user_low, user_high, length = busiest
+    print(f"Busiest conversation: {length} messages")
+
+    # Page ending 100 messages after the start of the conversation
+    deep_before = service._db.execute(
+        "SELECT id FROM messages WHERE user_low = ? AND user_high = ? "
+        "ORDER BY id LIMIT 1 OFFSET 100", (user_low, user_high)
+    ).fetchone()[0]
+    timed("get_conversation, newest page", lambda i: service.get_conversation(
+        {'user1_id': user_low, 'user2_id': user_high, 'limit': 50}))
+    timed("get_conversation, oldest page (keyset)", lambda i: service.get_conversation(
+        {'user1_id': user_low, 'user2_id': user_high, 'limit': 50, 'before_id': deep_before}))
+    timed("same page with OFFSET", lambda i: service._db.execute(
+        "SELECT * FROM messages WHERE user_low = ? AND user_high = ? "
+        "ORDER BY id DESC LIMIT 50 OFFSET ?", (user_low, user_high, length - 100)).fetchall(),
+        count=max(1, args.queries // 10))
+
+    users = [rng.randrange(1, args.users + 1) for _ in range(args.queries)]
+    timed("get_user_conversations", lambda i: service.get_user_conversations(users[i]))
+    timed("get_unread_count", lambda i: service.get_unread_count(users[i]))
+    timed("unread count by scanning messages", lambda i: service._db.execute(
+        "SELECT COUNT(*) FROM messages WHERE recipient_id = ? AND read_at IS NULL",
+        (users[i],)).fetchone(), count=max(1, args.queries // 10))
+    timed("send_message", lambda i: service.send_message({
+        'sender_id': users[i], 'recipient_id': users[i] % args.users + 1,
+        'content': 'hello', 'message_type': 'text'}))
+    service.close()
@@ -0,0 +1,167 @@
+# path_lsh.py
+
+"""
+Approximate candidate index for large campuses.
+
+Every walking path is reduced to the set of PATH_PROXIMITY_THRESHOLD
+grid cells it touches, widened by one cell so paths a few metres apart
+still share cells, and summarised by a MinHash signature. Signatures
+are split into bands; paths whose band values collide land in the same
+LSH bucket. Candidates are the users sharing a course (exact) plus the
+users whose paths share a bucket with one of the user's paths, so only
+likely high-overlap candidates get the exact path overlap computation.
+
+Pass a PathLSHIndex as FriendMatchingService(..., candidate_index=...).
+Suggestions with path overlap but no shared course can be missed; run
+benchmark.py --lsh to measure recall for a bands x rows setting.
+"""
+
+from typing import List, Dict, Optional, Set, Tuple, Iterable
+import logging
+import random
+import threading
+
+from friend_matching_service import Schedule
+
+logger = logging.getLogger(__name__)
+
+# Mersenne prime for the universal hash family
+_PRIME = (1 << 61) - 1
+
+
+def path_cells(path_grid) -> Set[Tuple[int, int]]:
+    """Grid cells touched by a path, widened by one cell in every direction"""
+    cells: Set[Tuple[int, int]] = set()
+    for cx, cy in path_grid.cells:
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                cells.add((cx + dx, cy + dy))
+    return cells
+
+
+class MinHasher:
+    """MinHash signatures over sets of grid cells"""
+
+    def __init__(self, num_perm: int = 64, seed: int = 1):
+        rng = random.Random(seed)
+        self.num_perm = num_perm
+        self._params = [(rng.randrange(1, _PRIME), rng.randrange(0, _PRIME))
+                        for _ in range(num_perm)]
+
+    def signature(self, cells: Iterable[Tuple[int, int]]) -> Tuple[int, ...]:
+        """Minimum hash of the cells under each permutation"""
+        hashes = [((cx & 0xFFFFFFFF) << 32) | (cy & 0xFFFFFFFF) for cx, cy in cells]
+        if not hashes:
+            return ()
+        return tuple(
+            min((a * value + b) % _PRIME for value in hashes)
+            for a, b in self._params
+        )
+
+
+class PathLSHIndex:
+    """Course inverted index plus MinHash LSH buckets over walking paths.
+
+    Same interface as CandidateIndex (add/remove/get/candidates); keep it
+    in sync the same way. With `bands` bands of `rows` rows, two paths
+    with cell Jaccard similarity s collide with probability
+    1 - (1 - s**rows)**bands.
+    """
+
+    def __init__(self, schedules: Iterable[Schedule] = (), bands: int = 16, rows: int = 4,
+                 seed: int = 1):
+        self.bands = bands
+        self.rows = rows
+        self.hasher = MinHasher(bands * rows, seed=seed)
+        self._schedules: Dict[int, Schedule] = {}
+        self._position: Dict[int, int] = {}
+        self._next_position = 0
+        self._keys: Dict[int, Tuple[frozenset, Set[Tuple[int, Tuple[int, ...]]]]] = {}
+        self._by_course: Dict[str, Set[int]] = {}
+        self._by_band: Dict[Tuple[int, Tuple[int, ...]], Set[int]] = {}
+        self._lock = threading.RLock()
+        for schedule in schedules:
+            self.add(schedule)
+
+    def __len__(self) -> int:
+        return len(self._schedules)
+
+    def get(self, user_id: int) -> Optional[Schedule]:
+        """Return the indexed schedule for a user"""
+        return self._schedules.get(user_id)
+
+    def add(self, schedule: Schedule):
+        """Index a schedule, replacing any previous one for the same user."""
+        user_id = schedule.user_id
+        bands = self._band_keys(schedule)
+        with self._lock:
+            if user_id in self._schedules:
+                self._unindex(user_id)
+            else:
+                self._position[user_id] = self._next_position
+                self._next_position += 1
+
+            self._schedules[user_id] = schedule
+            courses = schedule.compiled.course_ids
+            self._keys[user_id] = (courses, bands)
+            for course in courses:
+                self._by_course.setdefault(course, set()).add(user_id)
+            for band in bands:
+                self._by_band.setdefault(band, set()).add(user_id)
+
+    def remove(self, user_id: int):
+        """Drop a user's schedule from the index."""
+        with self._lock:
+            if self._schedules.pop(user_id, None) is not None:
+                self._unindex(user_id)
+                del self._position[user_id]
+
+    def candidates(self, user_schedule: Schedule,
+                   exclude_user_ids: Iterable[int] = ()) -> List[Schedule]:
+        """Course matches and LSH path matches, in indexing order"""
+        user_id = user_schedule.user_id
+        with self._lock:
+            keys = self._keys.get(user_id)
+            if keys is not None and self._schedules[user_id] is user_schedule:
+                bands = keys[1]
+            else:
+                bands = self._band_keys(user_schedule)
+
+            hits: Set[int] = set()
+            for course in user_schedule.compiled.course_ids:
+                hits |= self._by_course.get(course, set())
+            for band in bands:
+                users = self._by_band.get(band)
+                if users:
+                    hits |= users
+
+            hits.difference_update(exclude_user_ids)
+            ordered = sorted(hits, key=self._position.__getitem__)
+            return [self._schedules[user_id] for user_id in ordered]
+
+    def _band_keys(self, schedule: Schedule) -> Set[Tuple[int, Tuple[int, ...]]]:
+        """LSH bucket keys of every path in a schedule"""
+        keys = set()
+        rows = self.rows
+        for grid in schedule.compiled.path_grids:
+            signature = self.hasher.signature(path_cells(grid))
+            if not signature:
+                continue
+            for band in range(self.bands):
+                keys.add((band, signature[band * rows:(band + 1) * rows]))
+        return keys
+
+    def _unindex(self, user_id: int):
+        courses, bands = self._keys.pop(user_id)
+        for course in courses:
+            users = self._by_course.get(course)
+            if users is not None:
+                users.discard(user_id)
+                if not users:
+                    del self._by_course[course]
+        for band in bands:
+            users = self._by_band.get(band)
+            if users is not None:
+                users.discard(user_id)
+                if not users:
+                    del self._by_band[band]
@@ -0,0 +1,156 @@
+# rate_limit.py
+
+"""
+Token-bucket rate limiting for the message routes.
+
+Every (route, user) pair has a bucket holding up to `requests` tokens
+that refills at requests / per_seconds tokens a second. A request takes
+one token or is rejected with the time until one is available. Buckets
+refill lazily when touched, so a check is O(1) with no timers.
+
+InMemoryBucketStore keeps buckets in process and evicts idle ones: a
+bucket untouched long enough to refill completely is equivalent to no
+bucket. RedisBucketStore shares buckets between server processes with
+one atomic script call per check (pip install redis).
+"""
+
+from dataclasses import dataclass
+from typing import Dict, Hashable, Optional
+from collections import OrderedDict
+import threading
+import time
+
+try:
+    import redis
+except ImportError:  # pragma: no cover - optional dependency
+    redis = None
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    """Allow `requests` requests per `per_seconds`, with bursts up to `requests`"""
+    requests: int
+    per_seconds: float
+
+    @property
+    def rate(self) -> float:
+        return self.requests / self.per_seconds
+
+
+class InMemoryBucketStore:
+    """Token buckets of one process, least recently used first.
+
+    A bucket is a (tokens, updated_at, full_at) tuple. Each check drops
+    up to two least recently used buckets that are full again, and the
+    oldest bucket once there are more than max_buckets.
+    """
+
+    def __init__(self, max_buckets: int = 100000, clock=time.monotonic):
+        self.max_buckets = max_buckets
+        self._clock = clock
+        self._buckets: 'OrderedDict[Hashable, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def take(self, key: Hashable, limit: RateLimit, cost: int = 1) -> float:
+        """Take cost tokens; returns 0, or seconds to wait if there are too few"""
+        now = self._clock()
+        capacity = limit.requests
+        rate = limit.rate
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                tokens = capacity
+            else:
+                tokens = min(capacity, bucket[0] + (now - bucket[1]) * rate)
+                self._buckets.move_to_end(key)
+
+            wait = 0.0
+            if tokens >= cost:
+                tokens -= cost
+            else:
+                wait = (cost - tokens) / rate
+            self._buckets[key] = (tokens, now, now + (capacity - tokens) / rate)
+            self._evict(now)
+        return wait
+
+    def _evict(self, now: float):
+        buckets = self._buckets
+        for _ in range(2):
+            oldest = next(iter(buckets))
+            if buckets[oldest][2] > now:
+                break
+            del buckets[oldest]
+        while len(buckets) > self.max_buckets:
+            buckets.popitem(last=False)
+
+
+# KEYS[1] bucket; ARGV capacity, rate, now, cost; returns the wait as a string
+_TAKE_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local cost = tonumber(ARGV[4])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or capacity
+local updated = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+local wait = 0
+if tokens >= cost then
+    tokens = tokens - cost
+else
+    wait = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil((capacity - tokens) / rate * 1000) + 1000)
+return tostring(wait)
+"""
+
+
+class RedisBucketStore:
+    """Token buckets shared through Redis, expiring once full again"""
+
+    def __init__(self, url: str = 'redis://localhost:6379/0', prefix: str = 'rate_limit',
+                 clock=time.time):
+        if redis is None:
+            raise ImportError("RedisBucketStore requires redis (pip install redis)")
+        self._client = redis.Redis.from_url(url)
+        self._take = self._client.register_script(_TAKE_SCRIPT)
+        self.prefix = prefix
+        self._clock = clock
+
+    def take(self, key: Hashable, limit: RateLimit, cost: int = 1) -> float:
+        name = f"{self.prefix}:{':'.join(map(str, key)) if isinstance(key, tuple) else key}"
+        return float(self._take(keys=[name],
+                                args=[limit.requests, limit.rate, self._clock(), cost]))
+
+
+class RateLimiter:
+    """Per-route, per-user token buckets.
+
+    The limit of a request is the user's override for the route, else
+    the route's limit, else default_limit; None means unlimited.
+    """
+
+    def __init__(self, store=None, default_limit: Optional[RateLimit] = None,
+                 route_limits: Optional[Dict[str, Optional[RateLimit]]] = None,
+                 user_limits: Optional[Dict[int, Dict[str, Optional[RateLimit]]]] = None):
+        self.store = store if store is not None else InMemoryBucketStore()
+        self.default_limit = default_limit
+        self.route_limits = dict(route_limits or {})
+        self.user_limits = dict(user_limits or {})
+
+    def limit_for(self, route: str, user_id: int) -> Optional[RateLimit]:
+        overrides = self.user_limits.get(user_id)
+        if overrides is not None and route in overrides:
+            return overrides[route]
+        return self.route_limits.get(route, self.default_limit)
+
+    def check(self, route: str, user_id: int) -> float:
+        """0 if the request may proceed, else seconds until it may be retried"""
+        limit = self.limit_for(route, user_id)
+        if limit is None:
+            return 0.0
+        return self.store.take((route, user_id), limit)
@@ -0,0 +1,130 @@
+# response_encoding.py
+
+"""
+Content negotiation for large message responses.
+
+The representation is picked from the Accept header:
+
+    application/json                        default, same body as jsonify
+    application/vnd.meetup.compact+json     JSON with abbreviated keys
+                                            (COMPACT_KEYS), nulls omitted
+    application/msgpack                     MessagePack (pip install msgpack)
+
+and the body is compressed with brotli (pip install brotli) or gzip
+according to Accept-Encoding once it is at least MIN_COMPRESS_BYTES.
+Routes tag responses with a version string computed before the payload
+is built; a matching If-None-Match gets 304 Not Modified with no
+serialization at all.
+"""
+
+from typing import Any, Dict, Optional
+import gzip
+
+from flask import Response, current_app, request
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None
+
+JSON = 'application/json'
+COMPACT_JSON = 'application/vnd.meetup.compact+json'
+MSGPACK = 'application/msgpack'
+
+# Bodies smaller than this are sent uncompressed
+MIN_COMPRESS_BYTES = 512
+
+COMPACT_KEYS = {
+    'success': 'ok',
+    'data': 'd',
+    'error': 'e',
+    'messages': 'ms',
+    'conversations': 'cs',
+    'count': 'n',
+    'has_more': 'hm',
+    'id': 'i',
+    'user_id': 'u',
+    'sender_id': 's',
+    'recipient_id': 'r',
+    'content': 'c',
+    'message_type': 't',
+    'metadata': 'md',
+    'created_at': 'ca',
+    'read_at': 'ra',
+    'last_message': 'lm',
+    'unread_count': 'uc'
+}
+
+VARY = 'Accept, Accept-Encoding, Authorization'
+
+
+def negotiate_format() -> str:
+    """Media type of the response representation for the current request"""
+    offered = [JSON, COMPACT_JSON]
+    if msgpack is not None:
+        offered += [MSGPACK, 'application/x-msgpack']
+    best = request.accept_mimetypes.best_match(offered, default=JSON)
+    return MSGPACK if best == 'application/x-msgpack' else best
+
+
+def negotiate_encoding() -> Optional[str]:
+    """Content-Encoding for the current request, or None for identity"""
+    offered = ['br', 'gzip'] if brotli is not None else ['gzip']
+    return request.accept_encodings.best_match(offered)
+
+
+def compact(value: Any) -> Any:
+    """Abbreviate known keys and drop null fields, recursively"""
+    if isinstance(value, dict):
+        return {COMPACT_KEYS.get(key, key): compact(item)
+                for key, item in value.items() if item is not None}
+    if isinstance(value, list):
+        return [compact(item) for item in value]
+    return value
+
+
+def _etag(version: str, media_type: str) -> str:
+    return f"{version}-{media_type.rsplit('/', 1)[-1]}"
+
+
+def not_modified(version: str) -> Optional[Response]:
+    """304 response if the client already holds this version, else None"""
+    media_type = negotiate_format()
+    etag = _etag(version, media_type)
+    if not request.if_none_match.contains_weak(etag):
+        return None
+    response = Response(status=304)
+    response.set_etag(etag, weak=True)
+    response.headers['Vary'] = VARY
+    return response
+
+
+def encoded_response(payload: Dict, status: int = 200,
+                     version: Optional[str] = None) -> Response:
+    """Serialize, compress and tag a payload for the current request"""
+    media_type = negotiate_format()
+    if media_type == MSGPACK:
+        body = msgpack.packb(payload, default=str)
+    elif media_type == COMPACT_JSON:
+        body = current_app.json.dumps(compact(payload), separators=(',', ':')).encode()
+    else:
+        body = current_app.json.dumps(payload, separators=(',', ':')).encode()
+
+    response = Response(body, status=status, mimetype=media_type)
+    if len(body) >= MIN_COMPRESS_BYTES:
+        encoding = negotiate_encoding()
+        if encoding == 'br':
+            response.set_data(brotli.compress(body, quality=5))
+        elif encoding == 'gzip':
+            response.set_data(gzip.compress(body, compresslevel=6))
+        if encoding is not None:
+            response.headers['Content-Encoding'] = encoding
+    if version is not None:
+        response.set_etag(_etag(version, media_type), weak=True)
+    response.headers['Vary'] = VARY
+    return response
@@ -0,0 +1,156 @@
+# suggestion_cache.py
+
+from typing import List, Optional, Set, Callable
+from collections import OrderedDict
+from dataclasses import dataclass
+import logging
+import threading
+import time
+
+from friend_matching_service import Schedule, FriendSuggestion
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CachedSuggestions:
+    """Suggestions computed for one user, plus what they were computed from"""
+    user_schedule: Schedule
+    excluded_ids: Set[int]
+    limit: int
+    suggestions: List[FriendSuggestion]
+    expires_at: float
+
+    def covers(self, limit: int) -> bool:
+        """Check if this entry can answer a request for `limit` suggestions"""
+        return limit <= self.limit or len(self.suggestions) < self.limit
+
+    def suggests(self, user_id: int) -> bool:
+        """Check if user_id is one of the cached suggestions"""
+        return any(s.suggested_user_id == user_id for s in self.suggestions)
+
+
+class SuggestionCache:
+    """LRU cache of friend suggestions keyed by user, with a TTL per entry.
+
+    Entries are invalidated incrementally: a change only drops the entries
+    whose suggestions it can actually alter.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl_seconds: float = 300.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._entries: 'OrderedDict[int, CachedSuggestions]' = OrderedDict()
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, user_id: int, limit: int) -> Optional[List[FriendSuggestion]]:
+        """Return cached suggestions for user_id, or None on a miss"""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+
+            if entry.expires_at <= self._clock():
+                del self._entries[user_id]
+                return None
+
+            if not entry.covers(limit):
+                return None
+
+            self._entries.move_to_end(user_id)
+            return entry.suggestions[:limit]
+
+    def put(self, user_schedule: Schedule, excluded_ids: Set[int], limit: int,
+            suggestions: List[FriendSuggestion]):
+        """Store freshly computed suggestions for a user."""
+        entry = CachedSuggestions(
+            user_schedule=user_schedule,
+            excluded_ids=set(excluded_ids),
+            limit=limit,
+            suggestions=list(suggestions),
+            expires_at=self._clock() + self.ttl_seconds
+        )
+
+        with self._lock:
+            self._entries[user_schedule.user_id] = entry
+            self._entries.move_to_end(user_schedule.user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, *user_ids: int):
+        """Drop the entries of the given users."""
+        with self._lock:
+            for user_id in user_ids:
+                self._entries.pop(user_id, None)
+
+    def clear(self):
+        """Drop every entry."""
+        with self._lock:
+            self._entries.clear()
+
+    def exclusion_added(self, user_id: int, other_user_id: int):
+        """Handle a new connection or block between two users.
+
+        Excluding a candidate can only change a list that contains it, so
+        the other entries are kept and just learn the new exclusion.
+        """
+        with self._lock:
+            for owner, excluded in ((user_id, other_user_id), (other_user_id, user_id)):
+                entry = self._entries.get(owner)
+                if entry is None:
+                    continue
+                if entry.suggests(excluded):
+                    del self._entries[owner]
+                else:
+                    entry.excluded_ids.add(excluded)
+
+    def candidate_changed(self, user_id: int, schedule: Optional[Schedule],
+                          evaluate: Callable[[Schedule, Schedule], Optional[FriendSuggestion]]):
+        """Handle a changed (or removed, when schedule is None) schedule.
+
+        Drops the user's own entry, every entry that lists the user, and
+        every entry the new schedule would now rank into. The new schedule
+        is scored against a snapshot of the entries outside the lock, so
+        get and put are not blocked meanwhile; entries put during the scan
+        are left alone.
+        """
+        with self._lock:
+            self._entries.pop(user_id, None)
+            snapshot = list(self._entries.items())
+
+        stale = []
+        for owner, entry in snapshot:
+            if user_id in entry.excluded_ids:
+                continue
+
+            if entry.suggests(user_id):
+                stale.append((owner, entry))
+                continue
+
+            if schedule is None:
+                continue
+
+            suggestion = evaluate(entry.user_schedule, schedule)
+            if not suggestion or suggestion.score <= 0:
+                continue
+
+            if len(entry.suggestions) < entry.limit or (
+                    entry.suggestions and
+                    suggestion.score >= entry.suggestions[-1].score):
+                stale.append((owner, entry))
+
+        dropped = 0
+        with self._lock:
+            for owner, entry in stale:
+                if self._entries.get(owner) is entry:
+                    del self._entries[owner]
+                    dropped += 1
+
+        if dropped:
+            logger.debug(f"Schedule change for user {user_id} "
+                         f"invalidated {dropped} cached suggestion lists")
@@ -0,0 +1,111 @@
+# test_async_friend_matching_service.py
+
+import asyncio
+
+from async_friend_matching_service import AsyncFriendMatchingService
+from async_repositories import InMemoryAsyncConnectionRepository, InMemoryAsyncScheduleRepository
+from benchmark import CampusConnectionRepository, CampusScheduleRepository, generate_campus
+from friend_matching_service import FriendMatchingService
+from suggestion_cache import SuggestionCache
+
+SCHEDULES = generate_campus(150, seed=3)
+
+
+def test_async_suggestions_match_sync_service():
+    sync_service = FriendMatchingService(CampusScheduleRepository(SCHEDULES),
+                                         CampusConnectionRepository())
+    service = AsyncFriendMatchingService(InMemoryAsyncScheduleRepository(SCHEDULES),
+                                         InMemoryAsyncConnectionRepository(), page_size=40)
+
+    async def run():
+        return await asyncio.gather(*(service.generate_suggestions(user_id)
+                                      for user_id in range(1, 11)))
+
+    results = asyncio.run(run())
+    assert results == [sync_service.generate_suggestions(user_id) for user_id in range(1, 11)]
+
+
+class InFlight:
+    """Counts repository calls in progress; holds each call until `release_at`
+    are in progress at once (or a short timeout passes)"""
+
+    def __init__(self, release_at: int):
+        self.release_at = release_at
+        self.current = 0
+        self.peak = 0
+        self.gate = asyncio.Event()
+
+    async def wait(self):
+        self.current += 1
+        self.peak = max(self.peak, self.current)
+        if self.current >= self.release_at:
+            self.gate.set()
+        try:
+            await asyncio.wait_for(self.gate.wait(), 0.2)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            self.current -= 1
+
+
+class CountingScheduleRepository(InMemoryAsyncScheduleRepository):
+    def __init__(self, schedules, in_flight):
+        super().__init__(schedules)
+        self.in_flight = in_flight
+
+    async def get_schedule_by_user(self, user_id):
+        await self.in_flight.wait()
+        return await super().get_schedule_by_user(user_id)
+
+
+class CountingConnectionRepository(InMemoryAsyncConnectionRepository):
+    def __init__(self, in_flight):
+        super().__init__()
+        self.in_flight = in_flight
+
+    async def get_connections(self, user_id):
+        await self.in_flight.wait()
+        return await super().get_connections(user_id)
+
+    async def get_blocked_users(self, user_id):
+        await self.in_flight.wait()
+        return await super().get_blocked_users(user_id)
+
+
+def test_repository_calls_of_concurrent_requests_are_in_flight_together():
+    requests = 10
+    # Each request fetches its schedule, connections and blocks concurrently
+    in_flight = InFlight(release_at=3 * requests)
+    service = AsyncFriendMatchingService(
+        CountingScheduleRepository(SCHEDULES[:20], in_flight),
+        CountingConnectionRepository(in_flight)
+    )
+
+    async def run():
+        await asyncio.gather(*(service.generate_suggestions(user_id)
+                               for user_id in range(1, requests + 1)))
+
+    asyncio.run(run())
+    assert in_flight.peak == 3 * requests
+
+
+def test_connections_and_blocks_are_excluded_and_cache_learns_them():
+    connection_repo = InMemoryAsyncConnectionRepository()
+    cache = SuggestionCache()
+    service = AsyncFriendMatchingService(InMemoryAsyncScheduleRepository(SCHEDULES),
+                                         connection_repo, suggestion_cache=cache)
+
+    async def run():
+        first = await service.generate_suggestions(1, limit=5)
+        target = first[0].suggested_user_id
+        await service.create_connection_request(1, target)
+        connection_repo.block(1, first[1].suggested_user_id)
+        service.matcher.notify_block_changed(1, first[1].suggested_user_id, True)
+        second = await service.generate_suggestions(1, limit=5)
+        return first, second
+
+    first, second = asyncio.run(run())
+    suggested = {s.suggested_user_id for s in second}
+    assert first[0].suggested_user_id not in suggested
+    assert first[1].suggested_user_id not in suggested
+    assert len(second) == 5
@@ -0,0 +1,78 @@
+# test_batch_job.py
+
+import random
+
+import pytest
+
+from async_repositories import UserBlock, UserConnection
+from batch_job import precompute_all_suggestions
+from benchmark import CampusConnectionRepository, CampusScheduleRepository, generate_campus
+from connection_graph import ConnectionGraph
+from friend_matching_service import FriendMatchingService
+from path_compaction import compact_schedules
+
+STUDENTS = 60
+
+
+class ListSink:
+    def __init__(self):
+        self.written = {}
+
+    def write(self, user_id, suggestions):
+        assert user_id not in self.written
+        self.written[user_id] = suggestions
+
+    def close(self):
+        pass
+
+
+class SocialConnectionRepository:
+    """Sync connection repository over accepted edges and (blocker, blocked) pairs"""
+
+    def __init__(self, edges, blocks):
+        self.edges = edges
+        self.blocks = blocks
+
+    def get_connections(self, user_id):
+        return [UserConnection(id=conn_id, other_user_id=b if a == user_id else a,
+                               status='accepted')
+                for conn_id, (a, b) in enumerate(self.edges) if user_id in (a, b)]
+
+    def get_blocked_users(self, user_id):
+        return [UserBlock(blocked_user_id=blocked)
+                for blocker, blocked in self.blocks if blocker == user_id]
+
+
+def social_graph(seed: int):
+    rng = random.Random(seed)
+    pairs = {tuple(sorted(rng.sample(range(1, STUDENTS + 1), 2))) for _ in range(STUDENTS * 3)}
+    edges = sorted(pairs)
+    blocks = [tuple(rng.sample(range(1, STUDENTS + 1), 2)) for _ in range(STUDENTS // 4)]
+    return edges, blocks
+
+
+@pytest.mark.parametrize('processes', [1, 2])
+@pytest.mark.parametrize('social', [False, True])
+@pytest.mark.parametrize('compact', [False, True])
+def test_batch_job_matches_generate_suggestions(compact, social, processes):
+    schedules = generate_campus(STUDENTS, seed=21)
+    if compact:
+        schedules = compact_schedules(schedules)
+    if social:
+        edges, blocks = social_graph(seed=21)
+        service = FriendMatchingService(CampusScheduleRepository(schedules),
+                                        SocialConnectionRepository(edges, blocks),
+                                        connection_graph=ConnectionGraph(edges))
+    else:
+        service = FriendMatchingService(CampusScheduleRepository(schedules),
+                                        CampusConnectionRepository())
+    sink = ListSink()
+
+    report = precompute_all_suggestions(service, 1, sink, limit=8, processes=processes,
+                                        shards=5)
+
+    assert report.users == STUDENTS
+    assert sorted(sink.written) == [schedule.user_id for schedule in schedules]
+    for schedule in schedules:
+        assert sink.written[schedule.user_id] == service.generate_suggestions(
+            schedule.user_id, limit=8)
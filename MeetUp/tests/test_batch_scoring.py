@@ -0,0 +1,73 @@
+# test_batch_scoring.py
+
+import pytest
+
+pytest.importorskip('numpy')
+
+from benchmark import CampusConnectionRepository, CampusScheduleRepository, generate_campus
+from friend_matching_service import FriendMatchingService
+from path_compaction import compact_schedules
+
+
+@pytest.mark.parametrize('compact', [False, True])
+def test_batch_suggestions_match_scalar(compact):
+    schedules = generate_campus(300, seed=11)
+    if compact:
+        schedules = compact_schedules(schedules)
+    service = FriendMatchingService(CampusScheduleRepository(schedules),
+                                    CampusConnectionRepository())
+
+    for user_id in range(1, 31):
+        assert service.generate_suggestions_batch(user_id) == service.generate_suggestions(user_id)
+
+
+def test_packed_scorer_is_reused_until_a_schedule_changes():
+    schedules = generate_campus(100, seed=2)
+    service = FriendMatchingService(CampusScheduleRepository(schedules),
+                                    CampusConnectionRepository())
+    service.generate_suggestions_batch(1)
+    scorer = service._batch_scorer
+    service.generate_suggestions_batch(2)
+    assert service._batch_scorer is scorer
+
+    # Give user 2 user 1's timetable and paths
+    schedules[1].classes = list(schedules[0].classes)
+    schedules[1].walking_paths = list(schedules[0].walking_paths)
+    service.notify_schedule_changed(2, schedules[1])
+
+    suggestions = service.generate_suggestions_batch(1)
+    assert service._batch_scorer is not scorer
+    assert suggestions == service.generate_suggestions(1)
+    assert suggestions[0].suggested_user_id == 2
+
+
+def boundary_schedules():
+    """Paths whose points sit exactly at, and just inside, the proximity threshold"""
+    from array import array
+    from friend_matching_service import CompactPath, Schedule
+
+    base_x, base_y = 407_128_000, -740_060_000
+    offsets = [(0, 0), (3000, 4000), (2999, 4000), (5000, 0), (4999, 0), (-3000, -4000)]
+    schedules = []
+    for user_id, (dx, dy) in enumerate(offsets, start=1):
+        coords = array('i', [base_x + dx, base_y + dy, base_x + dx + 20000, base_y + dy])
+        compact = CompactPath(coords, array('I', [1, 1]))
+        raw = [(x / 10_000_000, y / 10_000_000)
+               for x, y in zip(coords[0::2], coords[1::2])]
+        schedules.append(Schedule(user_id=user_id, classes=[], walking_paths=[compact]))
+        schedules.append(Schedule(user_id=user_id + 100, classes=[], walking_paths=[raw]))
+    return schedules
+
+
+def test_path_overlap_parity_at_the_threshold():
+    from batch_scoring import BatchScorer
+
+    schedules = boundary_schedules()
+    service = FriendMatchingService(None, None)
+    scorer = BatchScorer(schedules)
+
+    for user_schedule in schedules:
+        batch = scorer.path_overlaps(user_schedule).tolist()
+        scalar = [service._calculate_path_overlap(user_schedule.compiled, candidate.compiled)
+                  for candidate in schedules]
+        assert batch == scalar
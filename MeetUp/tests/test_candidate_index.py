@@ -0,0 +1,26 @@
+# test_candidate_index.py
+
+from benchmark import CampusConnectionRepository, CampusScheduleRepository, generate_campus
+from candidate_index import CandidateIndex
+from friend_matching_service import FriendMatchingService
+
+
+def test_indexed_suggestions_match_full_scan():
+    schedules = generate_campus(200, seed=9)
+    repo = CampusScheduleRepository(schedules)
+    scan = FriendMatchingService(repo, CampusConnectionRepository())
+    indexed = FriendMatchingService(repo, CampusConnectionRepository(),
+                                    candidate_index=CandidateIndex(schedules))
+
+    for user_id in range(1, 21):
+        assert indexed.generate_suggestions(user_id) == scan.generate_suggestions(user_id)
+
+
+def test_removed_schedule_is_no_longer_a_candidate():
+    schedules = generate_campus(50, seed=4)
+    index = CandidateIndex(schedules)
+    assert schedules[1] in index.candidates(schedules[1])
+
+    index.remove(schedules[1].user_id)
+    assert schedules[1] not in index.candidates(schedules[1])
+    assert len(index) == 49
@@ -0,0 +1,63 @@
+# test_connection_graph.py
+
+from connection_graph import ConnectionGraph, sorted_intersection_count
+from friend_matching_service import FriendMatchingService, FriendSuggestion, Schedule
+from suggestion_cache import SuggestionCache
+from async_repositories import UserConnection
+
+
+class ConnectionRepository:
+    """Sync connection repository over (id, user1, user2, status) rows"""
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def get_connections(self, user_id):
+        return [UserConnection(id=conn_id, other_user_id=user2 if user1 == user_id else user1,
+                               status=status)
+                for conn_id, user1, user2, status in self.rows if user_id in (user1, user2)]
+
+
+def test_sorted_intersection_count():
+    assert sorted_intersection_count([1, 3, 5, 7], [3, 4, 5]) == 2
+    assert sorted_intersection_count([9], list(range(100))) == 1
+    assert sorted_intersection_count([], [1, 2]) == 0
+
+
+def test_mutual_count_spans_arrays_and_overlay():
+    graph = ConnectionGraph([(1, 3), (2, 3)], rebuild_after=100)
+    graph.add_connection(1, 4)
+    graph.add_connection(2, 4)
+    assert graph.mutual_count(1, 2) == 2
+    graph.compact()
+    assert graph.mutual_count(1, 2) == 2
+    assert graph.neighbors(4) == [1, 2]
+
+
+def test_accepting_request_loaded_from_repository_adds_edge():
+    repo = ConnectionRepository([(10, 1, 2, 'accepted'), (11, 1, 3, 'pending')])
+    graph = ConnectionGraph.from_repository(repo, [1, 2, 3])
+
+    assert graph.connection_accepted(11) in {(1, 3), (3, 1)}
+    assert graph.neighbors(1) == [2, 3]
+    assert graph.connection_accepted(11) is None
+
+
+def suggestion(user_id: int) -> FriendSuggestion:
+    return FriendSuggestion(suggested_user_id=user_id, score=1.0, shared_classes=[],
+                            path_overlap_percent=0.0, time_proximity_minutes=0)
+
+
+def test_accept_invalidates_both_users_and_their_neighbours():
+    graph = ConnectionGraph([(1, 5), (2, 6)])
+    graph.request_added({'id': 7, 'user1_id': 1, 'user2_id': 2})
+    cache = SuggestionCache()
+    for owner in (1, 2, 5, 6, 9):
+        cache.put(Schedule(user_id=owner, classes=[], walking_paths=[]), {owner}, 10,
+                  [suggestion(8)])
+    service = FriendMatchingService(None, None, suggestion_cache=cache, connection_graph=graph)
+
+    service.accept_connection(7, accepting_user_id=2)
+
+    assert graph.mutual_count(1, 6) == 1
+    assert [owner for owner in (1, 2, 5, 6, 9) if cache.get(owner, 10) is not None] == [9]
@@ -0,0 +1,101 @@
+# test_connection_requests.py
+
+from async_repositories import UserConnection
+from connection_graph import ConnectionGraph
+from friend_matching_service import FriendMatchingService
+
+
+class BulkConnectionRepository:
+    """Connection repository implementing the bulk request contract"""
+
+    def __init__(self, rows=(), blocks=()):
+        self.rows = list(rows)      # (id, user1, user2, status)
+        self.blocks = set(blocks)   # (blocker, blocked)
+        self.create_calls = []
+
+    def get_connections_between(self, user_id, other_user_ids):
+        others = set(other_user_ids)
+        return [UserConnection(id=conn_id, other_user_id=user2 if user1 == user_id else user1,
+                               status=status)
+                for conn_id, user1, user2, status in self.rows
+                if (user1 == user_id and user2 in others) or (user2 == user_id and user1 in others)]
+
+    def get_blocked_between(self, user_id, other_user_ids):
+        return [other for other in other_user_ids
+                if (user_id, other) in self.blocks or (other, user_id) in self.blocks]
+
+    def create_connections(self, user1_id, user2_ids, status, suggested_at):
+        self.create_calls.append(list(user2_ids))
+        created = []
+        for user2_id in user2_ids:
+            conn_id = 100 + len(self.rows)
+            self.rows.append((conn_id, user1_id, user2_id, status))
+            created.append({'id': conn_id, 'user1_id': user1_id, 'user2_id': user2_id,
+                            'status': status, 'suggested_at': suggested_at})
+        return created
+
+
+def service(repo, **kwargs) -> FriendMatchingService:
+    return FriendMatchingService(None, repo, **kwargs)
+
+
+def outcome(results):
+    return [(result['target_user_id'], result['success']) for result in results]
+
+
+def test_results_follow_target_order_and_match_created_rows():
+    repo = BulkConnectionRepository()
+
+    results = service(repo).create_connection_requests(1, [7, 3, 5])
+
+    assert outcome(results) == [(7, True), (3, True), (5, True)]
+    assert [result['connection']['user2_id'] for result in results] == [7, 3, 5]
+    assert repo.create_calls == [[7, 3, 5]]
+
+
+def test_duplicate_targets_are_requested_once():
+    repo = BulkConnectionRepository()
+
+    results = service(repo).create_connection_requests(1, [4, 2, 4, 2, 4])
+
+    assert outcome(results) == [(4, True), (2, True)]
+    assert repo.create_calls == [[4, 2]]
+
+
+def test_existing_connections_in_either_direction_are_rejected():
+    repo = BulkConnectionRepository(rows=[(1, 1, 2, 'accepted'), (2, 3, 1, 'pending')])
+
+    results = service(repo).create_connection_requests(1, [2, 3, 4])
+
+    assert outcome(results) == [(2, False), (3, False), (4, True)]
+    assert results[0]['error'] == "Connection already exists or is pending"
+    assert repo.create_calls == [[4]]
+
+
+def test_blocks_in_either_direction_are_rejected():
+    repo = BulkConnectionRepository(blocks=[(1, 2), (3, 1)])
+
+    results = service(repo).create_connection_requests(1, [2, 3, 4])
+
+    assert outcome(results) == [(2, False), (3, False), (4, True)]
+    assert {results[0]['error'], results[1]['error']} == {"Cannot connect with blocked user"}
+
+
+def test_self_request_is_rejected_without_a_repository_call():
+    repo = BulkConnectionRepository()
+
+    results = service(repo).create_connection_requests(1, [1])
+
+    assert outcome(results) == [(1, False)]
+    assert results[0]['error'] == "Cannot connect with yourself"
+    assert repo.create_calls == []
+
+
+def test_created_requests_become_edges_once_accepted():
+    repo = BulkConnectionRepository()
+    graph = ConnectionGraph()
+
+    results = service(repo, connection_graph=graph).create_connection_requests(1, [2, 3])
+
+    assert graph.connection_accepted(results[1]['connection']['id']) == (1, 3)
+    assert graph.neighbors(1) == [3]
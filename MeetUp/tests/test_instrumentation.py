@@ -0,0 +1,62 @@
+# test_instrumentation.py
+
+import time
+
+from benchmark import CampusConnectionRepository, CampusScheduleRepository, generate_campus
+from connection_graph import ConnectionGraph
+from friend_matching_service import FriendMatchingService
+from instrumentation import MatchingStats
+
+PAGE_DELAY = 0.02
+
+
+class SlowPagedRepository(CampusScheduleRepository):
+    """Campus repository whose page fetches take PAGE_DELAY each"""
+
+    def __init__(self, schedules):
+        super().__init__(schedules)
+        self.pages = 0
+
+    def get_schedules_by_university_page(self, *args, **kwargs):
+        self.pages += 1
+        time.sleep(PAGE_DELAY)
+        return super().get_schedules_by_university_page(*args, **kwargs)
+
+
+def test_streamed_page_fetches_are_timed_as_repository():
+    repo = SlowPagedRepository(generate_campus(60, seed=3))
+    stats = MatchingStats()
+    service = FriendMatchingService(repo, CampusConnectionRepository(), instrumentation=stats)
+    service.CANDIDATE_PAGE_SIZE = 20
+
+    service.top_suggestions(1)
+
+    assert repo.pages == 3
+    # One call for the user's own schedule and exclusions, one per page
+    assert stats.phase_calls['repository'] == 1 + repo.pages
+    assert stats.phase_seconds['repository'] >= repo.pages * PAGE_DELAY
+    assert stats.phase_seconds['time_proximity'] < repo.pages * PAGE_DELAY
+
+
+def test_mutual_connections_have_their_own_phase():
+    schedules = generate_campus(40, seed=3)
+    graph = ConnectionGraph([(1, 5), (5, 7), (2, 5)])
+    stats = MatchingStats()
+    service = FriendMatchingService(CampusScheduleRepository(schedules),
+                                    CampusConnectionRepository(),
+                                    instrumentation=stats, connection_graph=graph)
+
+    service.generate_suggestions(1)
+
+    assert stats.phase_calls['mutual_connections'] == stats.counters['candidates_scanned']
+
+
+def test_mutual_connections_phase_is_absent_without_a_graph():
+    stats = MatchingStats()
+    service = FriendMatchingService(CampusScheduleRepository(generate_campus(40, seed=3)),
+                                    CampusConnectionRepository(), instrumentation=stats)
+
+    service.generate_suggestions(1)
+
+    assert 'mutual_connections' not in stats.phase_calls
+    assert stats.phase_calls['time_proximity'] == stats.counters['candidates_scanned']
@@ -0,0 +1,142 @@
+# test_message_controller.py
+
+import pytest
+from flask import Flask
+
+import message_controller_python as controller
+from message_events import InProcessBroker, user_channel
+from message_store import SQLiteMessageService
+from rate_limit import RateLimit, RateLimiter
+
+AUTH = {'Authorization': 'Bearer any'}
+
+
+@pytest.fixture
+def store(monkeypatch):
+    store = SQLiteMessageService()
+    monkeypatch.setattr(controller, 'message_service', store)
+    monkeypatch.setattr(controller, 'token_verifier', None)
+    monkeypatch.setattr(controller, 'write_behind', None)
+    monkeypatch.setattr(controller, 'rate_limiter',
+                        RateLimiter(default_limit=RateLimit(10 ** 6, 1)))
+    return store
+
+
+@pytest.fixture
+def client(store):
+    app = Flask(__name__)
+    app.register_blueprint(controller.message_bp)
+    return app.test_client()
+
+
+@pytest.mark.parametrize('limit', ['-1', '0', '1000000'])
+def test_conversation_limit_out_of_range_is_rejected(client, limit):
+    response = client.get(f'/api/messages/conversation/2?limit={limit}', headers=AUTH)
+    assert response.status_code == 400
+
+
+def test_conversation_limit_pages_history(client, store):
+    store.send_messages([{'sender_id': 2, 'recipient_id': 1, 'content': str(i),
+                          'message_type': 'text'} for i in range(5)])
+    response = client.get('/api/messages/conversation/2?limit=2', headers=AUTH)
+    data = response.get_json()['data']
+    assert [m['content'] for m in data['messages']] == ['4', '3']
+    assert data['has_more'] is True
+
+
+@pytest.fixture
+def broker(monkeypatch):
+    broker = InProcessBroker()
+    monkeypatch.setattr(controller, 'event_broker', broker)
+    return broker
+
+
+def test_event_stream_closed_before_reading_leaves_no_subscription(client, broker):
+    response = client.get('/api/messages/events', headers=AUTH)
+    response.close()
+    assert broker.subscriber_count(user_channel(1)) == 0
+
+
+def test_event_stream_unsubscribes_when_client_disconnects(client, broker):
+    response = client.get('/api/messages/events', headers=AUTH)
+    chunks = response.response
+    assert next(chunks) == b'retry: 3000\n\n'
+    assert broker.subscriber_count(user_channel(1)) == 1
+    response.close()
+    assert broker.subscriber_count(user_channel(1)) == 0
+
+
+def test_poll_without_cursor_skips_history(client, broker):
+    broker.publish(user_channel(1), {'type': 'unread_count', 'data': {'unread_count': 3}})
+    published = broker.recent(user_channel(1), 0)[-1]['id']
+
+    data = client.get('/api/messages/events/poll?timeout=0', headers=AUTH).get_json()['data']
+    assert data['events'] == []
+    assert data['last_event_id'] == published
+
+    broker.publish(user_channel(1), {'type': 'unread_count', 'data': {'unread_count': 4}})
+    data = client.get(f'/api/messages/events/poll?timeout=0&after_id={published}',
+                      headers=AUTH).get_json()['data']
+    assert [event['data']['unread_count'] for event in data['events']] == [4]
+
+
+def test_poll_with_explicit_cursor_replays_history(client, broker):
+    broker.publish(user_channel(1), {'type': 'unread_count', 'data': {'unread_count': 3}})
+    data = client.get('/api/messages/events/poll?timeout=0&after_id=0',
+                      headers=AUTH).get_json()['data']
+    assert data['count'] == 1
+
+
+class RefusingMessageService(SQLiteMessageService):
+    """SQLite store that refuses messages to some recipients, as the real service does"""
+
+    def __init__(self, refused):
+        super().__init__()
+        self.refused = refused
+
+    def _check(self, data):
+        reason = self.refused.get(data['recipient_id'])
+        if reason is not None:
+            raise ValueError(reason)
+
+    def send_message(self, data):
+        self._check(data)
+        return super().send_message(data)
+
+    def send_messages(self, messages):
+        for data in messages:
+            self._check(data)
+        return super().send_messages(messages)
+
+
+def batch(*recipients):
+    return {'messages': [{'recipient_id': recipient, 'content': f'hi {recipient}',
+                          'message_type': 'text'} for recipient in recipients]}
+
+
+def test_batch_reports_refused_items_per_item(client, monkeypatch):
+    store = RefusingMessageService({3: 'Users are not connected', 4: 'User is blocked',
+                                    5: 'Recipient is archived'})
+    monkeypatch.setattr(controller, 'message_service', store)
+
+    response = client.post('/api/messages/batch', json=batch(2, 3, 4, 5, 6), headers=AUTH)
+
+    assert response.status_code == 200
+    data = response.get_json()['data']
+    assert data['sent_count'] == 2
+    assert [result['success'] for result in data['results']] == [True, False, False, False, True]
+    assert data['results'][1]['error'] == 'You can only send messages to connected friends'
+    assert data['results'][2]['error'] == 'Cannot send message to this user'
+    assert data['results'][3]['error'] == 'Failed to send message'
+    assert store.get_unread_count(2) == 1 and store.get_unread_count(6) == 1
+
+
+def test_batch_store_failure_returns_error_envelope(client, store, monkeypatch):
+    def fail(messages):
+        raise RuntimeError('disk full')
+    monkeypatch.setattr(store, 'send_messages', fail)
+
+    response = client.post('/api/messages/batch', json=batch(2), headers=AUTH)
+
+    assert response.status_code == 500
+    assert response.get_json()['success'] is False
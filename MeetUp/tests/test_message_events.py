@@ -0,0 +1,29 @@
+# test_message_events.py
+
+from message_events import InProcessBroker, user_channel
+
+
+def test_event_ids_increase_across_broker_restarts():
+    channel = user_channel(7)
+    before = InProcessBroker()
+    for _ in range(3):
+        before.publish(channel, {'type': 'message'})
+    last_id = before.recent(channel, 0)[-1]['id']
+
+    after = InProcessBroker()
+    after.publish(channel, {'type': 'message'})
+
+    assert [event['id'] > last_id for event in after.recent(channel, last_id)] == [True]
+
+
+def test_subscribers_receive_published_events():
+    broker = InProcessBroker()
+    subscription = broker.subscribe(user_channel(1))
+    broker.publish(user_channel(1), {'type': 'unread_count', 'data': {'unread_count': 2}})
+    broker.publish(user_channel(2), {'type': 'unread_count', 'data': {'unread_count': 5}})
+
+    event = subscription.get(timeout=1)
+    assert event['data'] == {'unread_count': 2}
+    assert subscription.get(timeout=0) is None
+    subscription.close()
+    assert broker.subscriber_count(user_channel(1)) == 0
@@ -0,0 +1,120 @@
+# test_message_queue.py
+
+import threading
+
+import pytest
+
+from message_queue import QueueFull, WriteBehindQueue
+
+
+class BlockingMessageService:
+    """Message store whose group commits wait until released"""
+
+    def __init__(self, fail_first: int = 0):
+        self.release = threading.Event()
+        self.started = threading.Event()
+        self.fail_first = fail_first
+        self.stored = []
+
+    def max_message_id(self) -> int:
+        return 0
+
+    def send_messages(self, messages):
+        self.started.set()
+        self.release.wait(5)
+        if self.fail_first:
+            self.fail_first -= 1
+            raise ConnectionError("store unavailable")
+        self.stored.extend(messages)
+        return [{'id': m['id'], 'created_at': m['created_at']} for m in messages]
+
+
+def message(i: int):
+    return {'sender_id': 1, 'recipient_id': 2, 'content': f"hi {i}", 'message_type': 'text'}
+
+
+def test_in_flight_group_counts_once_against_capacity():
+    service = BlockingMessageService()
+    queue = WriteBehindQueue(service, max_pending=10, batch_size=5, flush_interval=0)
+    try:
+        queue.submit_many([message(i) for i in range(5)])
+        assert service.started.wait(5)
+
+        assert len(queue) == 5
+        queue.submit_many([message(i) for i in range(5, 10)])
+        assert len(queue) == 10
+        with pytest.raises(QueueFull):
+            queue.submit(message(10))
+    finally:
+        service.release.set()
+        assert queue.flush(5)
+        queue.close()
+    assert [m['id'] for m in service.stored] == list(range(1, 11))
+
+
+def test_failed_group_is_retried_in_order():
+    service = BlockingMessageService(fail_first=2)
+    service.release.set()
+    queue = WriteBehindQueue(service, max_pending=10, batch_size=3, flush_interval=0,
+                             retry_seconds=0.01)
+    accepted = queue.submit_many([message(i) for i in range(6)])
+    assert queue.flush(5)
+    queue.close()
+
+    assert [m['id'] for m in service.stored] == [a['id'] for a in accepted]
+    assert len(queue) == 0
+
+
+def test_recovers_uncommitted_messages_from_log(tmp_path):
+    log_path = str(tmp_path / 'queue.log')
+    service = BlockingMessageService()
+    queue = WriteBehindQueue(service, log_path, batch_size=2, flush_interval=0)
+    queue.submit_many([message(i) for i in range(4)])
+    assert service.started.wait(5)
+    # Simulate a crash: nothing reached the store
+
+    recovered = BlockingMessageService()
+    recovered.release.set()
+    replay = WriteBehindQueue(recovered, log_path, batch_size=2, flush_interval=0)
+    assert replay.flush(5)
+    replay.close()
+    service.release.set()
+    queue.close()
+
+    assert [m['id'] for m in recovered.stored] == [1, 2, 3, 4]
+
+
+def test_duplicate_id_is_dropped_instead_of_blocking_the_queue():
+    from message_store import SQLiteMessageService
+
+    store = SQLiteMessageService()
+    queue = WriteBehindQueue(store, batch_size=10, flush_interval=0, retry_seconds=5)
+    # Another writer takes the id the queue is about to use
+    store.send_message(message(0))
+
+    accepted = queue.submit_many([message(1), message(2)])
+    assert queue.flush(2), "a duplicate id kept the queue retrying"
+    queue.close()
+
+    stored_ids = {m['id'] for m in store.get_conversation({'user1_id': 1, 'user2_id': 2})}
+    assert accepted[0]['id'] == 1
+    assert stored_ids == {1, 2}
+
+
+def test_locked_store_is_retried():
+    import sqlite3
+
+    class LockedOnce(BlockingMessageService):
+        def send_messages(self, messages):
+            if not self.stored and not getattr(self, 'failed', False):
+                self.failed = True
+                raise sqlite3.OperationalError("database is locked")
+            return super().send_messages(messages)
+
+    service = LockedOnce()
+    service.release.set()
+    queue = WriteBehindQueue(service, batch_size=5, flush_interval=0, retry_seconds=0.01)
+    queue.submit_many([message(i) for i in range(3)])
+    assert queue.flush(5)
+    queue.close()
+    assert [m['id'] for m in service.stored] == [1, 2, 3]
@@ -0,0 +1,43 @@
+# test_message_store.py
+
+import pytest
+
+from message_store import MAX_CONVERSATION_PAGE, SQLiteMessageService
+
+
+def text(sender_id: int, recipient_id: int, content: str = "hi"):
+    return {'sender_id': sender_id, 'recipient_id': recipient_id,
+            'content': content, 'message_type': 'text'}
+
+
+def test_delete_unread_message_reports_recipient():
+    service = SQLiteMessageService()
+    unread = service.send_message(text(1, 2))
+    read = service.send_message(text(1, 2))
+    service.mark_as_read(read['id'], 2)
+    assert service.get_unread_count(2) == 1
+
+    assert service.delete_message(read['id'], 1) is None
+    assert service.delete_message(unread['id'], 1) == 2
+    assert service.get_unread_count(2) == 0
+
+
+def test_mark_conversation_read_updates_unread_counter():
+    service = SQLiteMessageService()
+    sent = service.send_messages([text(1, 2, str(i)) for i in range(5)])
+    service.send_message(text(3, 2))
+
+    assert service.mark_conversation_read(2, 1, up_to_id=sent[2]['id']) == 3
+    assert service.get_unread_count(2) == 3
+    assert service.mark_conversation_read(2, 1) == 2
+    assert service.get_unread_count(2) == 1
+
+
+def test_conversation_page_size_is_bounded():
+    service = SQLiteMessageService()
+    service.send_messages([text(1, 2, str(i)) for i in range(5)])
+
+    assert len(service.get_conversation({'user1_id': 1, 'user2_id': 2, 'limit': 3})) == 3
+    for limit in (0, -1, MAX_CONVERSATION_PAGE + 1):
+        with pytest.raises(ValueError):
+            service.get_conversation({'user1_id': 1, 'user2_id': 2, 'limit': limit})
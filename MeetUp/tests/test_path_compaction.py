@@ -0,0 +1,43 @@
+# test_path_compaction.py
+
+import random
+
+from friend_matching_service import CompactPathGrid, FIXED_PROXIMITY_THRESHOLD
+from path_compaction import compact_path
+
+
+def random_path(rng, center, count=40):
+    return [(center[0] + rng.uniform(-0.002, 0.002), center[1] + rng.uniform(-0.002, 0.002))
+            for _ in range(count)]
+
+
+def brute_force_overlap(path, other) -> float:
+    limit = FIXED_PROXIMITY_THRESHOLD ** 2
+    hits = sum(weight for (x, y), weight in zip(path.fixed_points(), path.weights)
+               if any((x - ox) ** 2 + (y - oy) ** 2 < limit for ox, oy in other.fixed_points()))
+    return hits / path.total_weight
+
+
+def test_compact_grid_matches_brute_force_across_cell_and_sign_boundaries():
+    rng = random.Random(5)
+    for center in ((0.0, 0.0), (40.7128, -74.0060), (-33.86, 151.21)):
+        for _ in range(20):
+            path_a = compact_path(random_path(rng, center))
+            path_b = compact_path(random_path(rng, center))
+            grid = CompactPathGrid(path_b)
+
+            assert grid.overlap_from(path_a) == brute_force_overlap(path_a, path_b)
+            assert sorted(grid.cells) == sorted({
+                (x // FIXED_PROXIMITY_THRESHOLD, y // FIXED_PROXIMITY_THRESHOLD)
+                for x, y in path_b.fixed_points()
+            })
+
+
+def test_compaction_keeps_sample_weights():
+    path = [(40.0, -74.0), (40.00001, -74.0), (40.00002, -74.0), (40.01, -74.0)]
+    compact = compact_path(path)
+
+    assert len(compact) == 2
+    assert list(compact.weights) == [3, 1]
+    assert CompactPathGrid(compact).overlap_from(compact) == 1.0
+    assert not CompactPathGrid(compact_path([]))
@@ -0,0 +1,112 @@
+# test_path_lsh.py
+
+from benchmark import CampusConnectionRepository, CampusScheduleRepository, generate_campus
+from candidate_index import CandidateIndex
+from friend_matching_service import FriendMatchingService, Schedule
+from path_lsh import PathLSHIndex
+
+
+def path_twin(user_id: int, schedule: Schedule) -> Schedule:
+    """Schedule walking the same paths as schedule, with no classes"""
+    return Schedule(user_id=user_id, classes=[], walking_paths=schedule.walking_paths)
+
+
+def candidate_ids(index, schedule):
+    return [candidate.user_id for candidate in index.candidates(schedule, {schedule.user_id})]
+
+
+def apart(index, schedules):
+    """Two schedules with walking paths whose paths share no LSH bucket"""
+    walkers = [schedule for schedule in schedules if schedule.walking_paths]
+    first = walkers[0]
+    near = set(candidate_ids(index, path_twin(0, first)))
+    second = next(schedule for schedule in walkers[1:] if schedule.user_id not in near)
+    return first, second
+
+
+def test_recall_against_exact_candidate_index():
+    schedules = generate_campus(200, seed=7)
+    repo = CampusScheduleRepository(schedules)
+    exact = FriendMatchingService(repo, CampusConnectionRepository(),
+                                  candidate_index=CandidateIndex(schedules))
+    approx = FriendMatchingService(repo, CampusConnectionRepository(),
+                                   candidate_index=PathLSHIndex(schedules))
+
+    found = expected = path_found = path_expected = 0
+    for user_id in range(1, 21):
+        exact_all = {s.suggested_user_id: s for s in exact.iter_suggestions(user_id)}
+        approx_all = {s.suggested_user_id: s for s in approx.iter_suggestions(user_id)}
+        # Approximation only drops candidates; whatever is found is scored exactly
+        assert all(exact_all[other] == s for other, s in approx_all.items())
+        # Course matches come from the exact inverted index
+        assert {other for other, s in exact_all.items() if s.shared_classes} <= set(approx_all)
+
+        exact_top = {s.suggested_user_id for s in exact.generate_suggestions(user_id)}
+        approx_top = {s.suggested_user_id for s in approx.generate_suggestions(user_id)}
+        found += len(exact_top & approx_top)
+        expected += len(exact_top)
+
+        exact_paths = {other for other, s in exact_all.items() if not s.shared_classes}
+        path_found += len(exact_paths & set(approx_all))
+        path_expected += len(exact_paths)
+
+    assert found / expected >= 0.95
+    assert path_expected and path_found / path_expected >= 0.5
+
+
+def test_added_schedule_collides_with_identical_paths():
+    schedules = generate_campus(80, seed=2)
+    index = PathLSHIndex(schedules)
+    first, _ = apart(index, schedules)
+    twin = path_twin(1000, first)
+
+    assert 1000 not in candidate_ids(index, first)
+    index.add(twin)
+
+    assert 1000 in candidate_ids(index, first)
+    assert first.user_id in candidate_ids(index, twin)
+    assert len(index) == 81
+
+
+def test_updated_schedule_leaves_its_old_buckets():
+    schedules = generate_campus(80, seed=2)
+    index = PathLSHIndex(schedules)
+    first, second = apart(index, schedules)
+    index.add(path_twin(1000, first))
+
+    moved = path_twin(1000, second)
+    index.add(moved)
+
+    assert index.get(1000) is moved
+    assert 1000 not in candidate_ids(index, first)
+    assert 1000 in candidate_ids(index, second)
+    assert sum(1000 in users for users in index._by_band.values()) == len(index._keys[1000][1])
+    assert len(index) == 81
+
+
+def test_removed_schedule_is_no_longer_a_candidate():
+    schedules = generate_campus(80, seed=2)
+    index = PathLSHIndex(schedules)
+    first, _ = apart(index, schedules)
+    index.add(path_twin(1000, first))
+
+    index.remove(1000)
+    index.remove(1000)
+
+    assert index.get(1000) is None
+    assert 1000 not in candidate_ids(index, first)
+    assert not any(1000 in users for users in index._by_band.values())
+    assert len(index) == 80
+
+
+def test_unindexed_schedule_version_is_hashed_fresh():
+    schedules = generate_campus(80, seed=2)
+    index = PathLSHIndex(schedules)
+    first, second = apart(index, schedules)
+    index.add(path_twin(1000, first))
+
+    # A newer schedule object for user 1000 that the index has not seen yet
+    edited = path_twin(1000, second)
+
+    assert second.user_id in candidate_ids(index, edited)
+    assert first.user_id not in candidate_ids(index, edited)
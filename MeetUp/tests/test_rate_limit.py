@@ -0,0 +1,79 @@
+# test_rate_limit.py
+
+import threading
+
+from flask import Flask
+
+import message_controller_python as controller
+from rate_limit import InMemoryBucketStore, RateLimit, RateLimiter
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_bucket_allows_a_burst_then_refills():
+    clock = Clock()
+    store = InMemoryBucketStore(clock=clock)
+    limit = RateLimit(3, 3)
+
+    assert [store.take('k', limit) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert store.take('k', limit) == 1.0
+    clock.now += 1
+    assert store.take('k', limit) == 0.0
+
+
+def test_full_buckets_are_evicted():
+    clock = Clock()
+    store = InMemoryBucketStore(clock=clock)
+    store.take('a', RateLimit(2, 2))
+    clock.now += 5
+    store.take('b', RateLimit(2, 2))
+    assert len(store) == 1
+
+
+def test_concurrent_takes_never_overspend():
+    store = InMemoryBucketStore(clock=Clock())
+    limit = RateLimit(50, 60)
+    granted = []
+
+    def client():
+        for _ in range(20):
+            if store.take('shared', limit) == 0:
+                granted.append(1)
+
+    threads = [threading.Thread(target=client) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(granted) == 50
+
+
+def test_user_overrides_take_precedence():
+    limiter = RateLimiter(default_limit=RateLimit(10, 60),
+                          route_limits={'send_message': RateLimit(1, 60)},
+                          user_limits={7: {'send_message': None}})
+    assert limiter.check('send_message', 1) == 0
+    assert limiter.check('send_message', 1) > 0
+    assert all(limiter.check('send_message', 7) == 0 for _ in range(5))
+
+
+def test_route_returns_429_with_retry_after(monkeypatch):
+    monkeypatch.setattr(controller, 'token_verifier', None)
+    monkeypatch.setattr(controller, 'rate_limiter',
+                        RateLimiter(default_limit=RateLimit(2, 60)))
+    app = Flask(__name__)
+    app.register_blueprint(controller.message_bp)
+    client = app.test_client()
+    headers = {'Authorization': 'Bearer any'}
+
+    statuses = [client.get('/api/messages/unread/count', headers=headers).status_code
+                for _ in range(3)]
+    assert statuses == [200, 200, 429]
+    response = client.get('/api/messages/unread/count', headers=headers)
+    assert response.headers['Retry-After'] == '30'
@@ -0,0 +1,78 @@
+# test_request_pipeline.py
+
+import pytest
+from flask import Flask
+
+import message_controller_python as controller
+from rate_limit import RateLimit, RateLimiter
+from request_pipeline import (
+    CachedTokenVerifier, HS256TokenVerifier, InvalidToken, _b64encode, encode_hs256
+)
+
+SECRET = 'test-secret'
+
+
+def unsigned_token(header: str, payload: str) -> str:
+    return f"{_b64encode(header.encode())}.{_b64encode(payload.encode())}.{_b64encode(b'sig')}"
+
+
+@pytest.mark.parametrize('token', [
+    unsigned_token('"1"', '{"sub": "1"}'),
+    unsigned_token('{"alg": "HS256"}', '[1]'),
+    encode_hs256({'sub': '1', 'exp': 'tomorrow'}, SECRET),
+    encode_hs256({'sub': '1', 'nbf': None}, SECRET),
+    'not-a-token',
+])
+def test_malformed_tokens_raise_invalid_token(token):
+    with pytest.raises(InvalidToken):
+        HS256TokenVerifier(SECRET).verify(token)
+
+
+def test_expired_token_is_rejected():
+    verifier = HS256TokenVerifier(SECRET, clock=lambda: 1000)
+    assert verifier.verify(encode_hs256({'sub': '1', 'exp': 1000}, SECRET))['sub'] == '1'
+    with pytest.raises(InvalidToken):
+        verifier.verify(encode_hs256({'sub': '1', 'exp': 999}, SECRET))
+
+
+def test_cached_verifier_skips_repeat_verification():
+    now = [1000.0]
+    cached = CachedTokenVerifier(HS256TokenVerifier(SECRET, clock=lambda: now[0]),
+                                 clock=lambda: now[0])
+    token = encode_hs256({'sub': '1', 'exp': 1010}, SECRET)
+    cached.verify(token)
+    cached.verify(token)
+    assert (cached.hits, cached.misses) == (1, 1)
+
+    now[0] = 1011
+    with pytest.raises(InvalidToken):
+        cached.verify(token)
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(controller, 'token_verifier', HS256TokenVerifier(SECRET))
+    monkeypatch.setattr(controller, 'rate_limiter',
+                        RateLimiter(default_limit=RateLimit(10 ** 6, 1)))
+    app = Flask(__name__)
+    app.register_blueprint(controller.message_bp)
+    return app.test_client()
+
+
+@pytest.mark.parametrize('token', [
+    unsigned_token('"1"', '{"sub": "1"}'),
+    unsigned_token('{"alg": "HS256"}', '[1]'),
+    encode_hs256({'sub': '1', 'exp': 'tomorrow'}, SECRET),
+    encode_hs256({'email': 'no-subject@university.edu'}, SECRET),
+])
+def test_bad_tokens_get_401(client, token):
+    response = client.get('/api/messages/unread/count',
+                          headers={'Authorization': f'Bearer {token}'})
+    assert response.status_code == 401
+
+
+def test_valid_token_is_accepted(client):
+    token = encode_hs256({'sub': '1'}, SECRET)
+    response = client.get('/api/messages/unread/count',
+                          headers={'Authorization': f'Bearer {token}'})
+    assert response.status_code == 200
@@ -0,0 +1,137 @@
+# test_response_encoding.py
+
+import gzip
+import json
+
+import pytest
+from flask import Flask
+
+import response_encoding
+from response_encoding import (
+    COMPACT_JSON, JSON, MIN_COMPRESS_BYTES, compact, encoded_response,
+    negotiate_encoding, negotiate_format, not_modified
+)
+
+app = Flask(__name__)
+
+LARGE = {'success': True, 'data': {'messages': [{'id': i, 'content': 'x' * 40}
+                                                for i in range(50)]}}
+
+
+def request_with(**headers):
+    return app.test_request_context('/', headers=headers)
+
+
+@pytest.mark.parametrize('accept, expected', [
+    (None, JSON),
+    ('*/*', JSON),
+    ('text/html', JSON),
+    (COMPACT_JSON, COMPACT_JSON),
+    (f'{JSON};q=0.5, {COMPACT_JSON}', COMPACT_JSON),
+    (f'{COMPACT_JSON};q=0.2, {JSON};q=0.9', JSON),
+])
+def test_format_follows_accept_q_values(accept, expected):
+    headers = {'Accept': accept} if accept else {}
+    with request_with(**headers):
+        assert negotiate_format() == expected
+
+
+def test_msgpack_alias_is_served_as_msgpack():
+    pytest.importorskip('msgpack')
+    with request_with(Accept='application/x-msgpack'):
+        assert negotiate_format() == response_encoding.MSGPACK
+
+
+@pytest.mark.parametrize('accept_encoding, expected', [
+    (None, None),
+    ('gzip', 'gzip'),
+    ('gzip;q=0', None),
+    ('identity', None),
+    ('br, gzip;q=0.5', 'gzip'),
+])
+def test_encoding_without_brotli(monkeypatch, accept_encoding, expected):
+    monkeypatch.setattr(response_encoding, 'brotli', None)
+    headers = {'Accept-Encoding': accept_encoding} if accept_encoding else {}
+    with request_with(**headers):
+        assert negotiate_encoding() == expected
+
+
+@pytest.mark.parametrize('accept_encoding, expected', [
+    ('gzip, br', 'br'),
+    ('br;q=0.5, gzip', 'gzip'),
+    ('gzip', 'gzip'),
+])
+def test_encoding_with_brotli_installed(monkeypatch, accept_encoding, expected):
+    # Selection only looks at whether the module is importable
+    monkeypatch.setattr(response_encoding, 'brotli', object())
+    with request_with(**{'Accept-Encoding': accept_encoding}):
+        assert negotiate_encoding() == expected
+
+
+def test_brotli_body_round_trips():
+    brotli = pytest.importorskip('brotli')
+    with request_with(**{'Accept-Encoding': 'gzip, br'}):
+        assert negotiate_encoding() == 'br'
+        response = encoded_response(LARGE)
+    assert response.headers['Content-Encoding'] == 'br'
+    assert json.loads(brotli.decompress(response.get_data())) == LARGE
+
+
+def test_compact_maps_known_keys_and_drops_nulls():
+    payload = {'success': True, 'data': {'messages': [
+        {'id': 1, 'sender_id': 2, 'read_at': None, 'custom': 'kept'}
+    ]}}
+    assert compact(payload) == {'ok': True, 'd': {'ms': [{'i': 1, 's': 2, 'custom': 'kept'}]}}
+
+
+def test_compact_body_is_served_with_its_media_type():
+    with request_with(Accept=COMPACT_JSON):
+        response = encoded_response({'success': True, 'error': None, 'data': {'count': 0}})
+    assert response.mimetype == COMPACT_JSON
+    assert json.loads(response.get_data()) == {'ok': True, 'd': {'n': 0}}
+
+
+def test_large_bodies_are_gzipped_and_small_ones_are_not(monkeypatch):
+    monkeypatch.setattr(response_encoding, 'brotli', None)
+    with request_with(**{'Accept-Encoding': 'gzip'}):
+        small = encoded_response({'success': True})
+        large = encoded_response(LARGE)
+
+    assert 'Content-Encoding' not in small.headers
+    assert len(small.get_data()) < MIN_COMPRESS_BYTES
+    assert large.headers['Content-Encoding'] == 'gzip'
+    assert json.loads(gzip.decompress(large.get_data())) == LARGE
+    assert 'Accept-Encoding' in large.headers['Vary']
+
+
+def test_etag_is_weak_and_differs_per_format():
+    with request_with():
+        plain = encoded_response(LARGE, version='v7')
+    with request_with(Accept=COMPACT_JSON):
+        short = encoded_response(LARGE, version='v7')
+
+    assert plain.headers['ETag'] == 'W/"v7-json"'
+    assert short.headers['ETag'] == 'W/"v7-vnd.meetup.compact+json"'
+    with request_with():
+        assert 'ETag' not in encoded_response(LARGE).headers
+
+
+def test_matching_if_none_match_returns_304():
+    with request_with(**{'If-None-Match': 'W/"v7-json"'}):
+        response = not_modified('v7')
+    assert response.status_code == 304
+    assert response.headers['ETag'] == 'W/"v7-json"'
+    assert response.get_data() == b''
+
+    # A strong tag from an intermediary still matches weakly
+    with request_with(**{'If-None-Match': '"v7-json"'}):
+        assert not_modified('v7').status_code == 304
+
+
+def test_other_version_or_format_is_sent_in_full():
+    with request_with(**{'If-None-Match': 'W/"v6-json"'}):
+        assert not_modified('v7') is None
+    with request_with(**{'If-None-Match': 'W/"v7-json"'}, Accept=COMPACT_JSON):
+        assert not_modified('v7') is None
+    with request_with():
+        assert not_modified('v7') is None
@@ -0,0 +1,38 @@
+# test_schedule.py
+
+from dataclasses import asdict, astuple, fields, replace
+
+from friend_matching_service import Schedule
+
+CLASSES = [{'course': 'CS101', 'building': 'Science', 'day': 'Monday',
+            'start_time': '09:00', 'end_time': '10:15'}]
+PATHS = [[(40.0, -74.0), (40.0001, -74.0001)]]
+
+
+def test_compiled_cache_is_not_a_dataclass_field():
+    schedule = Schedule(user_id=1, classes=CLASSES, walking_paths=PATHS)
+    schedule.compiled
+
+    assert [f.name for f in fields(schedule)] == ['user_id', 'classes', 'walking_paths']
+    assert asdict(schedule) == {'user_id': 1, 'classes': CLASSES, 'walking_paths': PATHS}
+    assert astuple(schedule) == (1, CLASSES, PATHS)
+    assert schedule == Schedule(user_id=1, classes=CLASSES, walking_paths=PATHS)
+
+
+def test_compiled_form_is_reused_until_invalidated():
+    schedule = Schedule(user_id=1, classes=CLASSES, walking_paths=PATHS)
+    compiled = schedule.compiled
+    assert schedule.compiled is compiled
+
+    schedule.invalidate_compiled()
+    assert schedule.compiled is not compiled
+
+
+def test_replaced_schedule_compiles_its_own_data():
+    schedule = Schedule(user_id=1, classes=CLASSES, walking_paths=PATHS)
+    schedule.compiled
+
+    moved = replace(schedule, classes=[dict(CLASSES[0], course='MATH200')])
+
+    assert moved.compiled is not schedule.compiled
+    assert moved.compiled.course_ids == {'MATH200'}
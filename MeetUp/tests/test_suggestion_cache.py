@@ -0,0 +1,64 @@
+# test_suggestion_cache.py
+
+import threading
+
+from benchmark import CampusConnectionRepository, CampusScheduleRepository, generate_campus
+from friend_matching_service import FriendMatchingService, FriendSuggestion, Schedule
+from instrumentation import MatchingStats
+from suggestion_cache import SuggestionCache
+
+
+def suggestion(user_id: int, score: float) -> FriendSuggestion:
+    return FriendSuggestion(suggested_user_id=user_id, score=score, shared_classes=[],
+                            path_overlap_percent=0.0, time_proximity_minutes=0)
+
+
+def schedule(user_id: int) -> Schedule:
+    return Schedule(user_id=user_id, classes=[], walking_paths=[])
+
+
+def test_candidate_changed_drops_only_lists_it_can_alter():
+    cache = SuggestionCache()
+    cache.put(schedule(1), {1}, 2, [suggestion(9, 1.0), suggestion(8, 0.9)])
+    cache.put(schedule(2), {2}, 2, [suggestion(9, 1.0), suggestion(8, 0.5)])
+    cache.put(schedule(3), {3}, 2, [suggestion(7, 1.0), suggestion(6, 0.9)])
+    cache.put(schedule(4), {4, 5}, 2, [suggestion(7, 1.0), suggestion(6, 0.1)])
+
+    cache.candidate_changed(5, schedule(5), lambda user, candidate: suggestion(5, 0.6))
+
+    assert cache.get(1, 2) is not None   # 0.6 ranks below the list
+    assert cache.get(2, 2) is None       # 0.6 ranks into the list
+    assert cache.get(3, 2) is not None
+    assert cache.get(4, 2) is not None   # 5 is excluded for user 4
+
+
+def test_candidate_changed_scores_outside_the_lock():
+    cache = SuggestionCache()
+    for owner in range(1, 4):
+        cache.put(schedule(owner), {owner}, 10, [])
+    served = []
+
+    def evaluate(user, candidate):
+        reader = threading.Thread(target=lambda: served.append(cache.get(2, 10)))
+        reader.start()
+        reader.join(2)
+        assert not reader.is_alive(), "get blocked while a schedule change was scored"
+        return None
+
+    cache.candidate_changed(9, schedule(9), evaluate)
+    assert served == [[], [], []]
+
+
+def test_cache_maintenance_is_not_counted_as_scanning():
+    schedules = generate_campus(60, seed=1)
+    stats = MatchingStats()
+    service = FriendMatchingService(CampusScheduleRepository(schedules),
+                                    CampusConnectionRepository(),
+                                    suggestion_cache=SuggestionCache(), instrumentation=stats)
+    for user_id in range(1, 11):
+        service.generate_suggestions(user_id)
+    scanned = stats.counters['candidates_scanned']
+
+    service.notify_schedule_changed(20, schedules[19])
+
+    assert stats.counters['candidates_scanned'] == scanned